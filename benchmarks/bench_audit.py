@@ -0,0 +1,44 @@
+"""Flows per second classified by `muddy.audit.audit_flows`.
+
+Usage: python benchmarks/bench_audit.py [number_of_flows]
+"""
+import sys
+import time
+
+import numpy as np
+
+from muddy.audit import audit_flows, make_ace_table, make_flow_arrays
+from muddy.maker import make_acl_names, make_acls, make_mud, make_policy, make_support_info
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+
+def make_document():
+    support_info = make_support_info(1, 'https://devices.example.com/sku', True, 48)
+    acl = []
+    policies = {}
+    for direction_initiated in [Direction.TO_DEVICE, Direction.FROM_DEVICE]:
+        acl_names = make_acl_names('mud-10000', IPVersion.IPV4, direction_initiated)
+        policies.update(make_policy(direction_initiated, acl_names))
+        acl.append(make_acls([IPVersion.IPV4], 'cloud.example.com', Protocol.TCP,
+                             [MatchType.IS_CLOUD, MatchType.IS_MYMFG], direction_initiated,
+                             list(range(1000, 1100)), [443, 8883], acl_names))
+    return make_mud(support_info, policies, acl)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = np.random.default_rng(0)
+    flows = make_flow_arrays(rng.integers(0, 2, count), rng.choice([6, 17], count),
+                             rng.choice([443, 8883, 80], count), rng.integers(900, 1200, count),
+                             rng.integers(-1, 3, count), ['cloud.example.com', 'other.example.com', 'cdn.example.net'],
+                             same_manufacturer=rng.random(count) < 0.1)
+    table = make_ace_table(make_document())
+    start = time.perf_counter()
+    result = audit_flows(table, flows)
+    elapsed = time.perf_counter() - start
+    print(f'flows={count} aces={len(table.names)} allowed={int(result.allowed.sum())} '
+          f'{count / elapsed / 1e6:.2f}M flows/s')
+
+
+if __name__ == '__main__':
+    main()
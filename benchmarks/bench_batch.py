@@ -0,0 +1,46 @@
+"""Throughput of `muddy.batch.make_muds` against worker count.
+
+Usage: python benchmarks/bench_batch.py [number_of_specs]
+"""
+import os
+import sys
+import time
+
+from muddy.batch import make_muds
+from muddy.models import Direction, IPVersion, Protocol, MatchType
+
+
+def make_specs(count):
+    for i in range(count):
+        yield {
+            'mud_version': 1,
+            'mud_url': f'https://devices.example.com/sku{i}',
+            'is_supported': True,
+            'directions_initiated': [Direction.TO_DEVICE, Direction.FROM_DEVICE],
+            'ip_version': IPVersion.IPV4,
+            'target_url': 'cloud.example.com',
+            'protocol': Protocol.TCP,
+            'match_types': [MatchType.IS_CLOUD, MatchType.IS_MYMFG],
+            'system_info': f'SKU {i}',
+            'cache_validity': 48,
+            'local_ports': list(range(8000, 8020)),
+            'remote_ports': [443, 8883],
+        }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    baseline = None
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        for _ in make_muds(make_specs(count), workers=workers, chunksize=32):
+            pass
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f'workers={workers:<3} {count / elapsed:10.1f} docs/s  speedup={baseline / elapsed:5.2f}x')
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
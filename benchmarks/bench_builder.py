@@ -0,0 +1,38 @@
+"""Per-document overhead of the `overload`-dispatched `make_mud` against `MudBuilder`.
+
+A document with a single ACE is used so that dispatch and assembly dominate generation time.
+
+Usage: python benchmarks/bench_builder.py
+"""
+import timeit
+
+from muddy.maker import MudBuilder, make_mud
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+DIRECTIONS = [Direction.TO_DEVICE, Direction.FROM_DEVICE]
+
+
+def with_overload():
+    return make_mud(1, 'https://lighting.example.com/lightbulb2000', True, DIRECTIONS, IPVersion.IPV4,
+                    'test.example.com', Protocol.ANY, MatchType.IS_MYMFG, None, 48, None, None, None, None, None,
+                    '2019-07-25T00:00:00')
+
+
+def with_builder():
+    return MudBuilder() \
+        .support(1, 'https://lighting.example.com/lightbulb2000', True, 48, last_update='2019-07-25T00:00:00') \
+        .allow(DIRECTIONS, IPVersion.IPV4, 'test.example.com', Protocol.ANY, MatchType.IS_MYMFG) \
+        .build()
+
+
+def main():
+    number = 20000
+    overload_time = min(timeit.repeat(with_overload, number=number, repeat=5)) / number
+    builder_time = min(timeit.repeat(with_builder, number=number, repeat=5)) / number
+    print(f'make_mud (overload): {overload_time * 1e6:7.2f}us/doc')
+    print(f'MudBuilder:          {builder_time * 1e6:7.2f}us/doc')
+    print(f'dispatch overhead:   {(overload_time - builder_time) * 1e6:7.2f}us/doc')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Wall time of `muddy make` for a batch of devices: one interpreter per device against a single call.
+
+Usage: python benchmarks/bench_cli.py [number_of_specs] [jobs]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MUDDY = [sys.executable, '-m', 'muddy.scripts.mudcli', 'make']
+
+
+def make_specs(count):
+    for i in range(count):
+        yield {
+            'mud_version': 1,
+            'mud_url': f'https://devices.example.com/sku{i}',
+            'is_supported': True,
+            'directions_initiated': ['to_device', 'from_device'],
+            'ip_version': 'ipv4',
+            'target_url': 'cloud.example.com',
+            'protocol': 'tcp',
+            'match_types': ['is_cloud', 'is_mymfg'],
+            'local_ports': list(range(8000, 8020)),
+            'remote_ports': [443, 8883],
+        }
+
+
+def run(arguments, spec_lines):
+    subprocess.run(MUDDY + arguments, input=spec_lines, text=True, check=True, stderr=subprocess.DEVNULL)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    jobs = sys.argv[2] if len(sys.argv) > 2 else str(os.cpu_count() or 1)
+    lines = [json.dumps(spec) + '\n' for spec in make_specs(count)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        for line in lines:
+            run(['-o', directory], line)
+        per_device = time.perf_counter() - start
+        print(f'one call per device   {per_device:8.2f} s')
+
+        start = time.perf_counter()
+        run(['-o', directory, '--jobs', jobs], ''.join(lines))
+        batch = time.perf_counter() - start
+        print(f'one batch call        {batch:8.2f} s  speedup={per_device / batch:6.1f}x')
+
+        start = time.perf_counter()
+        run(['-o', directory, '--jobs', jobs, '--skip-unchanged'], ''.join(lines))
+        print(f'unchanged batch call  {time.perf_counter() - start:8.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Memory footprint of ACLs held as dicts against `muddy.compact` objects, for 1k/10k/100k ACEs.
+
+Usage: python benchmarks/bench_compact.py
+"""
+import tracemalloc
+
+from muddy.compact import CompactAcl
+from muddy.maker import make_acl
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+ARGS = (Direction.FROM_DEVICE, IPVersion.IPV4, 'cloud.example.com', Protocol.TCP, [MatchType.IS_CLOUD],
+        Direction.FROM_DEVICE)
+
+
+def measure(build):
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    for count in (1000, 10000, 100000):
+        local_ports = list(range(1024, 1024 + count // 10))
+        remote_ports = list(range(10))
+        dicts = measure(lambda: make_acl(*ARGS, local_ports, remote_ports, 'mud-10000-v4fr'))
+        aces = measure(lambda: list(CompactAcl('mud-10000-v4fr', *ARGS, local_ports, remote_ports)))
+        acl = measure(lambda: CompactAcl('mud-10000-v4fr', *ARGS, local_ports, remote_ports))
+        print(f'aces={count:<7} dicts={dicts / 1e6:8.2f}MB  CompactAce list={aces / 1e6:8.2f}MB  '
+              f'CompactAcl={acl / 1e3:8.2f}KB')
+
+
+if __name__ == '__main__':
+    main()
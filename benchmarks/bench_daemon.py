@@ -0,0 +1,75 @@
+"""Requests/sec of single-device generation: cold `muddy make` runs, `muddy make --socket` runs against a
+`muddy serve` daemon, and a `MudClient` kept connected to the daemon.
+
+Usage: python benchmarks/bench_daemon.py [number_of_requests]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from muddy.daemon import MudClient
+
+MUDDY = [sys.executable, '-m', 'muddy.scripts.mudcli']
+SPEC = {
+    'mud_version': 1,
+    'mud_url': 'https://devices.example.com/sku1',
+    'is_supported': True,
+    'directions_initiated': ['to_device', 'from_device'],
+    'ip_version': 'ipv4',
+    'target_url': 'cloud.example.com',
+    'protocol': 'tcp',
+    'match_types': ['is_cloud', 'is_mymfg'],
+    'local_ports': list(range(8000, 8020)),
+    'remote_ports': [443, 8883],
+}
+
+
+def report(label, count, elapsed):
+    print(f'{label:<24} {count / elapsed:10.1f} req/s')
+
+
+def run_cli(count, arguments):
+    line = json.dumps(SPEC)
+    start = time.perf_counter()
+    for _ in range(count):
+        subprocess.run(MUDDY + ['make'] + arguments, input=line, text=True, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def wait_for(path):
+    for _ in range(100):
+        try:
+            with MudClient(path) as client:
+                if client.ping():
+                    return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('daemon did not start')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    report('cold muddy make', count, run_cli(count, []))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'muddy.sock')
+        daemon = subprocess.Popen(MUDDY + ['serve', '--socket', path], stderr=subprocess.DEVNULL)
+        try:
+            wait_for(path)
+            report('muddy make --socket', count, run_cli(count, ['--socket', path]))
+
+            with MudClient(path) as client:
+                start = time.perf_counter()
+                for _ in range(count * 20):
+                    list(client.make([SPEC]))
+                report('connected MudClient', count * 20, time.perf_counter() - start)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+
+if __name__ == '__main__':
+    main()
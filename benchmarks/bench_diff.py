@@ -0,0 +1,65 @@
+"""Regenerating a fleet after a spec change with `muddy.diff.Regenerator`, against regenerating every MUD object with
+`make_mud` and redeploying it whole.
+
+Two changes are applied to every device: a new `systeminfo`, which leaves all ACLs untouched, and one changed
+local port, which changes some ACEs of every ACL. The latter rebuilds every ACL and then diffs them, so `Regenerator`
+is slower than `make_mud` there: what it saves is the size of what is deployed.
+
+Usage: python benchmarks/bench_diff.py [number_of_devices]
+"""
+import json
+import sys
+import time
+
+from muddy.diff import Regenerator
+from muddy.maker import make_mud
+from muddy.specs import parse_spec
+
+
+def make_specs(count):
+    return [{'mud_version': 1, 'mud_url': f'https://devices.example.com/sku{i}', 'is_supported': True,
+             'directions_initiated': ['to_device', 'from_device'], 'ip_version': 'ipv4',
+             'target_url': f'cloud{i % 50}.example.com', 'protocol': 'tcp', 'match_types': ['is_cloud', 'is_mfg'],
+             'local_ports': list(range(8000, 8016)), 'remote_ports': [443, 8883], 'system_info': 'sensor',
+             'last_update': '2024-01-01T00:00:00'} for i in range(count)]
+
+
+def full(specs):
+    start = time.perf_counter()
+    size = sum(len(json.dumps(make_mud(**parse_spec(spec)))) for spec in specs)
+    return time.perf_counter() - start, size
+
+
+def incremental(regenerators, specs):
+    start = time.perf_counter()
+    size = rebuilt = reused = 0
+    for regenerator, spec in zip(regenerators, specs):
+        update = regenerator.update(spec)
+        size += len(json.dumps(update.patch))
+        rebuilt += update.rebuilt
+        reused += update.reused
+    return time.perf_counter() - start, size, rebuilt, reused
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    specs = make_specs(count)
+    regenerators = [Regenerator() for _ in specs]
+    for regenerator, spec in zip(regenerators, specs):
+        regenerator.update(spec)
+
+    changes = {
+        'systeminfo': [dict(spec, system_info='temperature sensor') for spec in specs],
+        'one port': [dict(spec, local_ports=list(range(8000, 8015)) + [9000]) for spec in specs],
+    }
+    print(f'{count} devices')
+    for change, changed_specs in changes.items():
+        full_time, full_size = full(changed_specs)
+        time_, size, rebuilt, reused = incremental(regenerators, changed_specs)
+        print(f'{change:10}  make_mud     {count / full_time:8.1f} devices/s  {full_size / 1e6:7.2f} MB to deploy')
+        print(f'{"":10}  Regenerator  {count / time_:8.1f} devices/s  {size / 1e6:7.2f} MB of patches  '
+              f'ACLs rebuilt={rebuilt} reused={reused}')
+
+
+if __name__ == '__main__':
+    main()
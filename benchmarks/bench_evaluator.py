@@ -0,0 +1,58 @@
+"""Per-flow lookup time of `muddy.evaluator.PolicyEvaluator` against a first-match linear scan.
+
+Usage: python benchmarks/bench_evaluator.py [number_of_ports]
+"""
+import sys
+import timeit
+
+from muddy.evaluator import Flow, PolicyEvaluator
+from muddy.maker import make_acl_names, make_acls, make_mud, make_policy, make_support_info
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+
+def make_document(ports):
+    support_info = make_support_info(1, 'https://devices.example.com/sku', True, 48)
+    acl = []
+    policies = {}
+    for direction_initiated in [Direction.TO_DEVICE, Direction.FROM_DEVICE]:
+        acl_names = make_acl_names('mud-10000', IPVersion.IPV4, direction_initiated)
+        policies.update(make_policy(direction_initiated, acl_names))
+        acl.append(make_acls([IPVersion.IPV4], 'cloud.example.com', Protocol.TCP,
+                             [MatchType.IS_CLOUD, MatchType.IS_MYMFG], direction_initiated,
+                             list(range(1000, 1000 + ports)), [443, 8883], acl_names))
+    return make_mud(support_info, policies, acl)
+
+
+def linear_match(mud, flow):
+    policy = mud['ietf-mud:mud']['from-device-policy']
+    acls = {acl['name']: acl for acl in mud['ietf-access-control-list:acls']['acl']}
+    for access_list in policy['access-lists']['access-list']:
+        for ace in acls[access_list['name']]['aces']['ace']:
+            matches = ace['matches']
+            tcp = matches.get('tcp', {})
+            if matches.get('ipv4', {}).get('ietf-acldns:dst-dnsname') != flow.dst_dnsname:
+                continue
+            if tcp.get('source-port', {}).get('port') != flow.source_port:
+                continue
+            if tcp.get('destination-port', {}).get('port') != flow.destination_port:
+                continue
+            return ace['name']
+    return None
+
+
+def main():
+    ports = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    mud = make_document(ports)
+    evaluator = PolicyEvaluator(mud)
+    flow = Flow(Direction.FROM_DEVICE, IPVersion.IPV4, Protocol.TCP, 8883, 1000 + ports - 1,
+                dst_dnsname='cloud.example.com')
+    assert evaluator.match(flow) == linear_match(mud, flow)
+    number = 20000
+    indexed = min(timeit.repeat(lambda: evaluator.match(flow), number=number, repeat=5)) / number
+    linear = min(timeit.repeat(lambda: linear_match(mud, flow), number=200, repeat=5)) / 200
+    print(f'ports={ports} indexed={indexed * 1e6:8.2f}us linear={linear * 1e6:10.2f}us '
+          f'speedup={linear / indexed:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
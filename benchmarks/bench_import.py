@@ -0,0 +1,53 @@
+"""Import-time budget of `import muddy.maker` and `muddy --help`, measured with `python -X importtime`.
+
+Each case runs in fresh interpreters. Its import time is the median, over the runs, of the top-level imports
+it adds to an empty interpreter. The script exits with status 1 if a case goes over its budget.
+Compile the package first (`python -m compileall muddy`), otherwise stale bytecode is recompiled on every run.
+
+Usage: python benchmarks/bench_import.py [runs]
+"""
+import statistics
+import subprocess
+import sys
+
+BUDGETS_MS = {
+    'import muddy.maker': ('import muddy.maker', 10),
+    'muddy --help': ("from muddy.scripts.mudcli import cli; cli(['--help'])", 45),
+}
+
+
+def import_times(code):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('| imported package'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # only top-level imports, nested ones are included in their parent's cumulative time
+        if not name.startswith('  ') and cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(code, runs):
+    samples = []
+    for _ in range(runs):
+        startup = import_times('pass')
+        times = import_times(code)
+        samples.append(sum(us for name, us in times.items() if name not in startup) / 1000)
+    return statistics.median(samples)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    over_budget = False
+    for label, (code, budget) in BUDGETS_MS.items():
+        elapsed = measure(code, runs)
+        status = 'ok' if elapsed <= budget else 'OVER BUDGET'
+        over_budget = over_budget or elapsed > budget
+        print(f'{label:<20} {elapsed:7.1f} ms  budget={budget} ms  {status}')
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    main()
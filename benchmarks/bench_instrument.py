@@ -0,0 +1,60 @@
+"""Overhead of `muddy.instrument` on document generation: never enabled, enabled, and after `disable`, with the
+breakdown by stage recorded in the last round.
+
+Usage: python benchmarks/bench_instrument.py [number_of_documents]
+"""
+import json
+import sys
+import time
+
+from muddy import instrument
+from muddy.maker import make_mud
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+
+def spec(i):
+    return {'mud_version': 1, 'mud_url': f'https://devices.example.com/sku{i}', 'is_supported': True,
+            'directions_initiated': [Direction.TO_DEVICE, Direction.FROM_DEVICE], 'ip_version': IPVersion.BOTH,
+            'target_url': f'cloud{i % 50}.example.com', 'protocol': Protocol.TCP,
+            'match_types': [MatchType.IS_CLOUD, MatchType.IS_MYMFG], 'local_ports': [443, 8443],
+            'remote_ports': [8883], 'last_update': '2024-01-01T00:00:00', 'deterministic': True}
+
+
+def generate(specs, metrics=None):
+    start = time.perf_counter()
+    for arguments in specs:
+        mud = make_mud(**arguments)
+        if metrics is not None:
+            with metrics.stage('serialize'):
+                json.dumps(mud)
+        else:
+            json.dumps(mud)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    specs = [spec(i) for i in range(count)]
+    generate(specs[:100])
+
+    # the modes take turns, so that a slow spell of the machine doesn't favour one of them
+    baseline = enabled = disabled = float('inf')
+    metrics = None
+    for _ in range(5):
+        baseline = min(baseline, generate(specs))
+        metrics = instrument.enable()
+        enabled = min(enabled, generate(specs, metrics))
+        instrument.disable()
+        disabled = min(disabled, generate(specs))
+
+    print(f'{count} documents')
+    print(f'never enabled   {baseline / count * 1e6:8.1f} us/doc')
+    print(f'enabled         {enabled / count * 1e6:8.1f} us/doc  overhead={enabled / baseline - 1:+6.1%}')
+    print(f'disabled        {disabled / count * 1e6:8.1f} us/doc  overhead={disabled / baseline - 1:+6.1%}')
+    print(metrics.stats())
+    for stage, histogram in sorted(metrics.stages.items(), key=lambda item: -item[1].sum):
+        print(f'  {stage:<14} {histogram.sum / histogram.count * 1e6:8.1f} us/call  {histogram.count:7} calls')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Loading a corpus of MUD files with `muddy.loader`, against parsing the JSON alone, and indexed lookups
+against scanning the parsed document.
+
+Usage: python benchmarks/bench_loader.py [number_of_documents]
+"""
+import json
+import sys
+import time
+
+from muddy.loader import loads
+from muddy.maker import make_mud
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+
+def make_corpus(count):
+    corpus = []
+    for i in range(count):
+        mud = make_mud(mud_version=1, mud_url=f'https://devices.example.com/sku{i}', is_supported=True,
+                       directions_initiated=[Direction.TO_DEVICE, Direction.FROM_DEVICE], ip_version=IPVersion.IPV4,
+                       target_url=f'cloud{i % 50}.example.com', protocol=Protocol.TCP,
+                       match_types=[MatchType.IS_CLOUD, MatchType.IS_MFG], local_ports=list(range(8000, 8010)),
+                       remote_ports=[443, 8883])
+        corpus.append(json.dumps(mud))
+    return corpus
+
+
+def scan_domain(mud, domain):
+    found = []
+    for acl in mud['ietf-access-control-list:acls']['acl']:
+        for ace in acl['aces']['ace']:
+            for ip_version in ('ipv4', 'ipv6'):
+                ip_match = ace['matches'].get(ip_version, {})
+                if domain in (ip_match.get('ietf-acldns:src-dnsname'), ip_match.get('ietf-acldns:dst-dnsname')):
+                    found.append((acl['name'], ace['name']))
+    return found
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    corpus = make_corpus(count)
+    size = sum(len(text) for text in corpus)
+    print(f'{count} documents, {size / 1e6:.1f} MB')
+
+    start = time.perf_counter()
+    parsed = [json.loads(text) for text in corpus]
+    parse = time.perf_counter() - start
+    print(f'json.loads              {count / parse:10.1f} docs/s')
+
+    start = time.perf_counter()
+    indexes = [loads(text) for text in corpus]
+    load = time.perf_counter() - start
+    print(f'muddy.loader.loads      {count / load:10.1f} docs/s  indexing overhead={load / parse - 1:6.1%}')
+
+    lookups = 100000
+    mud, index = parsed[0], indexes[0]
+    start = time.perf_counter()
+    for _ in range(lookups):
+        scan_domain(mud, 'cloud0.example.com')
+    scan = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(lookups):
+        index.referencing('cloud0.example.com')
+    indexed = time.perf_counter() - start
+    print(f'domain lookup           scan={scan / lookups * 1e6:7.2f} us  index={indexed / lookups * 1e6:7.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Size of the nftables ruleset `muddy.nftables.NftCompiler` generates for a fleet, against translating each ACE into
+a rule and jumping to each device's chains with a rule per device.
+
+Devices are drawn from device models, each allowing TCP to a cloud service and its manufacturer, and UDP to NTP and
+DNS servers.
+
+Usage: python benchmarks/bench_nftables.py [number_of_devices] [number_of_models]
+"""
+import ipaddress
+import sys
+import time
+
+from muddy.maker import MudBuilder
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+from muddy.nftables import NftCompiler
+
+DIRECTIONS = [Direction.TO_DEVICE, Direction.FROM_DEVICE]
+
+
+def make_mud(model):
+    return MudBuilder() \
+        .support(1, f'https://vendor{model % 20}.example.com/model{model}', True, 48,
+                 last_update='2024-01-01T00:00:00') \
+        .allow(DIRECTIONS, IPVersion.IPV4, f'cloud{model % 30}.example.com', Protocol.TCP,
+               [MatchType.IS_CLOUD, MatchType.IS_MYMFG], [443, 8443, 8883, 8884, 8885 + model % 4], [443, 1883]) \
+        .allow(DIRECTIONS, IPVersion.IPV4, 'pool.ntp.org', Protocol.UDP, [MatchType.IS_CLOUD], [123], [123]) \
+        .allow(DIRECTIONS, IPVersion.IPV4, 'dns.example.com', Protocol.UDP, [MatchType.IS_CLOUD], [53], None) \
+        .build()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    models = [make_mud(model) for model in range(int(sys.argv[2]) if len(sys.argv) > 2 else 100)]
+    network = ipaddress.ip_network('10.0.0.0/8')
+
+    compiler = NftCompiler()
+    start = time.perf_counter()
+    for device in range(count):
+        compiler.add(str(network[device + 1]), models[device % len(models)])
+    ruleset = compiler.render()
+    elapsed = time.perf_counter() - start
+    stats = compiler.stats()
+    per_device = stats.aces // count
+    print(f'{count} devices, {len(models)} models: {stats}')
+    # a packet between two devices goes through the from-device policy of one and the to-device policy of the other
+    print(f'rule per ACE  rules={stats.aces + 2 * count:9}  chains={2 * count + 1:7}  '
+          f'rules checked per new packet <= {per_device + 2 * count}')
+    worst = max(len(rules) for name, rules in compiler._chains.items())
+    print(f'NftCompiler   rules={stats.rules:9}  chains={stats.chains:7}  '
+          f'rules checked per new packet <= {worst * 4 + 3} (device lookup in a verdict map)')
+    print(f'compiled in {elapsed:.2f}s, {len(ruleset) / 1e6:.2f} MB of nft script')
+
+
+if __name__ == '__main__':
+    main()
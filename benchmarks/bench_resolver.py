@@ -0,0 +1,68 @@
+"""Resolving the `ietf-acldns` names of a fleet's MUD objects on each policy load, one lookup at a time, against
+`muddy.resolver.DnsCache`. The backend is a stub answering after a fixed latency, so that no DNS server is needed.
+
+Usage: python benchmarks/bench_resolver.py [number_of_devices] [latency_ms]
+"""
+import asyncio
+import sys
+import time
+
+from muddy.maker import make_mud
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+from muddy.resolver import DnsCache, acldns_names
+
+
+class StubBackend:
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.lookups = 0
+
+    async def lookup(self, domain, ip_version):
+        self.lookups += 1
+        await asyncio.sleep(self.latency)
+        return ['192.0.2.1'], 300
+
+
+def make_names(count):
+    names = []
+    for i in range(count):
+        mud = make_mud(mud_version=1, mud_url=f'https://devices.example.com/sku{i}', is_supported=True,
+                       directions_initiated=[Direction.FROM_DEVICE], ip_version=IPVersion.BOTH,
+                       target_url=f'cloud{i % 500}.example.com', protocol=Protocol.TCP,
+                       match_types=[MatchType.IS_CLOUD], local_ports=[443])
+        names.extend(acldns_names(mud))
+    return names
+
+
+async def uncached(names, backend):
+    for domain, ip_version in names:
+        await backend.lookup(domain, ip_version)
+
+
+async def cached(names, cache):
+    await cache.resolve_many(names)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 5) / 1000
+    names = make_names(count)
+    print(f'{count} devices, {len(names)} names, {len(set(names))} distinct, backend latency {latency * 1000:.0f} ms')
+
+    backend = StubBackend(latency)
+    start = time.perf_counter()
+    asyncio.run(uncached(names, backend))
+    print(f'one lookup per name     {time.perf_counter() - start:8.3f} s  lookups={backend.lookups}')
+
+    backend = StubBackend(latency)
+    cache = DnsCache(backend)
+    for load in ('first load', 'second load'):
+        start = time.perf_counter()
+        asyncio.run(cached(names, cache))
+        print(f'DnsCache {load:14} {time.perf_counter() - start:8.3f} s  lookups={backend.lookups} '
+              f'hits={cache.hits} misses={cache.misses}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Cost of keeping the regeneration schedule of a fleet in `muddy.scheduler.RefreshScheduler`: scheduling,
+rescheduling, taking due devices, saving and loading the index, and regenerating the due devices against regenerating
+the whole fleet as a periodic job would.
+
+Deadlines are spread over the 48 hours of the default cache-validity, so about 1/48 of the fleet is due each hour.
+
+Usage: python benchmarks/bench_scheduler.py [number_of_devices] [hours_since_last_run]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from muddy.scheduler import RefreshScheduler
+
+HOUR = 3600
+SPEC = {'mud_version': 1, 'is_supported': True, 'directions_initiated': ['to_device', 'from_device'],
+        'ip_version': 'ipv4', 'target_url': 'cloud.example.com', 'protocol': 'tcp', 'match_types': ['is_cloud'],
+        'local_ports': [443], 'remote_ports': [8883], 'deterministic': True}
+
+
+class Specs:
+    """Specs of the fleet, made on lookup."""
+
+    def get(self, device):
+        return dict(SPEC, mud_url=f'https://devices.example.com/{device}', last_update='2024-01-01T00:00:00')
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    hours = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+    rng = random.Random(0)
+    now = time.time()
+    devices = [f'sku{i:07}.json' for i in range(count)]
+    deadlines = [now + rng.random() * 48 * HOUR for _ in range(count)]
+    digest = bytes(range(1, 9))
+
+    def build():
+        scheduler = RefreshScheduler()
+        for device, deadline in zip(devices, deadlines):
+            scheduler.schedule(device, deadline, digest)
+        return scheduler
+
+    tracemalloc.start()
+    scheduler, elapsed = timed(build)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f'{count} devices: schedule {elapsed / count * 1e6:6.2f} us/device, {size / 1e6:.0f} MB '
+          f'({size / count:.0f} B/device)')
+
+    sample = rng.sample(devices, min(count, 100000))
+    _, elapsed = timed(lambda: [scheduler.schedule(device, now + rng.random() * 48 * HOUR) for device in sample])
+    print(f'reschedule {elapsed / len(sample) * 1e6:6.2f} us/device, heap of {len(scheduler._heap)} entries')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'schedule')
+        _, save = timed(lambda: scheduler.save(path))
+        loaded, load = timed(lambda: RefreshScheduler(path))
+        print(f'index {os.path.getsize(path) / 1e6:.1f} MB ({os.path.getsize(path) / count:.0f} B/device), '
+              f'save {save:.2f}s, load {load:.2f}s')
+    assert len(loaded) == len(scheduler)
+
+    due, elapsed = timed(lambda: scheduler.pop_due(now + hours * HOUR))
+    print(f'{len(due)} due after {hours:g}h: pop_due {elapsed:.2f}s')
+    for device, deadline in due:
+        scheduler.schedule(device, deadline)
+
+    results, elapsed = timed(lambda: list(scheduler.run_due(Specs(), now=now + hours * HOUR)))
+    per_device = elapsed / len(results) if results else 0
+    print(f'run_due    {len(results)} regenerated in {elapsed:.2f}s; regenerating the fleet would take '
+          f'{per_device * count:.0f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Load test of `muddy http` against a generic file server (`python -m http.server`) serving the same files.
+
+Both servers run in their own process. Clients, using keep-alive where the server supports it, fetch MUD files with plain, gzip and conditional
+(If-None-Match) requests.
+
+Usage: python benchmarks/bench_server.py [number_of_files] [connections] [requests_per_connection]
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from muddy.maker import make_mud
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+MUDDY_PORT = 18080
+GENERIC_PORT = 18090
+
+
+def write_files(directory, count):
+    for i in range(count):
+        mud = make_mud(mud_version=1, mud_url=f'https://devices.example.com/sku{i}.json', is_supported=True,
+                       directions_initiated=[Direction.TO_DEVICE, Direction.FROM_DEVICE],
+                       ip_version=IPVersion.IPV4, target_url='cloud.example.com', protocol=Protocol.TCP,
+                       match_types=[MatchType.IS_CLOUD, MatchType.IS_MYMFG], local_ports=list(range(8000, 8020)),
+                       remote_ports=[443, 8883], cache_validity=48, last_update='2020-01-01T00:00:00+0000')
+        with open(os.path.join(directory, f'sku{i}.json'), 'w') as fp:
+            json.dump(mud, fp, indent=2)
+
+
+async def fetch(reader, writer, path, headers):
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n{headers}\r\n'.encode())
+    head = await reader.readuntil(b'\r\n\r\n')
+    length = 0
+    for line in head.split(b'\r\n'):
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    await reader.readexactly(length)
+    return head
+
+
+async def client(port, count, requests, headers):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for i in range(requests):
+        head = await fetch(reader, writer, f'/sku{i % count}.json', headers)
+        if head.startswith(b'HTTP/1.0'):
+            # http.server closes the connection after each response
+            writer.close()
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.close()
+
+
+async def load(port, count, connections, requests, headers=''):
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, count, requests, headers) for _ in range(connections)))
+    return connections * requests / (time.perf_counter() - start)
+
+
+async def etag(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    head = await fetch(reader, writer, '/sku0.json', '')
+    writer.close()
+    return next(line.split(b':', 1)[1].strip().decode() for line in head.split(b'\r\n')
+                if line.lower().startswith(b'etag:'))
+
+
+def start(command, port):
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            asyncio.run(asyncio.open_connection('127.0.0.1', port))
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{command} did not start')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    with tempfile.TemporaryDirectory() as directory:
+        write_files(directory, count)
+        generic = start([sys.executable, '-m', 'http.server', str(GENERIC_PORT), '--bind', '127.0.0.1',
+                         '--directory', directory], GENERIC_PORT)
+        muddy = start([sys.executable, '-m', 'muddy.scripts.mudcli', 'http', directory,
+                       '--port', str(MUDDY_PORT)], MUDDY_PORT)
+        try:
+            print(f'http.server         {asyncio.run(load(GENERIC_PORT, count, connections, requests)):10.1f} req/s')
+            print(f'muddy http          {asyncio.run(load(MUDDY_PORT, count, connections, requests)):10.1f} req/s')
+            gzip_rate = asyncio.run(load(MUDDY_PORT, count, connections, requests, 'Accept-Encoding: gzip\r\n'))
+            print(f'muddy http, gzip    {gzip_rate:10.1f} req/s')
+            # every request names the first document's ETag, so only requests for it are answered with a 304
+            conditional = f'If-None-Match: {asyncio.run(etag(MUDDY_PORT))}\r\n'
+            conditional_rate = asyncio.run(load(MUDDY_PORT, 1, connections, requests, conditional))
+            print(f'muddy http, 304     {conditional_rate:10.1f} req/s')
+        finally:
+            generic.terminate()
+            muddy.terminate()
+            generic.wait()
+            muddy.wait()
+
+
+if __name__ == '__main__':
+    main()
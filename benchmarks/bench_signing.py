@@ -0,0 +1,89 @@
+"""Signing and verification throughput of `muddy.signing`, with throwaway test keys.
+
+Compares parsing the key for every file with the cached signer, then batch signing and verification across
+worker counts. Requires the `sign` extra.
+
+Usage: python benchmarks/bench_signing.py [number_of_files]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from muddy.signing import Signer, sign_files, verify_files
+
+
+def write_test_keys(directory):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'muddy benchmark signer')])
+    now = datetime.now(timezone.utc)
+    cert = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key()) \
+        .serial_number(x509.random_serial_number()).not_valid_before(now - timedelta(days=1)) \
+        .not_valid_after(now + timedelta(days=1)).sign(key, hashes.SHA256())
+    key_path = os.path.join(directory, 'signer.key')
+    cert_path = os.path.join(directory, 'signer.pem')
+    with open(key_path, 'wb') as fp:
+        fp.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                   serialization.NoEncryption()))
+    with open(cert_path, 'wb') as fp:
+        fp.write(cert.public_bytes(serialization.Encoding.PEM))
+    return key_path, cert_path
+
+
+def write_files(directory, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f'sku{i}.json')
+        with open(path, 'w') as fp:
+            json.dump({'ietf-mud:mud': {'mud-version': 1, 'mud-url': f'https://devices.example.com/sku{i}.json',
+                                        'is-supported': True}}, fp)
+        paths.append(path)
+    return paths
+
+
+def report(label, count, elapsed):
+    print(f'{label:<28} {count / elapsed:10.1f} files/s')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with tempfile.TemporaryDirectory() as directory:
+        key_path, cert_path = write_test_keys(directory)
+        paths = write_files(directory, count)
+        with open(key_path, 'rb') as fp:
+            key_pem = fp.read()
+        with open(cert_path, 'rb') as fp:
+            cert_pem = fp.read()
+
+        start = time.perf_counter()
+        for path in paths:
+            with open(path, 'rb') as fp:
+                Signer(key_pem, cert_pem).sign(fp.read())
+        report('key parsed per file', count, time.perf_counter() - start)
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            for result in sign_files(paths, key_path, cert_path, workers=workers, chunksize=32):
+                assert result.error is None, result.error
+            report(f'sign_files workers={workers}', count, time.perf_counter() - start)
+            workers *= 2
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            for result in verify_files(paths, cert_path, workers=workers, chunksize=32):
+                assert result.error is None, result.error
+            report(f'verify_files workers={workers}', count, time.perf_counter() - start)
+            workers *= 2
+
+
+if __name__ == '__main__':
+    main()
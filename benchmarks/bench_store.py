@@ -0,0 +1,89 @@
+"""Memory held by a synthetic fleet of MUD objects kept as parsed dicts, against `muddy.store.AclStore`, and the cost
+of adding, rebuilding and looking up documents in the store.
+
+Devices are drawn from a few hundred device models. Devices of a model only differ in their MUD URL, last-update
+and random `mud-NNNNN` ACL names, like the MUD files of a real fleet.
+
+Usage: python benchmarks/bench_store.py [number_of_devices] [number_of_models]
+"""
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from muddy.maker import make_mud
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+from muddy.store import AclStore
+
+
+def make_models(count):
+    models = []
+    for i in range(count):
+        mud = make_mud(mud_version=1, mud_url='https://devices.example.com/MODEL', is_supported=True,
+                       directions_initiated=[Direction.TO_DEVICE, Direction.FROM_DEVICE],
+                       ip_version=IPVersion.IPV4 if i % 2 else IPVersion.IPV6,
+                       target_url=f'cloud{i % 40}.example.com', protocol=Protocol.TCP,
+                       match_types=[MatchType.IS_CLOUD, MatchType.IS_MYMFG], local_ports=[443, 8000 + i % 16],
+                       remote_ports=[8883], mfg_name=f'vendor{i % 25}', model_name=f'model{i}',
+                       system_info='sensor', last_update='2024-01-01T00:00:00')
+        name = mud['ietf-access-control-list:acls']['acl'][0]['name'][:len('mud-NNNNN')]
+        models.append((json.dumps(mud), name))
+    return models
+
+
+def fleet(models, count):
+    rng = random.Random(0)
+    for i in range(count):
+        text, name = models[i % len(models)]
+        text = text.replace(name, f'mud-{rng.randint(10000, 99999)}') \
+            .replace('https://devices.example.com/MODEL', f'https://devices.example.com/sku{i}') \
+            .replace('2024-01-01T00:00:00', f'2024-01-{i % 28 + 1:02}T00:00:00')
+        yield i, json.loads(text)
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return kept, size, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    models = make_models(int(sys.argv[2]) if len(sys.argv) > 2 else 300)
+
+    kept, dicts, _ = measure(lambda: dict(fleet(models, count)))
+    del kept
+
+    def build():
+        store = AclStore()
+        for device, mud in fleet(models, count):
+            store.add(device, mud)
+        return store
+
+    store, stored, elapsed = measure(build)
+    print(f'{count} devices, {len(models)} models: {store.stats()}')
+    print(f'dicts      {dicts / 1e6:9.1f} MB  {dicts / count:7.0f} B/device')
+    print(f'AclStore   {stored / 1e6:9.1f} MB  {stored / count:7.0f} B/device  saving={1 - stored / dicts:6.1%}  '
+          f'add (with json.loads) {count / elapsed:9.0f} devices/s')
+
+    devices = random.Random(1).sample(range(count), min(count, 10000))
+    start = time.perf_counter()
+    for device in devices:
+        store.get(device)
+    elapsed = time.perf_counter() - start
+    print(f'get        {elapsed / len(devices) * 1e6:9.2f} us/device')
+    names = [store.get(device)['ietf-access-control-list:acls']['acl'][-1]['name'] for device in devices]
+    start = time.perf_counter()
+    for device, name in zip(devices, names):
+        store.acl(device, name)
+    elapsed = time.perf_counter() - start
+    print(f'acl        {elapsed / len(devices) * 1e6:9.2f} us/lookup')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Peak RSS of eager `json.dumps` against streaming `muddy.stream.dump` for large ACE lists.
+
+Each path runs in a fresh interpreter so that peak RSS is not shared between them.
+
+Usage: python benchmarks/bench_stream.py [number_of_ports]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+WORKER = '''
+import json, resource, sys
+from muddy.maker import make_acl_names, make_acls, make_mud, make_policy, make_support_info
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+from muddy.stream import dump
+
+mode, ports, path = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+lazy = mode == 'stream'
+support_info = make_support_info(1, 'https://devices.example.com/sku', True, 48, last_update='2019-07-25T00:00:00')
+acl = []
+policies = {}
+for direction_initiated in [Direction.TO_DEVICE, Direction.FROM_DEVICE]:
+    acl_names = make_acl_names('mud-10000', IPVersion.IPV4, direction_initiated)
+    policies.update(make_policy(direction_initiated, acl_names))
+    acl.append(make_acls([IPVersion.IPV4], 'cloud.example.com', Protocol.TCP, [MatchType.IS_CLOUD],
+                         direction_initiated, list(range(ports)), list(range(ports)), acl_names, lazy=lazy))
+mud = make_mud(support_info, policies, acl)
+with open(path, 'w') as fp:
+    if lazy:
+        dump(mud, fp)
+    else:
+        fp.write(json.dumps(mud))
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def run(mode, ports, path):
+    output = subprocess.check_output([sys.executable, '-c', WORKER, mode, str(ports), path])
+    return int(output)
+
+
+def main():
+    ports = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with tempfile.TemporaryDirectory() as tmp:
+        eager_path = os.path.join(tmp, 'eager.json')
+        stream_path = os.path.join(tmp, 'stream.json')
+        eager = run('eager', ports, eager_path)
+        stream = run('stream', ports, stream_path)
+        with open(eager_path, 'rb') as a, open(stream_path, 'rb') as b:
+            identical = a.read() == b.read()
+        size = os.path.getsize(eager_path)
+    print(f'ports={ports} aces={2 * ports * ports} output={size / 1e6:.1f}MB identical={identical}')
+    print(f'eager  peak RSS: {eager / 1024:8.1f} MB')
+    print(f'stream peak RSS: {stream / 1024:8.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
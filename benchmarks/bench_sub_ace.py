@@ -0,0 +1,46 @@
+"""Cost per sub-ACE of `make_ace` against port-list size.
+
+`make_ace` validates and builds the port-independent part of its sub-ACEs once per match type, through the
+memoized template layer of `make_sub_ace`. It is compared with calling `make_sub_ace` for every port pair
+with the template cache bypassed, which re-runs validation for each sub-ACE.
+
+Usage: python benchmarks/bench_sub_ace.py
+"""
+import timeit
+
+import muddy.maker
+from muddy.maker import make_ace, make_sub_ace, sub_ace_template_cache_info
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+MATCH_TYPES = [MatchType.IS_CLOUD, MatchType.IS_MFG]
+
+
+def templated(ports):
+    return make_ace(Direction.FROM_DEVICE, 'cloud.example.com', Protocol.TCP, MATCH_TYPES, Direction.FROM_DEVICE,
+                    IPVersion.IPV4, list(range(ports)), list(range(ports)))
+
+
+def per_port(ports):
+    return [make_sub_ace('ace', Direction.FROM_DEVICE, 'cloud.example.com', Protocol.TCP, match_type,
+                         Direction.FROM_DEVICE, IPVersion.IPV4, local_port, remote_port)
+            for match_type in MATCH_TYPES for local_port in range(ports) for remote_port in range(ports)]
+
+
+def per_ace(function, ports):
+    return min(timeit.repeat(lambda: function(ports), number=3, repeat=3)) / 3 / (len(MATCH_TYPES) * ports * ports)
+
+
+def main():
+    cached = muddy.maker._sub_ace_template
+    for ports in (1, 4, 16, 64, 128):
+        with_template = per_ace(templated, ports)
+        muddy.maker._sub_ace_template = cached.__wrapped__
+        without_template = per_ace(per_port, ports)
+        muddy.maker._sub_ace_template = cached
+        print(f'ports={ports:<4} aces={len(MATCH_TYPES) * ports * ports:<6} '
+              f'templated={with_template * 1e6:6.2f}us/ace per-port validation={without_template * 1e6:6.2f}us/ace')
+    print(sub_ace_template_cache_info())
+
+
+if __name__ == '__main__':
+    main()
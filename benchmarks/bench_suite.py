@@ -0,0 +1,229 @@
+"""Time, memory and output size of every stage of MUD generation, compared against a saved baseline.
+
+Covers `make_support_info`, `make_port_range`, `make_sub_ace`, `make_ace`, `make_acls`, the four `make_mud` overloads
+and `json.dumps` of the result, swept over port-list lengths, match-type counts, IP versions and directions.
+For each case it reports:
+- time: the best per-call CPU time over many repeats in several rounds, with the garbage collector disabled as in
+  `timeit`
+- peak: the peak memory allocated during a call, as traced by `tracemalloc`
+- kept: the memory still held by the result
+- size: the size of the result serialized to JSON
+
+Save a baseline before an upgrade and compare against it after, on the same machine and Python version. A case is
+flagged as a regression if its time grows by more than the threshold, or its peak memory by more than 5%. A changed
+output size is reported too, since it means the generated documents changed. The script exits with status 1 if a
+case regressed.
+
+Usage: python benchmarks/bench_suite.py [--save FILE | --compare FILE] [--threshold 0.25] [--filter TEXT]
+                                        [--repeat 20] [--rounds 3]
+"""
+import argparse
+import gc
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from muddy.maker import (make_ace, make_acl_names, make_acls, make_mud, make_policy, make_port_range,
+                         make_sub_ace, make_support_info)
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+PEAK_THRESHOLD = 0.05
+LAST_UPDATE = '2024-01-01T00:00:00'
+# the match types taking a domain as target, is_controller takes a URI
+MATCH_TYPES = [MatchType.IS_CLOUD, MatchType.IS_MYMFG, MatchType.IS_MFG, MatchType.IS_MY_CONTROLLER]
+TARGETS = dict.fromkeys(MATCH_TYPES, 'cloud.example.com')
+TARGETS[MatchType.IS_CONTROLLER] = 'https://controller.example.com/lights'
+IP_VERSIONS = {'ipv4': IPVersion.IPV4, 'ipv6': IPVersion.IPV6, 'both': IPVersion.BOTH}
+DIRECTIONS = {'to': [Direction.TO_DEVICE], 'from': [Direction.FROM_DEVICE],
+              'both': [Direction.TO_DEVICE, Direction.FROM_DEVICE]}
+SUPPORT = {'mud_version': 1, 'mud_url': 'https://lighting.example.com/lightbulb2000', 'is_supported': True}
+FULL_SUPPORT = dict(SUPPORT, cache_validity=48, system_info='The BMS Example Lightbulb', mfg_name='Example',
+                    documentation='https://lighting.example.com/docs', masa_server='https://masa.example.com',
+                    model_name='lightbulb2000', last_update=LAST_UPDATE)
+
+
+def ports(count):
+    return [1024 + port for port in range(count)]
+
+
+def rule(ip_version, directions, port_count=4, match_count=1):
+    return {'directions_initiated': DIRECTIONS[directions], 'ip_version': IP_VERSIONS[ip_version],
+            'target_url': 'cloud.example.com', 'protocol': Protocol.TCP, 'match_types': MATCH_TYPES[:match_count],
+            'local_ports': ports(port_count), 'remote_ports': [443]}
+
+
+def policies_and_acls(arguments):
+    policies = {}
+    acls = []
+    for direction in arguments['directions_initiated']:
+        acl_names = make_acl_names('mud-52892', arguments['ip_version'], direction)
+        policies.update(make_policy(direction, acl_names))
+        acls.append(make_acls([arguments['ip_version']], arguments['target_url'], arguments['protocol'],
+                              arguments['match_types'], direction, arguments['local_ports'],
+                              arguments['remote_ports'], acl_names))
+    return policies, acls
+
+
+def make_mud_case(overload, arguments):
+    support_info = make_support_info(**dict(SUPPORT, last_update=LAST_UPDATE))
+    if overload == 1:
+        return lambda: make_mud(**SUPPORT, **arguments, last_update=LAST_UPDATE)
+    if overload == 2:
+        return lambda: make_mud(support_info=support_info, **arguments)
+    policies, acls = policies_and_acls(arguments)
+    if overload == 3:
+        return lambda: make_mud(policies=policies, acls=acls, **SUPPORT, last_update=LAST_UPDATE)
+    return lambda: make_mud(support_info=support_info, policies=policies, acls=acls)
+
+
+def cases():
+    """Yields (name, function) pairs."""
+    yield 'make_support_info minimal', lambda: make_support_info(**dict(SUPPORT, last_update=LAST_UPDATE))
+    yield 'make_support_info full', lambda: make_support_info(**FULL_SUPPORT)
+
+    for name, direction in (('to', Direction.TO_DEVICE), ('from', Direction.FROM_DEVICE), ('either', None)):
+        yield f'make_port_range direction={name}', lambda direction=direction: make_port_range(direction, 1024, 443)
+
+    for match_type, (name, ip_version) in itertools.product(TARGETS, list(IP_VERSIONS.items())[:2]):
+        yield (f'make_sub_ace match_type={match_type.name.lower()} ip={name}',
+               lambda match_type=match_type, ip_version=ip_version:
+               make_sub_ace('cl0-frdev', Direction.FROM_DEVICE, TARGETS[match_type], Protocol.TCP, match_type,
+                            Direction.FROM_DEVICE, ip_version, 1024, 443))
+
+    for port_count, match_count in itertools.product((1, 4, 16, 64), (1, 2, 4)):
+        yield (f'make_ace ports={port_count} match_types={match_count}',
+               lambda port_count=port_count, match_count=match_count:
+               make_ace(Direction.FROM_DEVICE, 'cloud.example.com', Protocol.TCP, MATCH_TYPES[:match_count],
+                        Direction.FROM_DEVICE, IPVersion.IPV4, ports(port_count), [443]))
+
+    for (name, ip_version), (direction_name, directions), port_count in itertools.product(
+            IP_VERSIONS.items(), list(DIRECTIONS.items())[:2], (1, 16)):
+        acl_names = make_acl_names('mud-52892', ip_version, directions[0])
+        yield (f'make_acls ip={name} direction={direction_name} ports={port_count}',
+               lambda ip_version=ip_version, direction=directions[0], port_count=port_count, acl_names=acl_names:
+               make_acls([ip_version], 'cloud.example.com', Protocol.TCP, [MatchType.IS_CLOUD], direction,
+                         ports(port_count), [443], acl_names))
+
+    for overload, ip_version, directions in itertools.product((1, 2, 3, 4), IP_VERSIONS, DIRECTIONS):
+        yield (f'make_mud_{overload} ip={ip_version} directions={directions}',
+               make_mud_case(overload, rule(ip_version, directions)))
+
+    for port_count, match_count in itertools.product((1, 4, 16, 64), (1, 4)):
+        arguments = rule('both', 'both', port_count, match_count)
+        yield f'make_mud_1 ports={port_count} match_types={match_count}', make_mud_case(1, arguments)
+        mud = make_mud_case(1, arguments)()
+        yield f'json.dumps ports={port_count} match_types={match_count}', lambda mud=mud: json.dumps(mud)
+
+
+def per_call_time(function, repeat):
+    # CPU time of the process, so that time spent descheduled on a busy machine isn't counted. Each repeat takes
+    # about 5 ms: the best of many short repeats is steadier than the best of a few long ones
+    number = 1
+    while True:
+        start = time.process_time()
+        for _ in range(number):
+            function()
+        elapsed = time.process_time() - start
+        if elapsed >= 0.005:
+            break
+        number *= 2
+    number = max(1, int(number * 0.005 / elapsed))
+    best = float('inf')
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.process_time()
+            for _ in range(number):
+                function()
+            best = min(best, (time.process_time() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return best
+
+
+def measure_memory(function):
+    result = function()  # warms up the template cache and the make_mud dispatcher
+    tracemalloc.start()
+    result = function()
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = len(result) if isinstance(result, str) else len(json.dumps(result))
+    return {'time': float('inf'), 'peak': peak, 'kept': kept, 'size': size}
+
+
+def compare(result, baseline, threshold):
+    """Returns a note on the changes against the baseline of a case, and whether it is a regression."""
+    if baseline is None:
+        return 'new', False
+    time_change = result['time'] / baseline['time'] - 1
+    notes = [f'{time_change:+6.1%}']
+    regression = False
+    if time_change > threshold:
+        notes.append('SLOWER')
+        regression = True
+    if result['peak'] > baseline['peak'] * (1 + PEAK_THRESHOLD):
+        notes.append(f'PEAK {result["peak"] / baseline["peak"] - 1:+.0%}')
+        regression = True
+    if result['size'] != baseline['size']:
+        notes.append(f'size {baseline["size"]} -> {result["size"]}')
+    return '  '.join(notes), regression
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--save', metavar='FILE', help='Save the results as a baseline.')
+    group.add_argument('--compare', metavar='FILE', help='Compare the results against a saved baseline.')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Relative time increase flagged as a regression (default: 0.25).')
+    parser.add_argument('--filter', default='', metavar='TEXT', help='Only run the cases whose name contains TEXT.')
+    parser.add_argument('--repeat', type=int, default=20, help='Number of timed repeats per case (default: 20).')
+    parser.add_argument('--rounds', type=int, default=3,
+                        help='Number of times the cases are timed, in turn; the best round counts (default: 3).')
+    args = parser.parse_args()
+
+    environment = {'python': platform.python_version(), 'machine': platform.machine()}
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fp:
+            saved = json.load(fp)
+        baseline = saved['cases']
+        if saved.get('environment') != environment:
+            print(f'baseline taken on {saved.get("environment")}, now {environment}: '
+                  f'memory and time may not be comparable', file=sys.stderr)
+
+    selected = [(name, function) for name, function in cases() if args.filter in name]
+    results = {name: measure_memory(function) for name, function in selected}
+    # a slow spell of the machine only affects one round of a case
+    for round_number in range(args.rounds):
+        print(f'round {round_number + 1}/{args.rounds}', file=sys.stderr)
+        for name, function in selected:
+            results[name]['time'] = min(results[name]['time'], per_call_time(function, args.repeat))
+
+    regressions = 0
+    for name, result in results.items():
+        line = (f'{name:<46} {result["time"] * 1e6:10.2f} us  peak={result["peak"] / 1024:8.1f} KiB  '
+                f'kept={result["kept"] / 1024:8.1f} KiB  size={result["size"]:7} B')
+        if args.compare:
+            note, regression = compare(result, baseline.get(name), args.threshold)
+            regressions += regression
+            line = f'{line}  {note}'
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump({'environment': environment, 'cases': results}, fp, indent=2)
+        print(f'{len(results)} cases saved to {args.save}')
+    if args.compare:
+        missing = [name for name in baseline if args.filter in name and name not in results]
+        print(f'{len(results)} cases, {regressions} regressions, {len(missing)} baseline cases not run')
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
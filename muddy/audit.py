@@ -0,0 +1,306 @@
+import csv
+from collections import namedtuple
+
+import numpy as np
+
+from muddy.evaluator import port_condition
+from muddy.exceptions import InputException
+from muddy.models import Direction
+from muddy.utils import get_policy_type_prefix_string
+
+# Integer codes shared by ACE tables and flow arrays.
+DIRECTION_CODES = {Direction.TO_DEVICE: 0, Direction.FROM_DEVICE: 1}
+"""`direction` / policy column: 0 for to-device, 1 for from-device."""
+DIRECTION_INITIATED_CODES = {None: 0, Direction.TO_DEVICE: 1, Direction.FROM_DEVICE: 2}
+"""`direction_initiated` column: 0 for unknown/any, 1 for to-device, 2 for from-device."""
+
+MATCH_ANY = 0
+MATCH_SRC_DNSNAME = 1
+MATCH_DST_DNSNAME = 2
+MATCH_MANUFACTURER = 3
+MATCH_CONTROLLER = 4
+MATCH_SAME_MANUFACTURER = 5
+MATCH_MY_CONTROLLER = 6
+
+_DIRECTION_INITIATED_NAMES = {'to-device': 1, 'from-device': 2}
+_MAX_PORT = 65535
+
+AceTable = namedtuple('AceTable', ['names', 'allow', 'policy', 'ip_version', 'protocol', 'source_lower',
+                                   'source_upper', 'source_negate', 'destination_lower', 'destination_upper',
+                                   'destination_negate', 'direction_initiated', 'match_kind', 'peer', 'peers',
+                                   'unresolved'],
+                    defaults=[()])
+AceTable.__doc__ = """Columnar view of the ACEs bound to a MUD object's policies, in first-match order.
+
+    Every column except `names`, `peers` and `unresolved` is a NumPy array with one entry per ACE. `ip_version` is
+    4 or 6, `protocol` is 0 for any, ports without a condition span 0-65535, and `peer` indexes into `peers`
+    (-1 when the match kind has no peer value), which holds domain names in lowercase without a trailing dot,
+    manufacturers in lowercase and controller URIs as is. `unresolved` lists the names of ACLs referenced by a policy
+    without a matching ACL in the document, which contribute no ACEs.
+"""
+
+FlowArrays = namedtuple('FlowArrays', ['direction', 'ip_version', 'protocol', 'source_port', 'destination_port',
+                                       'direction_initiated', 'peer', 'peers', 'same_manufacturer',
+                                       'my_controller', 'manufacturer', 'controller'])
+FlowArrays.__doc__ = """Columnar flows to audit, one NumPy array entry per flow.
+
+    `direction` and `direction_initiated` use `DIRECTION_CODES` and `DIRECTION_INITIATED_CODES`,
+    `ip_version` is 4, 6 or 0 for unknown, and missing ports are -1. `peer` is the domain name of the remote host
+    (the source of to-device flows, the destination of from-device flows), `manufacturer` the domain of its MUD
+    URL and `controller` a controller class it belongs to, each an index into the `peers` list of names, or -1.
+"""
+
+AuditResult = namedtuple('AuditResult', ['ace', 'allowed', 'hits', 'names'])
+AuditResult.__doc__ = """Outcome of `audit_flows`.
+
+    `ace` holds the index of the matching ACE for every flow (-1 when no ACE matches), `allowed` the
+    per-flow verdict, `hits` the number of flows matched by each ACE and `names` the ACE names.
+"""
+
+
+def make_ace_table(mud):
+    """Function to turn the ACLs bound to a MUD object's policies into columnar NumPy arrays.
+
+    Args:
+        mud (dict): A MUD object, as returned by `make_mud`.
+
+    Returns:
+        AceTable: The ACEs of to-device-policy followed by those of from-device-policy.
+
+    """
+    acls = {acl['name']: acl for acl in mud.get('ietf-access-control-list:acls', {}).get('acl', [])}
+    peers = {}
+    rows = []
+    names = []
+    unresolved = []
+    for direction in (Direction.TO_DEVICE, Direction.FROM_DEVICE):
+        policy = mud['ietf-mud:mud'].get(f'{get_policy_type_prefix_string(direction)}-device-policy', {})
+        for access_list in policy.get('access-lists', {}).get('access-list', []):
+            acl = acls.get(access_list['name'])
+            if acl is None:
+                unresolved.append(access_list['name'])
+                continue
+            for ace in acl['aces']['ace']:
+                names.append(ace['name'])
+                rows.append(_ace_row(DIRECTION_CODES[direction], acl, ace, peers))
+
+    columns = list(zip(*rows)) if rows else [()] * 13
+    dtypes = [np.bool_, np.uint8, np.uint8, np.uint8, np.int32, np.int32, np.bool_, np.int32, np.int32,
+              np.bool_, np.uint8, np.uint8, np.int32]
+    arrays = [np.array(column, dtype=dtype) for column, dtype in zip(columns, dtypes)]
+    return AceTable(names, *arrays, list(peers), unresolved)
+
+
+def _ace_row(policy, acl, ace, peers):
+    matches = ace.get('matches', {})
+    ip_key = next((key for key in ('ipv4', 'ipv6') if key in matches), None) or \
+        ('ipv6' if acl.get('type', '').startswith('ipv6') else 'ipv4')
+    ip_match = matches.get(ip_key, {})
+    mud_match = matches.get('ietf-mud:mud', {})
+    protocol = ip_match.get('protocol') or 0
+    transport = {}
+    for key, number in (('tcp', 6), ('udp', 17)):
+        if key in matches:
+            transport = matches[key]
+            protocol = protocol or number
+
+    source = port_condition(transport.get('source-port')) or (0, _MAX_PORT, False)
+    destination = port_condition(transport.get('destination-port')) or (0, _MAX_PORT, False)
+
+    match_kind, peer = MATCH_ANY, None
+    if 'ietf-acldns:src-dnsname' in ip_match:
+        match_kind, peer = MATCH_SRC_DNSNAME, _dnsname(ip_match['ietf-acldns:src-dnsname'])
+    elif 'ietf-acldns:dst-dnsname' in ip_match:
+        match_kind, peer = MATCH_DST_DNSNAME, _dnsname(ip_match['ietf-acldns:dst-dnsname'])
+    elif 'manufacturer' in mud_match:
+        match_kind, peer = MATCH_MANUFACTURER, mud_match['manufacturer'].lower()
+    elif 'controller' in mud_match:
+        match_kind, peer = MATCH_CONTROLLER, mud_match['controller']
+    elif 'same-manufacturer' in mud_match:
+        match_kind = MATCH_SAME_MANUFACTURER
+    elif 'my-controller' in mud_match:
+        match_kind = MATCH_MY_CONTROLLER
+    peer_id = peers.setdefault(peer, len(peers)) if peer is not None else -1
+
+    return (ace.get('actions', {}).get('forwarding') == 'accept', policy, 6 if ip_key == 'ipv6' else 4, protocol,
+            source[0], source[1], source[2], destination[0], destination[1], destination[2],
+            _DIRECTION_INITIATED_NAMES.get(transport.get('ietf-mud:direction-initiated'), 0), match_kind, peer_id)
+
+
+def _dnsname(name):
+    return name.rstrip('.').lower()
+
+
+def _peer_ids(table_peers, peers, normalize):
+    # translate flow peer ids into the ACE table's peer ids, -1 when the ACEs never reference that peer
+    return np.array([table_peers.get(normalize(peer), -1) for peer in peers] + [-1], dtype=np.int32)
+
+
+def _port_mask(ports, lower, upper, negate):
+    if lower == 0 and upper == _MAX_PORT and not negate:
+        return np.ones(len(ports), dtype=bool)
+    mask = (ports >= lower) & (ports <= upper)
+    return ~mask & (ports >= 0) if negate else mask
+
+
+def audit_flows(table: AceTable, flows: FlowArrays):
+    """Function to classify flows against a MUD policy in vectorized passes.
+
+    Flows are partitioned by direction, protocol and peer, so that each partition is only checked against the ACEs that
+    can apply to it. Both `src-dnsname` and `dst-dnsname` ACEs match the name of the remote host, as in
+    `muddy.evaluator.PolicyEvaluator`, manufacturers are compared in lowercase and controllers as is. Within a partition
+    ACEs are applied in first-match order to the flows no earlier ACE has matched, and matched flows are dropped from
+    the working columns as they get classified.
+
+    Args:
+        table (AceTable): ACEs of the device, from `make_ace_table`.
+        flows (FlowArrays): Flows to classify, e.g. from `load_flows`.
+
+    Returns:
+        AuditResult: Per-flow matching ACE and verdict, and per-ACE hit counts.
+
+    """
+    table_peers = {peer: i for i, peer in enumerate(table.peers)}
+    peer = _peer_ids(table_peers, flows.peers, _dnsname)[flows.peer]
+    manufacturer = _peer_ids(table_peers, flows.peers, str.lower)[flows.manufacturer]
+    controller = _peer_ids(table_peers, flows.peers, str)[flows.controller]
+
+    count = len(flows.direction)
+    matched = np.full(count, -1, dtype=np.int64)
+    keys = (flows.direction.astype(np.int64) << 40) | (flows.protocol.astype(np.int64) << 32) | \
+        (peer.astype(np.int64) + 1)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(sorted_keys)) + 1, [count]))
+
+    # make_mud names the remote host with dst-dnsname in to-device-policy too; manufacturer and controller ACEs
+    # are checked flow by flow in _first_match
+    dnsname = np.isin(table.match_kind, (MATCH_SRC_DNSNAME, MATCH_DST_DNSNAME))
+
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        key = int(sorted_keys[start])
+        direction, protocol, group_peer = key >> 40, (key >> 32) & 0xff, (key & 0xffffffff) - 1
+        aces = np.flatnonzero((table.policy == direction) & ((table.protocol == 0) | (table.protocol == protocol)) &
+                              (~dnsname | ((table.peer == group_peer) & (group_peer >= 0))))
+        if len(aces):
+            index = order[start:end]
+            matched[index] = _first_match(table, aces, flows, index, manufacturer[index], controller[index])
+
+    found = matched >= 0
+    allowed = np.zeros(count, dtype=bool)
+    allowed[found] = table.allow[matched[found]]
+    hits = np.bincount(matched[found], minlength=len(table.names))
+    return AuditResult(matched, allowed, hits, table.names)
+
+
+def _first_match(table, aces, flows, index, manufacturer, controller):
+    """Apply `aces` in order to the flows at `index`, which share direction, protocol and peer."""
+    result = np.full(len(index), -1, dtype=np.int64)
+    pending = np.arange(len(index))
+    columns = [flows.ip_version[index], flows.direction_initiated[index], flows.source_port[index],
+               flows.destination_port[index], flows.same_manufacturer[index], flows.my_controller[index],
+               manufacturer, controller]
+    for i in aces:
+        ip_version, initiated, source_port, destination_port, same_manufacturer, my_controller, manufacturer, \
+            controller = columns
+        mask = _port_mask(source_port, table.source_lower[i], table.source_upper[i], table.source_negate[i])
+        mask &= _port_mask(destination_port, table.destination_lower[i], table.destination_upper[i],
+                           table.destination_negate[i])
+        mask &= (ip_version == 0) | (ip_version == table.ip_version[i])
+        if table.direction_initiated[i]:
+            mask &= (initiated == 0) | (initiated == table.direction_initiated[i])
+        if table.match_kind[i] == MATCH_SAME_MANUFACTURER:
+            mask &= same_manufacturer
+        elif table.match_kind[i] == MATCH_MY_CONTROLLER:
+            mask &= my_controller
+        elif table.match_kind[i] == MATCH_MANUFACTURER:
+            mask &= manufacturer == table.peer[i]
+        elif table.match_kind[i] == MATCH_CONTROLLER:
+            mask &= controller == table.peer[i]
+
+        if mask.any():
+            result[pending[mask]] = i
+            keep = ~mask
+            pending = pending[keep]
+            if not len(pending):
+                break
+            columns = [column[keep] for column in columns]
+    return result
+
+
+def make_flow_arrays(direction, protocol, source_port=None, destination_port=None, peer=None, peers=(),
+                     ip_version=None, direction_initiated=None, same_manufacturer=None, my_controller=None,
+                     manufacturer=None, controller=None):
+    """Function to build `FlowArrays` from array-likes, filling omitted columns with "unknown" values.
+
+    Args:
+        direction (array-like): `DIRECTION_CODES` values.
+        protocol (array-like): IP protocol numbers.
+        source_port, destination_port (array-like, optional): Ports, -1 when missing.
+        peer (array-like, optional): Domain names of the remote hosts, as indexes into `peers`, -1 when missing.
+        peers (list, optional): Domain names and controller URIs referenced by `peer`, `manufacturer` and
+                                `controller`.
+        ip_version (array-like, optional): 4, 6 or 0.
+        direction_initiated (array-like, optional): `DIRECTION_INITIATED_CODES` values.
+        same_manufacturer, my_controller (array-like, optional): Peer class flags.
+        manufacturer, controller (array-like, optional): Manufacturer domains and controller classes of the remote
+                                                         hosts, as indexes into `peers`, -1 when missing.
+
+    Returns:
+        FlowArrays: The flows, as NumPy arrays.
+
+    """
+    direction = np.asarray(direction, dtype=np.uint8)
+    count = len(direction)
+
+    def column(values, dtype, fill):
+        return np.full(count, fill, dtype=dtype) if values is None else np.asarray(values, dtype=dtype)
+
+    return FlowArrays(direction, column(ip_version, np.uint8, 0), column(protocol, np.uint8, 0),
+                      column(source_port, np.int32, -1), column(destination_port, np.int32, -1),
+                      column(direction_initiated, np.uint8, 0), column(peer, np.int32, -1), list(peers),
+                      column(same_manufacturer, np.bool_, False), column(my_controller, np.bool_, False),
+                      column(manufacturer, np.int32, -1), column(controller, np.int32, -1))
+
+
+def load_flows(path: str):
+    """Function to load recorded flows from a CSV or NPZ file.
+
+    NPZ files hold one array per `make_flow_arrays` argument (`peers` as a string array). CSV files have a
+    header row with the same column names, where `direction` and `direction_initiated` are `to-device` /
+    `from-device` (or empty), `peer`, `manufacturer` and `controller` are names, and missing values are empty.
+
+    Args:
+        path (str): Path of a `.npz` or `.csv` file.
+
+    Returns:
+        FlowArrays: The flows, as NumPy arrays.
+
+    """
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            columns = {key: data[key] for key in data.files}
+        columns['peers'] = [str(peer) for peer in columns.get('peers', ())]
+        return make_flow_arrays(**columns)
+
+    codes = {'to-device': 0, 'from-device': 1}
+    peers = {}
+    columns = {key: [] for key in ('direction', 'protocol', 'source_port', 'destination_port', 'peer',
+                                   'ip_version', 'direction_initiated', 'same_manufacturer', 'my_controller',
+                                   'manufacturer', 'controller')}
+    with open(path, newline='') as fp:
+        for row in csv.DictReader(fp):
+            if row['direction'] not in codes:
+                raise InputException(f"direction is not valid: {row['direction']}")
+            columns['direction'].append(codes[row['direction']])
+            columns['protocol'].append(int(row.get('protocol') or 0))
+            columns['source_port'].append(int(row.get('source_port') or -1))
+            columns['destination_port'].append(int(row.get('destination_port') or -1))
+            for key in ('peer', 'manufacturer', 'controller'):
+                peer = row.get(key)
+                columns[key].append(peers.setdefault(peer, len(peers)) if peer else -1)
+            columns['ip_version'].append(int(row.get('ip_version') or 0))
+            columns['direction_initiated'].append(_DIRECTION_INITIATED_NAMES.get(row.get('direction_initiated'), 0))
+            columns['same_manufacturer'].append(row.get('same_manufacturer', '').lower() in ('1', 'true'))
+            columns['my_controller'].append(row.get('my_controller', '').lower() in ('1', 'true'))
+    return make_flow_arrays(peers=list(peers), **columns)
@@ -0,0 +1,99 @@
+import os
+import random
+from collections import namedtuple
+from multiprocessing import Pool
+
+from muddy.exceptions import InputException
+from muddy.maker import make_mud
+from muddy.specs import parse_spec
+
+BatchResult = namedtuple('BatchResult', ['index', 'mud', 'error'])
+BatchResult.__doc__ = """Outcome of a single spec in a batch.
+
+    `index` is the position of the spec in the input iterable, `mud` is the generated MUD object
+    (None on failure) and `error` is the `InputException` raised for that spec (None on success).
+"""
+
+
+def init_worker():
+    """Function to initialize a worker process of a pool running `make_one`, e.g. as the `initializer` of a
+       `multiprocessing.Pool`."""
+    # Forked workers inherit the parent's random state, which would give every worker the same
+    # sequence of `mud-NNNNN` names.
+    random.seed()
+
+
+def make_one(item):
+    """Function to generate the MUD object of a single spec, as `make_muds` does in its workers.
+
+    Args:
+        item (tuple): `(index, spec)`, where `index` is any picklable identifier of the spec.
+
+    Returns:
+        BatchResult: The result, with the `InputException` the spec raised as its error.
+
+    """
+    index, spec = item
+    try:
+        return BatchResult(index, make_mud(**parse_spec(spec)), None)
+    except InputException as e:
+        return BatchResult(index, None, e)
+    except (TypeError, ValueError) as e:
+        # TypeError is raised by the overload dispatcher when no make_mud signature accepts the spec, ValueError by
+        # the conversions of values parse_spec leaves to make_mud
+        return BatchResult(index, None, InputException(f'spec is not valid: {e}'))
+
+
+def make_muds(specs, workers: int = None, chunksize: int = 1, ordered: bool = True):
+    """Function to generate MUD objects for many devices, spread across a process pool.
+
+    Args:
+        specs (iterable): Iterable of dicts, each holding the keyword arguments of one `make_mud` call.
+                          String values are converted in the workers with `parse_spec`.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+                                 With 1 or fewer, specs are generated in the calling process.
+        chunksize (int, optional): Number of specs sent to a worker at a time. Larger chunks amortize
+                                   inter-process overhead for big batches of small specs.
+        ordered (bool, optional): If True, results are yielded in input order, otherwise as they complete.
+
+    Yields:
+        BatchResult: One result per spec. Specs raising `InputException` are reported through
+                     `BatchResult.error` and do not abort the batch.
+
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunksize < 1:
+        raise InputException(f'chunksize is not valid: {chunksize}')
+
+    items = enumerate(specs)
+    if workers <= 1:
+        for item in items:
+            yield make_one(item)
+        return
+
+    with Pool(workers, initializer=init_worker) as pool:
+        results = pool.imap(make_one, items, chunksize) if ordered else \
+            pool.imap_unordered(make_one, items, chunksize)
+        for result in results:
+            yield result
+
+
+def partition_results(results):
+    """Function to split batch results into generated MUD objects and errors.
+
+    Args:
+        results (iterable): Iterable of `BatchResult`, as yielded by `make_muds`.
+
+    Returns:
+        tuple: A list of `(index, mud)` pairs and a list of `(index, InputException)` pairs.
+
+    """
+    muds = []
+    errors = []
+    for result in results:
+        if result.error is None:
+            muds.append((result.index, result.mud))
+        else:
+            errors.append((result.index, result.error))
+    return muds, errors
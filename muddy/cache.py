@@ -0,0 +1,160 @@
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+from muddy.constants import GENERATOR_VERSION
+from muddy.exceptions import InputException
+from muddy.maker import make_mud
+from muddy.utils import get_spec_digest
+
+
+class MudCache:
+    """Content-addressed on-disk cache of serialized MUD objects, keyed on the hash of their spec and of
+    `muddy.constants.GENERATOR_VERSION`, so that upgrading to a generator with a different output misses.
+
+    Entries are stored as `<directory>/<digest[:2]>/<digest>.json`. When the total size goes over
+    `max_bytes`, the least recently used entries are evicted, including when the cache is opened on a directory
+    already over the bound. Recency survives restarts through the entries' modification times.
+
+    Args:
+        directory (str): Directory holding the cache. Created if it doesn't exist.
+        max_bytes (int, optional): Size bound of the cache. None for unbounded.
+
+    """
+
+    def __init__(self, directory: str, max_bytes: int = None):
+        if max_bytes is not None and max_bytes < 0:
+            raise InputException(f'max_bytes is not valid: {max_bytes}')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        entries = []
+        for prefix in os.listdir(self.directory):
+            prefix_path = os.path.join(self.directory, prefix)
+            if not os.path.isdir(prefix_path):
+                continue
+            for name in os.listdir(prefix_path):
+                if name.endswith('.json'):
+                    stat = os.stat(os.path.join(prefix_path, name))
+                    entries.append((stat.st_mtime, name[:-len('.json')], stat.st_size))
+        for _, digest, size in sorted(entries):
+            self._entries[digest] = size
+            self._size += size
+        # the directory may have been filled under a larger bound, or by several caches
+        self._evict()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], f'{digest}.json')
+
+    @staticmethod
+    def key(spec):
+        """Function to compute the cache key of a spec.
+
+        Args:
+            spec (dict): Keyword arguments of a `make_mud` call.
+
+        Returns:
+            str: Hex digest identifying the spec and the generator version.
+
+        """
+        return get_spec_digest({'generator_version': GENERATOR_VERSION, 'spec': spec})
+
+    def get(self, spec):
+        """Function to look up the serialized MUD object generated for a spec.
+
+        Args:
+            spec (dict): Keyword arguments of a `make_mud` call.
+
+        Returns:
+            bytes: The cached JSON, or None on a miss.
+
+        """
+        return self._get(self.key(spec))
+
+    def _get(self, digest):
+        if digest not in self._entries:
+            self.misses += 1
+            return None
+        path = self._path(digest)
+        try:
+            with open(path, 'rb') as fp:
+                data = fp.read()
+        except FileNotFoundError:
+            self._size -= self._entries.pop(digest)
+            self.misses += 1
+            return None
+        os.utime(path)
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return data
+
+    def put(self, spec, data: bytes):
+        """Function to store the serialized MUD object generated for a spec, evicting old entries if needed.
+
+        Args:
+            spec (dict): Keyword arguments of a `make_mud` call.
+            data (bytes): The serialized MUD object.
+
+        """
+        self._put(self.key(spec), data)
+
+    def _put(self, digest, data):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(data)
+        os.replace(tmp_path, path)
+
+        self._size -= self._entries.pop(digest, 0)
+        self._entries[digest] = len(data)
+        self._size += len(data)
+        self._evict()
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        while self._size > self.max_bytes and self._entries:
+            digest, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(self._path(digest))
+            except FileNotFoundError:
+                pass
+
+    def make(self, spec):
+        """Function to get the serialized MUD object for a spec, generating it only on a cache miss.
+
+        The MUD object is generated with `make_mud(**spec, deterministic=True)`, so the spec must use one of
+        the signatures that generate the ACLs, and pin `last_update` (directly or through its `support_info`).
+
+        Args:
+            spec (dict): Keyword arguments of a `make_mud` call.
+
+        Returns:
+            bytes: The serialized MUD object.
+
+        """
+        # make_mud may update dicts of the spec in place, so the key is computed once up front
+        digest = self.key(spec)
+        data = self._get(digest)
+        if data is None:
+            data = json.dumps(make_mud(**dict(spec, deterministic=True))).encode()
+            self._put(digest, data)
+        return data
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """int: Total size in bytes of the cached entries."""
+        return self._size
@@ -0,0 +1,203 @@
+from array import array
+
+from muddy.exceptions import InputException
+from muddy.maker import MudBuilder, make_acl, make_acl_names, make_mud_name, make_policy, make_sub_ace
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+from muddy.utils import get_ace_name, get_sub_ace_name
+
+_NO_PORT = -1
+_MAX_PORT = 65535
+
+
+def _port(port):
+    # checked here, as array('H') raises OverflowError outside 0-65535
+    try:
+        value = int(port)
+    except (TypeError, ValueError):
+        raise InputException(f'port is not valid: {port}')
+    if not 0 <= value <= _MAX_PORT:
+        raise InputException(f'port is not valid: {port}')
+    return value
+
+
+def _ports(ports):
+    return array('H', map(_port, ports)) if ports is not None else None
+
+
+class CompactAce:
+    """Slotted form of a single ACE, as generated by `make_sub_ace`. Enums are stored as their int values.
+
+    Use `to_dict` to get the RFC 8520 dict.
+    """
+    __slots__ = ('name', 'protocol_direction', 'target_url', 'protocol', 'match_type', 'direction_initiated',
+                 'ip_version', 'local_port', 'remote_port')
+
+    def __init__(self, name, protocol_direction, target_url, protocol, match_type, direction_initiated, ip_version,
+                 local_port=None, remote_port=None):
+        self.name = name
+        self.protocol_direction = protocol_direction.value
+        self.target_url = target_url
+        self.protocol = protocol.value
+        self.match_type = match_type.value
+        self.direction_initiated = direction_initiated.value
+        self.ip_version = ip_version.value
+        self.local_port = _port(local_port) if local_port is not None else _NO_PORT
+        self.remote_port = _port(remote_port) if remote_port is not None else _NO_PORT
+
+    def to_dict(self):
+        """Function to materialize the ACE.
+
+        Returns:
+            dict: The ACE, as returned by `make_sub_ace`.
+
+        """
+        return make_sub_ace(self.name, Direction(self.protocol_direction), self.target_url, Protocol(self.protocol),
+                            MatchType(self.match_type), Direction(self.direction_initiated),
+                            IPVersion(self.ip_version),
+                            self.local_port if self.local_port != _NO_PORT else None,
+                            self.remote_port if self.remote_port != _NO_PORT else None)
+
+
+class CompactAcl:
+    """Array-backed form of an ACL generated by `make_acl`.
+
+    Only the inputs are kept: match types as a `bytes` of enum values and ports as `array('H')`. ACEs are
+    produced on demand, either one at a time as `CompactAce` objects by iterating, or all at once as
+    RFC 8520 dicts with `to_dict`.
+    """
+    __slots__ = ('name', 'protocol_direction', 'ip_version', 'target_url', 'protocol', 'match_types',
+                 'direction_initiated', 'local_ports', 'remote_ports')
+
+    def __init__(self, name, protocol_direction, ip_version, target_url, protocol, match_types, direction_initiated,
+                 local_ports=None, remote_ports=None):
+        self.name = name
+        self.protocol_direction = protocol_direction.value
+        self.ip_version = ip_version.value
+        self.target_url = target_url
+        self.protocol = protocol.value
+        self.match_types = bytes(m.value for m in ([match_types] if isinstance(match_types, MatchType)
+                                                    else match_types))
+        self.direction_initiated = direction_initiated.value
+        self.local_ports = _ports(local_ports)
+        self.remote_ports = _ports(remote_ports)
+
+    def __len__(self):
+        # no ports means a single ACE without a port condition, an empty list means no ACE at all
+        local_ports = len(self.local_ports) if self.local_ports is not None else 1
+        remote_ports = len(self.remote_ports) if self.remote_ports is not None else 1
+        return len(self.match_types) * local_ports * remote_ports
+
+    def __iter__(self):
+        protocol_direction = Direction(self.protocol_direction)
+        direction_initiated = Direction(self.direction_initiated)
+        protocol = Protocol(self.protocol)
+        ip_version = IPVersion(self.ip_version)
+        local_ports = self.local_ports if self.local_ports is not None else (None,)
+        remote_ports = self.remote_ports if self.remote_ports is not None else (None,)
+        # same naming as make_ace
+        for i, value in enumerate(self.match_types):
+            match_type = MatchType(value)
+            ace_name = get_ace_name(match_type)
+            for l, local_port in enumerate(local_ports):
+                for r, remote_port in enumerate(remote_ports):
+                    yield CompactAce(get_sub_ace_name(ace_name, direction_initiated, i + l + r), protocol_direction,
+                                     self.target_url, protocol, match_type, direction_initiated, ip_version,
+                                     local_port, remote_port)
+
+    def to_dict(self, lazy=False):
+        """Function to materialize the ACL.
+
+        Args:
+            lazy (bool, optional): Generate the ACEs lazily, as `make_acl(..., lazy=True)` does.
+
+        Returns:
+            dict: The ACL, as returned by `make_acl`.
+
+        """
+        return make_acl(Direction(self.protocol_direction), IPVersion(self.ip_version), self.target_url,
+                        Protocol(self.protocol), [MatchType(value) for value in self.match_types],
+                        Direction(self.direction_initiated),
+                        list(self.local_ports) if self.local_ports is not None else None,
+                        list(self.remote_ports) if self.remote_ports is not None else None,
+                        self.name, lazy=lazy)
+
+
+class CompactPolicy:
+    """Slotted form of a policy generated by `make_policy`."""
+    __slots__ = ('direction_initiated', 'acl_names')
+
+    def __init__(self, direction_initiated, acl_names):
+        self.direction_initiated = direction_initiated.value
+        self.acl_names = tuple(acl_names)
+
+    def to_dict(self):
+        """Function to materialize the policy.
+
+        Returns:
+            dict: The policy, as returned by `make_policy`.
+
+        """
+        return make_policy(Direction(self.direction_initiated), self.acl_names)
+
+
+class CompactMud:
+    """Compact form of a MUD object: its support information, `CompactPolicy` and `CompactAcl` objects."""
+    __slots__ = ('support_info', 'policies', 'acls')
+
+    def __init__(self, support_info, policies=(), acls=()):
+        self.support_info = support_info
+        self.policies = list(policies)
+        self.acls = list(acls)
+
+    def to_dict(self, lazy=False):
+        """Function to materialize the MUD object.
+
+        Args:
+            lazy (bool, optional): Generate the ACEs lazily, for writing with `muddy.stream.dump`.
+
+        Returns:
+            dict: The MUD object, as returned by `make_mud`.
+
+        """
+        policies = {}
+        for policy in self.policies:
+            policies.update(policy.to_dict())
+        return MudBuilder().support_info(self.support_info) \
+            .acls(policies, [acl.to_dict(lazy) for acl in self.acls]) \
+            .build()
+
+
+def make_compact_acls(ip_version, target_url, protocol, match_types, direction_initiated, local_ports=None,
+                      remote_ports=None, acl_names=None, mud_name=None):
+    """Function to generate the compact form of the ACL returned by `make_acls` for the same arguments."""
+    if acl_names is None and mud_name is None:
+        raise InputException('acl_names and mud_name can\'t both by None at the same time')
+    elif acl_names is None:
+        acl_names = make_acl_names(mud_name, ip_version, direction_initiated)
+    if ip_version == [IPVersion.BOTH]:
+        ip_version = [IPVersion.IPV4, IPVersion.IPV6]
+    # make_acls keeps the ACL of its last (ip version, protocol direction) iteration
+    last = len(acl_names) - 1
+    return CompactAcl(acl_names[last], Direction.FROM_DEVICE, ip_version[last], target_url, protocol, match_types,
+                      direction_initiated, local_ports, remote_ports)
+
+
+def make_compact_mud(support_info, directions_initiated, ip_version, target_url, protocol, match_types,
+                     local_ports=None, remote_ports=None, mud_name=None):
+    """Function to generate the compact form of the MUD object `make_mud` generates from a support
+       information container, with the same arguments.
+
+    Returns:
+        CompactMud: The compact MUD object. `to_dict` gives the same result as `make_mud`.
+
+    """
+    if mud_name is None:
+        mud_name = make_mud_name()
+    policies = []
+    acls = []
+    for direction_initiated in directions_initiated:
+        acl_names = make_acl_names(mud_name, ip_version, direction_initiated)
+        policies.append(CompactPolicy(direction_initiated, acl_names))
+        acls.append(make_compact_acls([ip_version], target_url, protocol, match_types, direction_initiated,
+                                      local_ports, remote_ports, acl_names))
+    return CompactMud(support_info, policies, acls)
@@ -16,5 +16,15 @@ MUD_MODEL_DEF = {
 }
 
 DOMAIN_NAME_REGEX = r'[a-zA-Z0-9.-]+\.[a-zA-Z]{2,3}$'
-HTTP_URL_REGEX = r'/^(http|https):\\/\\/[a-zA-Z0-9_]+([\\-\\.]{1}[a-zA-Z_0-9]+)*\\.[_a-zA-Z]{2,5}((:[0-9]{1,5})?\\/.*)?$/i'
-URN_URL_REGEX = '^urn:[a-zA-Z0-9][a-zA-Z0-9-]{0,31}:[a-zA-Z0-9()+,\-.:=@;$_!*\'%/?#]+$^'
+HTTP_URL_REGEX = r'(?i)^(http|https)://[a-zA-Z0-9_]+([\-.][a-zA-Z_0-9]+)*\.[_a-zA-Z]{2,5}((:[0-9]{1,5})?/.*)?$'
+URN_URL_REGEX = r'^urn:[a-zA-Z0-9][a-zA-Z0-9-]{0,31}:[a-zA-Z0-9()+,\-.:=@;$_!*\'%/?#]+$'
+
+SPEC_FORMATS = ('jsonl', 'csv')
+"""Formats accepted by `muddy.specs.read_specs`."""
+
+DEFAULT_CACHE_VALIDITY = 48
+"""cache-validity, in hours, RFC 8520 assumes when a MUD file doesn't set it."""
+
+GENERATOR_VERSION = 1
+"""Version of the MUD objects `muddy.maker` generates, to bump whenever the same inputs generate different output.
+Part of the keys of `muddy.cache.MudCache`, so that entries of an older generator are not served."""
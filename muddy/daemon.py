@@ -0,0 +1,227 @@
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import struct
+
+from muddy.exceptions import InputException
+
+BATCH_SIZE = 256
+"""Number of specs `MudClient.make` sends per request."""
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+"""Largest frame accepted by either side, in bytes."""
+
+_HEADER = struct.Struct('!I')
+
+
+def send_frame(sock, message):
+    """Function to send a message as a frame: its UTF-8 JSON encoding, prefixed by its length as a 4-byte
+       big-endian unsigned integer.
+
+    Args:
+        sock (socket.socket): The connected socket.
+        message: Any JSON serializable object.
+
+    """
+    data = json.dumps(message, separators=(',', ':')).encode()
+    if len(data) > MAX_FRAME_SIZE:
+        raise InputException(f'frame is too large: {len(data)} bytes')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_frame(sock):
+    """Function to receive a frame sent with `send_frame`.
+
+    Args:
+        sock (socket.socket): The connected socket.
+
+    Returns:
+        The decoded message, or None if the peer closed the connection.
+
+    """
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    size, = _HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise InputException(f'frame is too large: {size} bytes')
+    data = _recv_exactly(sock, size)
+    if data is None:
+        raise InputException('connection closed in the middle of a frame')
+    return json.loads(data)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        while True:
+            try:
+                request = recv_frame(self.request)
+            except (InputException, ValueError) as e:
+                send_frame(self.request, {'error': str(e)})
+                return
+            if request is None:
+                return
+            try:
+                response = self.server.respond(request)
+            except Exception as e:
+                # answer instead of dropping the connection, which would fail every spec of the request
+                response = {'error': f'request failed: {e!r}'}
+            send_frame(self.request, response)
+
+
+class MudServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Daemon generating MUD objects for `MudClient` requests over a Unix socket, with `muddy.maker` kept loaded.
+
+    Each connection carries any number of requests and responses, framed by `send_frame`. A request is
+    `{"specs": [...]}`, with specs as accepted by `muddy.batch.make_muds`. The response is
+    `{"results": [...]}` with, for each spec in order, either `{"mud": ...}` or `{"error": "..."}`.
+    `{"ping": true}` is answered with `{"pong": true}`.
+
+    Args:
+        path (str): Path of the Unix socket. A stale socket file left at this path, that no daemon accepts
+                    connections on, is replaced. Any other file raises `InputException`.
+        workers (int, optional): Number of worker processes per request, see `make_muds`.
+
+    """
+    daemon_threads = True
+
+    def __init__(self, path: str, workers: int = 1):
+        # imported here so that clients don't load muddy.maker
+        from muddy.batch import make_muds
+        self._make_muds = make_muds
+        self.path = path
+        self.workers = workers
+        _remove_stale_socket(path)
+        super().__init__(path, _Handler)
+
+    def respond(self, request):
+        if not isinstance(request, dict):
+            return {'error': 'request is not valid: not an object'}
+        if request.get('ping'):
+            return {'pong': True}
+        specs = request.get('specs')
+        if not isinstance(specs, list):
+            return {'error': 'request is not valid: specs must be a list'}
+        results = [None if isinstance(spec, dict) else {'error': 'spec is not valid: not an object'}
+                   for spec in specs]
+        slots = [i for i, result in enumerate(results) if result is None]
+        for slot, result in zip(slots, self._make_muds([specs[i] for i in slots], workers=self.workers)):
+            results[slot] = {'mud': result.mud} if result.error is None else {'error': str(result.error)}
+        return {'results': results}
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def _remove_stale_socket(path):
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise InputException(f'path is not valid: {path} exists and is not a socket')
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        # left behind by a daemon that didn't exit cleanly
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise InputException(f'path is not valid: a daemon is already listening on {path}')
+
+
+def serve(path: str, workers: int = 1):
+    """Function to run a `MudServer` until interrupted by SIGINT or SIGTERM, removing the socket on exit."""
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, signal.default_int_handler)
+    with MudServer(path, workers) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+class MudClient:
+    """Client of a `MudServer`, keeping a single connection open.
+
+    Args:
+        path (str): Path of the daemon's Unix socket.
+
+    Raises:
+        OSError: If no daemon listens on the socket.
+
+    """
+
+    def __init__(self, path: str):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(path)
+        except OSError:
+            self._sock.close()
+            raise
+
+    def _request(self, message):
+        send_frame(self._sock, message)
+        response = recv_frame(self._sock)
+        if response is None:
+            raise InputException('daemon closed the connection')
+        if 'error' in response:
+            raise InputException(response['error'])
+        return response
+
+    def ping(self):
+        """Function to check that the daemon answers."""
+        return self._request({'ping': True}).get('pong', False)
+
+    def make(self, specs):
+        """Function to generate MUD objects through the daemon, `BATCH_SIZE` specs per request.
+
+        Args:
+            specs (iterable): Specs, as accepted by `muddy.batch.make_muds`. They must be JSON serializable.
+
+        Yields:
+            tuple: `(index, mud, error)` for each spec in input order, where `error` is the message of the
+                   `InputException` the spec raised, or None.
+
+        """
+        index = 0
+        batch = []
+        for spec in specs:
+            batch.append(spec)
+            if len(batch) == BATCH_SIZE:
+                yield from self._make_batch(index, batch)
+                index += len(batch)
+                batch = []
+        if batch:
+            yield from self._make_batch(index, batch)
+
+    def _make_batch(self, index, batch):
+        for offset, result in enumerate(self._request({'specs': batch})['results']):
+            yield index + offset, result.get('mud'), result.get('error')
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
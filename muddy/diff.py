@@ -0,0 +1,276 @@
+import copy
+from collections import ChainMap, namedtuple
+from difflib import SequenceMatcher
+
+from muddy.exceptions import InputException
+from muddy.maker import ACL_NAME_SUFFIXES, MudBuilder, make_mud_name
+from muddy.specs import parse_spec
+
+_CONTAINER = 'ietf-mud:mud'
+_ACLS = 'ietf-access-control-list:acls'
+_RULE_ARGUMENTS = ('directions_initiated', 'ip_version', 'target_url', 'protocol', 'match_types', 'local_ports',
+                   'remote_ports')
+_IGNORED_ARGUMENTS = ('deterministic', 'file')
+
+MudUpdate = namedtuple('MudUpdate', ['mud', 'patch', 'rebuilt', 'reused'])
+MudUpdate.__doc__ = '''Result of `Regenerator.update`: the new MUD object, the JSON Patch from the previous one, and the
+numbers of ACLs generated and reused.'''
+
+
+def _escape(key):
+    return key.replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token):
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def _key(value):
+    # repr is much faster than json.dumps: equal reprs imply equal JSON values, while equal values with their keys
+    # in another order are merely replaced instead of kept
+    return repr(value)
+
+
+def _diff_dict(path, old, new, skip=()):
+    patch = []
+    for key, value in old.items():
+        if key in skip:
+            continue
+        if key not in new:
+            patch.append({'op': 'remove', 'path': f'{path}/{_escape(key)}'})
+        elif new[key] != value:
+            patch.append({'op': 'replace', 'path': f'{path}/{_escape(key)}', 'value': new[key]})
+    for key, value in new.items():
+        if key not in old and key not in skip:
+            patch.append({'op': 'add', 'path': f'{path}/{_escape(key)}', 'value': value})
+    return patch
+
+
+def _diff_list(path, old, new, old_keys, new_keys, diff_equal=None):
+    # at each opcode the patched list is new[:j1] + old[i1:], which is what the indexes below refer to
+    patch = []
+    matcher = SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            if diff_equal is not None:
+                for k in range(i2 - i1):
+                    patch.extend(diff_equal(f'{path}/{j1 + k}', old[i1 + k], new[j1 + k]))
+            continue
+        common = min(i2 - i1, j2 - j1)
+        for k in range(common):
+            patch.append({'op': 'replace', 'path': f'{path}/{j1 + k}', 'value': new[j1 + k]})
+        for _ in range(i2 - i1 - common):
+            patch.append({'op': 'remove', 'path': f'{path}/{j1 + common}'})
+        for k in range(common, j2 - j1):
+            patch.append({'op': 'add', 'path': f'{path}/{j1 + k}', 'value': new[j1 + k]})
+    return patch
+
+
+def _diff_acl(path, old, new):
+    if old is new:
+        return []
+    if set(old) != {'name', 'type', 'aces'} or set(new) != {'name', 'type', 'aces'}:
+        return [] if old == new else [{'op': 'replace', 'path': path, 'value': new}]
+    patch = _diff_dict(path, old, new, skip=('aces',))
+    old_aces = old['aces'].get('ace', [])
+    new_aces = new['aces'].get('ace', [])
+    if old_aces is new_aces:
+        return patch
+    # unchanged ACEs at both ends are skipped with plain comparisons, only the rest goes through SequenceMatcher
+    start, end = 0, min(len(old_aces), len(new_aces))
+    while start < end and old_aces[start] == new_aces[start]:
+        start += 1
+    old_end, new_end = len(old_aces), len(new_aces)
+    while old_end > start and new_end > start and old_aces[old_end - 1] == new_aces[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+    old_aces, new_aces = old_aces[start:old_end], new_aces[start:new_end]
+    for operation in _diff_list(f'{path}/aces/ace', old_aces, new_aces, [_key(ace) for ace in old_aces],
+                                [_key(ace) for ace in new_aces]):
+        prefix, _, index = operation['path'].rpartition('/')
+        operation['path'] = f'{prefix}/{int(index) + start}'
+        patch.append(operation)
+    return patch
+
+
+def diff_muds(old: dict, new: dict):
+    """Function to compute the changes between two MUD objects, as a JSON Patch (RFC 6902).
+
+    Members of the `ietf-mud:mud` container are compared one by one, and policies are replaced as a whole. ACLs
+    are matched by name, and the ACEs of matching ACLs by content, so an ACE added to or removed from an ACL is a
+    single `add` or `remove` operation. ACLs that are the same object in both documents, as reused by
+    `Regenerator`, are skipped without being compared.
+
+    Args:
+        old (dict): The previous MUD object.
+        new (dict): The new MUD object.
+
+    Returns:
+        list: The operations turning `old` into `new`, see `apply_patch`. Empty if they are equal.
+
+    """
+    for mud in (old, new):
+        if not isinstance(mud, dict) or not isinstance(mud.get(_CONTAINER), dict):
+            raise InputException('mud is not valid: missing ietf-mud:mud container')
+    patch = _diff_dict('', old, new, skip=(_CONTAINER, _ACLS))
+    patch.extend(_diff_dict(f'/{_escape(_CONTAINER)}', old[_CONTAINER], new[_CONTAINER]))
+    if _ACLS not in old or _ACLS not in new:
+        patch.extend(_diff_dict('', {key: old[key] for key in (_ACLS,) if key in old},
+                                {key: new[key] for key in (_ACLS,) if key in new}))
+        return patch
+    old_acls = old[_ACLS].get('acl', [])
+    new_acls = new[_ACLS].get('acl', [])
+    patch.extend(_diff_list(f'/{_escape(_ACLS)}/acl', old_acls, new_acls, [acl.get('name') for acl in old_acls],
+                            [acl.get('name') for acl in new_acls], _diff_acl))
+    return patch
+
+
+def _resolve(document, tokens, path):
+    parent = document
+    for token in tokens[:-1]:
+        try:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[_unescape(token)]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise InputException(f'path is not valid: {path}')
+    return parent
+
+
+def apply_patch(mud: dict, patch: list, in_place: bool = False):
+    """Function to apply a JSON Patch, as made by `diff_muds`, to a MUD object.
+
+    Only the `add`, `remove` and `replace` operations are supported.
+
+    Args:
+        mud (dict): The MUD object.
+        patch (list): The operations.
+        in_place (bool, optional): Modify `mud` instead of a copy of it.
+
+    Returns:
+        dict: The patched MUD object.
+
+    """
+    if not in_place:
+        mud = copy.deepcopy(mud)
+    for operation in patch:
+        op, path = operation.get('op'), operation.get('path', '')
+        if op not in ('add', 'remove', 'replace'):
+            raise InputException(f'op is not valid: {op}')
+        tokens = path.split('/')[1:]
+        if not tokens:
+            raise InputException(f'path is not valid: {path}')
+        parent = _resolve(mud, tokens, path)
+        try:
+            if isinstance(parent, list):
+                index = len(parent) if tokens[-1] == '-' and op == 'add' else int(tokens[-1])
+                if op == 'add':
+                    if index > len(parent):
+                        raise IndexError(index)
+                    parent.insert(index, operation['value'])
+                elif op == 'remove':
+                    del parent[index]
+                else:
+                    parent[index] = operation['value']
+            else:
+                key = _unescape(tokens[-1])
+                if op != 'add' and key not in parent:
+                    raise KeyError(key)
+                if op == 'remove':
+                    del parent[key]
+                else:
+                    parent[key] = operation['value']
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise InputException(f'path is not valid: {path}')
+    return mud
+
+
+def get_mud_name(mud: dict):
+    """Function to find the name the ACLs of a MUD object made by muddy are prefixed with.
+
+    Returns:
+        str: The name, e.g. `mud-12345`, or None if the first ACL isn't named by muddy.
+
+    """
+    acls = mud.get(_ACLS, {}).get('acl', []) if isinstance(mud, dict) else []
+    if not acls:
+        return None
+    acl_name = acls[0].get('name', '')
+    for suffix in ACL_NAME_SUFFIXES.values():
+        if acl_name.endswith(suffix) and len(acl_name) > len(suffix):
+            return acl_name[:-len(suffix)]
+    return None
+
+
+def _make_builder(spec, name):
+    spec = parse_spec(spec)
+    rule = [spec.pop(argument, None) for argument in _RULE_ARGUMENTS]
+    for argument in _IGNORED_ARGUMENTS:
+        spec.pop(argument, None)
+    builder = MudBuilder(name)
+    try:
+        if 'support_info' in spec:
+            support_info = spec.pop('support_info')
+            if spec:
+                raise TypeError(f'unexpected arguments {", ".join(spec)}')
+            builder.support_info(support_info)
+        else:
+            builder.support(**spec)
+        builder.allow(*rule)
+    except TypeError as e:
+        raise InputException(f'spec is not valid: {e}')
+    return builder
+
+
+class Regenerator:
+    """Regenerator of the MUD object of a device as its spec changes.
+
+    Each `update` reuses the ACLs whose inputs (names, target, protocol, match types, direction and ports) are
+    the same as in the previous update, and only generates the others. The ACL name prefix is kept across
+    updates, so that unchanged ACLs keep their names, and the changes are reported as a JSON Patch from the
+    previous MUD object. Reused ACLs are shared between the MUD objects and must not be modified.
+
+    What this saves is the ACLs whose inputs didn't change, and what managers download: a patch instead of the whole
+    document. A change reaching every ACL, like a changed local port, costs more than `make_mud`, since every ACL is
+    generated anyway and the result is then compared with the previous object, about half the cost of generating it.
+    Where only the new MUD object is needed, call `make_mud` for such changes.
+
+    Args:
+        mud (dict, optional): The current MUD object of the device, e.g. loaded from its MUD file. Its ACLs
+                              can't be reused (their inputs are unknown), but their names are kept.
+        name (str, optional): Name the ACLs are prefixed with. Defaults to the prefix of `mud`, or a random
+                              `mud-NNNNN` name.
+
+    """
+
+    def __init__(self, mud: dict = None, name: str = None):
+        self.mud = mud
+        self.name = name or (get_mud_name(mud) if mud is not None else None) or make_mud_name()
+        self._acl_cache = {}
+
+    def update(self, spec: dict):
+        """Function to regenerate the MUD object from a new spec.
+
+        When the new MUD object only differs from the previous one in its `last-update`, like for
+        `muddy make --skip-unchanged`, the previous MUD object is kept and the patch is empty.
+
+        Args:
+            spec (dict): The keyword arguments of the first or second `make_mud` signature, as accepted by
+                         `muddy.specs.parse_spec`.
+
+        Returns:
+            MudUpdate: The new MUD object and the patch from the previous one, which is None on the first update
+                       without a `mud` to start from.
+
+        """
+        builder = _make_builder(spec, self.name)
+        acl_cache = ChainMap({}, self._acl_cache)
+        mud = builder.build(acl_cache)
+        built = acl_cache.maps[0]
+        rebuilt = sum(1 for key in built if key not in self._acl_cache)
+        self._acl_cache = built
+        patch = None
+        if self.mud is not None:
+            patch = diff_muds(self.mud, mud)
+            if all(operation['path'] == f'/{_CONTAINER}/last-update' for operation in patch):
+                return MudUpdate(self.mud, [], rebuilt, len(built) - rebuilt)
+        self.mud = mud
+        return MudUpdate(mud, patch, rebuilt, len(built) - rebuilt)
@@ -0,0 +1,289 @@
+from collections import namedtuple
+
+from muddy.exceptions import InputException
+from muddy.models import Direction, Protocol
+from muddy.utils import get_ipversion_string, get_policy_type_prefix_string
+
+Flow = namedtuple('Flow', ['direction', 'ip_version', 'protocol', 'source_port', 'destination_port',
+                           'src_dnsname', 'dst_dnsname', 'manufacturer', 'same_manufacturer', 'controllers',
+                           'my_controller', 'direction_initiated'],
+                  defaults=[None, None, None, None, None, None, False, (), False, None])
+Flow.__doc__ = """A flow to evaluate against a MUD policy.
+
+    direction (Direction): `Direction.TO_DEVICE` for traffic going to the Thing (to-device-policy),
+                           `Direction.FROM_DEVICE` for traffic coming from it (from-device-policy).
+    ip_version (IPVersion): `IPVersion.IPV4` or `IPVersion.IPV6`.
+    protocol (int or Protocol): IP protocol number (6, 17) or `Protocol.TCP` / `Protocol.UDP`.
+    source_port, destination_port (int, optional): Transport ports of the flow.
+    src_dnsname, dst_dnsname (str, optional): Resolved names of the source and destination hosts. Only the name of
+                                              the remote host is matched: the source of a to-device flow, the
+                                              destination of a from-device flow.
+    manufacturer (str, optional): Domain of the peer's MUD URL.
+    same_manufacturer (bool): Whether the peer has the same manufacturer as the Thing.
+    controllers (iterable): Controller class URIs the peer belongs to.
+    my_controller (bool): Whether the peer is a controller for this Thing.
+    direction_initiated (Direction, optional): Which side initiated the TCP connection. When None,
+                                               `ietf-mud:direction-initiated` conditions are not checked.
+"""
+
+_PROTOCOL_NUMBERS = {Protocol.TCP: 6, Protocol.UDP: 17, Protocol.ANY: None}
+_TRANSPORT_PROTOCOLS = {'tcp': 6, 'udp': 17}
+_DIRECTION_INITIATED = {'to-device': Direction.TO_DEVICE, 'from-device': Direction.FROM_DEVICE}
+_MAX_PORT = 65535
+
+_Rule = namedtuple('_Rule', ['index', 'name', 'allow', 'source_port', 'destination_port', 'direction_initiated'])
+
+
+def port_condition(port: dict):
+    """Function to turn a `source-port` or `destination-port` container into an inclusive port range.
+
+    Args:
+        port (dict): The container, with an `operator` and a `port`, or a `lower-port` and an `upper-port`.
+
+    Returns:
+        tuple: `(lower, upper, negate)`, where `negate` is True for the `neq` operator, or None if `port` is None.
+
+    """
+    if port is None:
+        return None
+    if 'lower-port' in port:
+        return port['lower-port'], port['upper-port'], False
+    operator = port.get('operator', 'eq')
+    value = port['port']
+    if operator == 'eq':
+        return value, value, False
+    if operator == 'neq':
+        return value, value, True
+    if operator == 'lte':
+        return 0, value, False
+    if operator == 'gte':
+        return value, _MAX_PORT, False
+    if operator == 'lt':
+        return 0, value - 1, False
+    if operator == 'gt':
+        return value + 1, _MAX_PORT, False
+    raise InputException(f'port operator is not valid: {operator}')
+
+
+def _port_matches(condition, port):
+    if condition is None:
+        return True
+    if port is None:
+        return False
+    lower, upper, negate = condition
+    return (lower <= port <= upper) is not negate
+
+
+def _eq_port(condition):
+    if condition is None:
+        return None, True
+    lower, upper, negate = condition
+    if lower == upper and not negate:
+        return lower, True
+    return None, False
+
+
+class _PortIndex:
+    """Rules sharing a peer condition, hashed on their `eq` ports. Other port conditions are scanned."""
+    __slots__ = ('eq', 'other')
+
+    def __init__(self):
+        self.eq = {}
+        self.other = []
+
+    def add(self, rule):
+        source_port, source_eq = _eq_port(rule.source_port)
+        destination_port, destination_eq = _eq_port(rule.destination_port)
+        if source_eq and destination_eq:
+            self.eq.setdefault((source_port, destination_port), []).append(rule)
+        else:
+            self.other.append(rule)
+
+    def first(self, flow, best):
+        eq = self.eq
+        candidates = (eq.get((flow.source_port, flow.destination_port)), eq.get((flow.source_port, None)),
+                      eq.get((None, flow.destination_port)), eq.get((None, None)), self.other)
+        for rules in candidates:
+            if not rules:
+                continue
+            for rule in rules:
+                if best is not None and rule.index >= best.index:
+                    break
+                if flow.direction_initiated is not None and rule.direction_initiated is not None and \
+                        flow.direction_initiated is not rule.direction_initiated:
+                    continue
+                if rules is self.other and not (_port_matches(rule.source_port, flow.source_port) and
+                                                _port_matches(rule.destination_port, flow.destination_port)):
+                    continue
+                best = rule
+                break
+        return best
+
+
+class _LabelTrie:
+    """Domain names stored by reversed labels, e.g. `example.com` under `com` -> `example`."""
+    __slots__ = ('root',)
+
+    def __init__(self):
+        self.root = {}
+
+    @staticmethod
+    def _labels(name):
+        return reversed(name.rstrip('.').lower().split('.'))
+
+    def setdefault(self, name, default):
+        node = self.root
+        for label in self._labels(name):
+            node = node.setdefault(label, {})
+        return node.setdefault(None, default)
+
+    def get(self, name):
+        node = self.root
+        for label in self._labels(name):
+            node = node.get(label)
+            if node is None:
+                return None
+        return node.get(None)
+
+
+class _Bucket:
+    """Rules of one (policy, ip version, protocol) combination, indexed by peer condition."""
+    __slots__ = ('any_peer', 'dnsname', 'manufacturer', 'controller', 'same_manufacturer', 'my_controller')
+
+    def __init__(self):
+        self.any_peer = _PortIndex()
+        self.dnsname = _LabelTrie()
+        self.manufacturer = {}
+        self.controller = {}
+        self.same_manufacturer = _PortIndex()
+        self.my_controller = _PortIndex()
+
+    def port_index(self, ip_match, mud_match):
+        # either name is the remote host's: make_mud names it with dst-dnsname in to-device-policy too
+        if 'ietf-acldns:src-dnsname' in ip_match:
+            return self.dnsname.setdefault(ip_match['ietf-acldns:src-dnsname'], _PortIndex())
+        if 'ietf-acldns:dst-dnsname' in ip_match:
+            return self.dnsname.setdefault(ip_match['ietf-acldns:dst-dnsname'], _PortIndex())
+        if 'manufacturer' in mud_match:
+            return self.manufacturer.setdefault(mud_match['manufacturer'].lower(), _PortIndex())
+        if 'controller' in mud_match:
+            return self.controller.setdefault(mud_match['controller'], _PortIndex())
+        if 'same-manufacturer' in mud_match:
+            return self.same_manufacturer
+        if 'my-controller' in mud_match:
+            return self.my_controller
+        return self.any_peer
+
+    def first(self, flow, best):
+        best = self.any_peer.first(flow, best)
+        dnsname = flow.src_dnsname if flow.direction is Direction.TO_DEVICE else flow.dst_dnsname
+        if dnsname is not None:
+            index = self.dnsname.get(dnsname)
+            if index is not None:
+                best = index.first(flow, best)
+        if flow.manufacturer is not None:
+            index = self.manufacturer.get(flow.manufacturer.lower())
+            if index is not None:
+                best = index.first(flow, best)
+        for controller in flow.controllers:
+            index = self.controller.get(controller)
+            if index is not None:
+                best = index.first(flow, best)
+        if flow.same_manufacturer:
+            best = self.same_manufacturer.first(flow, best)
+        if flow.my_controller:
+            best = self.my_controller.first(flow, best)
+        return best
+
+
+class PolicyEvaluator:
+    """Answers allow/deny questions for flows against a MUD object.
+
+    The ACLs bound to `to-device-policy` and `from-device-policy` are compiled once into hash tables keyed
+    on policy direction, IP version, protocol and `eq` ports, with a reversed-label trie for `ietf-acldns`
+    names and hashed sets for manufacturer and controller classes. A lookup touches only the few buckets
+    the flow can match, and returns the same ACE a first-match linear scan of the ACLs would.
+
+    Both `ietf-acldns:src-dnsname` and `ietf-acldns:dst-dnsname` name the remote host of their policy, the source
+    of to-device traffic and the destination of from-device traffic, as in `muddy.audit` and `muddy.nftables`.
+    ACLs a policy references but the document doesn't hold match no flow; their names are kept in `unresolved`,
+    as in `muddy.loader.MudIndex`.
+
+    Args:
+        mud (dict): A MUD object, as returned by `make_mud`.
+
+    """
+
+    def __init__(self, mud):
+        self._buckets = {}
+        self.unresolved = []
+        acls = {acl['name']: acl for acl in mud.get('ietf-access-control-list:acls', {}).get('acl', [])}
+        for direction in (Direction.TO_DEVICE, Direction.FROM_DEVICE):
+            policy = mud['ietf-mud:mud'].get(f'{get_policy_type_prefix_string(direction)}-device-policy', {})
+            index = 0
+            for access_list in policy.get('access-lists', {}).get('access-list', []):
+                acl = acls.get(access_list['name'])
+                if acl is None:
+                    self.unresolved.append(access_list['name'])
+                    continue
+                for ace in acl['aces']['ace']:
+                    self._add(direction, acl, ace, index)
+                    index += 1
+
+    def _add(self, direction, acl, ace, index):
+        matches = ace.get('matches', {})
+        ip_version = next((key for key in ('ipv4', 'ipv6') if key in matches), None) or \
+            ('ipv6' if acl.get('type', '').startswith('ipv6') else 'ipv4')
+        ip_match = matches.get(ip_version, {})
+        protocol = ip_match.get('protocol')
+        transport = {}
+        for key, number in _TRANSPORT_PROTOCOLS.items():
+            if key in matches:
+                transport = matches[key]
+                protocol = number if protocol is None else protocol
+
+        rule = _Rule(index, ace['name'], ace.get('actions', {}).get('forwarding') == 'accept',
+                     port_condition(transport.get('source-port')),
+                     port_condition(transport.get('destination-port')),
+                     _DIRECTION_INITIATED.get(transport.get('ietf-mud:direction-initiated')))
+        bucket = self._buckets.setdefault((direction, ip_version, protocol), _Bucket())
+        bucket.port_index(ip_match, matches.get('ietf-mud:mud', {})).add(rule)
+
+    def _first(self, flow):
+        ip_version = flow.ip_version if isinstance(flow.ip_version, str) else get_ipversion_string(flow.ip_version)
+        protocol = _PROTOCOL_NUMBERS.get(flow.protocol, flow.protocol)
+        best = None
+        for key in ((flow.direction, ip_version, protocol), (flow.direction, ip_version, None)):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                best = bucket.first(flow, best)
+            if protocol is None:
+                break
+        return best
+
+    def match(self, flow: Flow):
+        """Function to find the ACE that applies to a flow.
+
+        Args:
+            flow (Flow): The flow to evaluate.
+
+        Returns:
+            str: The name of the first matching ACE of the policy for the flow's direction, or None.
+
+        """
+        rule = self._first(flow)
+        return rule.name if rule is not None else None
+
+    def is_allowed(self, flow: Flow):
+        """Function to decide whether a flow is allowed by the MUD policy.
+
+        Args:
+            flow (Flow): The flow to evaluate.
+
+        Returns:
+            bool: True if the first matching ACE accepts the flow, False if it drops or rejects it or
+                  if no ACE matches.
+
+        """
+        rule = self._first(flow)
+        return rule is not None and rule.allow
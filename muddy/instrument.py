@@ -0,0 +1,323 @@
+import bisect
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import wraps
+
+import muddy.maker
+
+STAGES = {
+    'make_support_info': 'support_info',
+    'make_mud_name': 'mud_name',
+    'make_acls': 'acls',
+    'make_acl': 'acl',
+    'make_ace': 'ace',
+    'make_policy': 'policy',
+}
+"""Functions of `muddy.maker` timed when instrumentation is enabled, and the stage each is recorded as. `MudBuilder.build`
+is recorded as `build`."""
+VALIDATORS = ('is_domain_name', 'is_uri')
+"""Validation functions whose calls by `muddy.maker` are counted."""
+DURATION_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                    0.1, 0.25, 0.5, 1.0)
+"""Upper bounds, in seconds, of the buckets of the stage duration histograms."""
+ACE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+"""Upper bounds of the buckets of the histogram of ACEs per document."""
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+InstrumentationStats = namedtuple('InstrumentationStats', ['documents', 'aces', 'validation_calls',
+                                                           'template_cache_hits', 'template_cache_misses'])
+InstrumentationStats.__doc__ = '''Counters of an `Instrumentation`: documents built, ACEs generated, calls to the
+validation functions, and hits and misses of the sub-ACE template cache since instrumentation was enabled.'''
+
+_ACLS = 'ietf-access-control-list:acls'
+
+_active = None
+_originals = {}
+
+
+class Histogram:
+    """Counts of observed values per bucket, with their sum, as exported to Prometheus."""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Function to get the number of values up to each bucket bound.
+
+        Returns:
+            list: `(bound, count)` pairs, ending with `(inf, count)`.
+
+        """
+        pairs = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class Instrumentation:
+    """Metrics recorded while `muddy.maker` is instrumented, see `enable`.
+
+    Stage durations include the stages nested in them: `build` includes `acls`, which includes `acl` and `ace`.
+    Stages can also be timed around other code with `stage`, e.g. serialization. The optional callback is called
+    with the name and duration in seconds of each stage as it completes.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.stages = {}
+        self.validation_calls = dict.fromkeys(VALIDATORS, 0)
+        self.documents = 0
+        self.aces = 0
+        self.aces_per_document = Histogram(ACE_BUCKETS)
+        self._template_cache = muddy.maker.sub_ace_template_cache_info()
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        """Function to record the duration of a stage."""
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(DURATION_BUCKETS)
+            histogram.observe(seconds)
+        if self.callback is not None:
+            self.callback(stage, seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Context manager recording the duration of its block as a stage.
+
+        Example:
+            with metrics.stage('serialize'):
+                json.dump(mud, fp)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def _count_aces(self, count):
+        with self._lock:
+            self.aces += count
+
+    def _count_document(self, aces):
+        with self._lock:
+            self.documents += 1
+            self.aces_per_document.observe(aces)
+
+    def _count_validation(self, validator):
+        with self._lock:
+            self.validation_calls[validator] += 1
+
+    def stats(self):
+        """Function to get the counters.
+
+        Returns:
+            InstrumentationStats: The counters.
+
+        """
+        cache = muddy.maker.sub_ace_template_cache_info()
+        return InstrumentationStats(self.documents, self.aces, sum(self.validation_calls.values()),
+                                    cache.hits - self._template_cache.hits,
+                                    cache.misses - self._template_cache.misses)
+
+    def to_prometheus(self):
+        """Function to render the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, prefixed with `muddy_`.
+
+        """
+        stats = self.stats()
+        lines = ['# HELP muddy_stage_seconds Time spent in a stage of MUD generation, including nested stages.',
+                 '# TYPE muddy_stage_seconds histogram']
+        with self._lock:
+            for stage, histogram in sorted(self.stages.items()):
+                lines.extend(_histogram_lines('muddy_stage_seconds', histogram, f'stage="{stage}",'))
+            lines += ['# HELP muddy_document_aces Number of ACEs per MUD object built.',
+                      '# TYPE muddy_document_aces histogram']
+            lines.extend(_histogram_lines('muddy_document_aces', self.aces_per_document, ''))
+            lines += ['# HELP muddy_validation_calls_total Calls to the validation functions.',
+                      '# TYPE muddy_validation_calls_total counter']
+            lines.extend(f'muddy_validation_calls_total{{validator="{validator}"}} {count}'
+                         for validator, count in self.validation_calls.items())
+        for name, value, description in (
+                ('documents', stats.documents, 'MUD objects built.'),
+                ('aces', stats.aces, 'ACEs generated, including the ones of ACLs make_acls replaces.'),
+                ('template_cache_hits', stats.template_cache_hits, 'Hits of the sub-ACE template cache.'),
+                ('template_cache_misses', stats.template_cache_misses, 'Misses of the sub-ACE template cache.')):
+            lines += [f'# HELP muddy_{name}_total {description}', f'# TYPE muddy_{name}_total counter',
+                      f'muddy_{name}_total {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(name, histogram, labels):
+    for bound, count in histogram.cumulative():
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        yield f'{name}_bucket{{{labels}le="{le}"}} {count}'
+    labels = f'{{{labels[:-1]}}}' if labels else ''
+    yield f'{name}_sum{labels} {histogram.sum!r}'
+    yield f'{name}_count{labels} {histogram.count}'
+
+
+def _timed(function, stage, metrics):
+    perf_counter = time.perf_counter
+
+    @wraps(function)
+    def timed(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            metrics.observe(stage, perf_counter() - start)
+    return timed
+
+
+def _counted_aces(function, metrics):
+    # make_ace and the lazy ACLs of make_acl both go through iter_ace
+    @wraps(function)
+    def counted(*args, **kwargs):
+        count = 0
+        try:
+            for ace in function(*args, **kwargs):
+                count += 1
+                yield ace
+        finally:
+            metrics._count_aces(count)
+    return counted
+
+
+def _counted_validation(function, validator, metrics):
+    @wraps(function)
+    def counted(value):
+        metrics._count_validation(validator)
+        return function(value)
+    return counted
+
+
+def _timed_build(function, metrics):
+    timed = _timed(function, 'build', metrics)
+
+    @wraps(function)
+    def build(self, acl_cache: dict = None):
+        mud = timed(self, acl_cache)
+        metrics._count_document(sum(len(acl['aces']['ace']) for acl in mud[_ACLS]['acl']
+                                    if isinstance(acl.get('aces', {}).get('ace'), list)))
+        return mud
+    return build
+
+
+def enable(callback=None):
+    """Function to start instrumenting `muddy.maker`, replacing any instrumentation already enabled.
+
+    The functions named in `STAGES` and `VALIDATORS`, `iter_ace` and `MudBuilder.build` are replaced in `muddy.maker`
+    by wrappers recording into a new `Instrumentation`. Calls made through `muddy.maker`, including the ones between
+    its own functions, are recorded; functions imported from it by name before enabling are not. While disabled,
+    `muddy.maker` runs unchanged, without any overhead. Metrics are kept per process.
+
+    Args:
+        callback (callable, optional): Called with the name and duration in seconds of each stage as it completes.
+
+    Returns:
+        Instrumentation: The metrics being recorded.
+
+    """
+    global _active
+    disable()
+    metrics = Instrumentation(callback)
+    wrappers = {name: _timed(getattr(muddy.maker, name), stage, metrics) for name, stage in STAGES.items()}
+    wrappers.update((name, _counted_validation(getattr(muddy.maker, name), name, metrics)) for name in VALIDATORS)
+    wrappers['iter_ace'] = _counted_aces(muddy.maker.iter_ace, metrics)
+    for name, wrapper in wrappers.items():
+        _originals[name] = getattr(muddy.maker, name)
+        setattr(muddy.maker, name, wrapper)
+    _originals['build'] = muddy.maker.MudBuilder.build
+    muddy.maker.MudBuilder.build = _timed_build(muddy.maker.MudBuilder.build, metrics)
+    _active = metrics
+    return metrics
+
+
+def disable():
+    """Function to stop instrumenting `muddy.maker`, restoring its functions.
+
+    Returns:
+        Instrumentation: The metrics that were being recorded, or None if instrumentation wasn't enabled.
+
+    """
+    global _active
+    metrics = _active
+    if 'build' in _originals:
+        muddy.maker.MudBuilder.build = _originals.pop('build')
+    for name, function in _originals.items():
+        setattr(muddy.maker, name, function)
+    _originals.clear()
+    _active = None
+    return metrics
+
+
+def get_instrumentation():
+    """Function to get the metrics being recorded, or None if instrumentation isn't enabled."""
+    return _active
+
+
+@contextmanager
+def instrumented(callback=None):
+    """Context manager instrumenting `muddy.maker` in its block, see `enable`.
+
+    Example:
+        with instrumented() as metrics:
+            make_mud(**spec)
+        print(metrics.to_prometheus())
+    """
+    metrics = enable(callback)
+    try:
+        yield metrics
+    finally:
+        disable()
+
+
+def start_http_server(port: int, host: str = '127.0.0.1'):
+    """Function to serve the metrics being recorded to Prometheus, from a background thread.
+
+    Any path answers with the metrics of the instrumentation enabled at the time of the request, or no metrics if
+    it isn't enabled.
+
+    Args:
+        port (int): Port to listen on.
+        host (str, optional): Address to listen on.
+
+    Returns:
+        ThreadingHTTPServer: The server. Call its `shutdown` method to stop it.
+
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            metrics = get_instrumentation()
+            body = metrics.to_prometheus().encode() if metrics is not None else b''
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='muddy-metrics', daemon=True).start()
+    return server
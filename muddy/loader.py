@@ -0,0 +1,173 @@
+import json
+
+from muddy.exceptions import InputException
+from muddy.maker import make_mud, make_policy
+from muddy.models import Direction
+from muddy.utils import get_policy_type_prefix_string
+
+_SUPPORT_INFO_ARGUMENTS = {
+    'mud-version': 'mud_version', 'mud-url': 'mud_url', 'is-supported': 'is_supported',
+    'cache-validity': 'cache_validity', 'systeminfo': 'system_info', 'documentation': 'documentation',
+    'masa-server': 'masa_server', 'mfg-name': 'mfg_name', 'last-update': 'last_update', 'model-name': 'model_name',
+    'firmware-rev': 'firmware_rev', 'software-rev': 'software_rev',
+}
+_POLICY_KEYS = {f'{get_policy_type_prefix_string(direction)}-device-policy': direction for direction in Direction}
+
+
+def parse_support_info(support_info: dict):
+    """Function to turn a support information container back into `make_support_info` arguments.
+
+    Args:
+        support_info (dict): The `ietf-mud:mud` container, with or without its policies.
+
+    Returns:
+        dict: The keyword arguments of the `make_support_info` call producing the container. Members
+              `make_support_info` doesn't generate (e.g. `extensions`) are left out.
+
+    """
+    return {argument: support_info[key] for key, argument in _SUPPORT_INFO_ARGUMENTS.items() if key in support_info}
+
+
+def parse_policy(policy: dict):
+    """Function to turn a policy container back into its ACL names, the inverse of `make_policy`.
+
+    Args:
+        policy (dict): A `to-device-policy` or `from-device-policy` container.
+
+    Returns:
+        list: The names of the ACLs the policy references, in order.
+
+    """
+    return [access_list['name'] for access_list in policy.get('access-lists', {}).get('access-list', [])]
+
+
+def _add_domains(domains, matches, acl_name, ace_name):
+    for ip_version in ('ipv4', 'ipv6'):
+        ip_match = matches.get(ip_version)
+        if ip_match:
+            for key in ('ietf-acldns:src-dnsname', 'ietf-acldns:dst-dnsname'):
+                if key in ip_match:
+                    domains.setdefault(ip_match[key].rstrip('.').lower(), []).append((acl_name, ace_name))
+    mud_match = matches.get('ietf-mud:mud')
+    if mud_match and 'manufacturer' in mud_match:
+        domains.setdefault(mud_match['manufacturer'].rstrip('.').lower(), []).append((acl_name, ace_name))
+
+
+class MudIndex:
+    """A MUD document loaded into the structures `make_mud` takes, with lookup tables.
+
+    Built by `load_mud` in a single pass over the parsed document. All lookups are dict accesses:
+
+    - `support_info`: the `ietf-mud:mud` container minus its policies, as made by `make_support_info`
+    - `policies`: policy direction to the names of the ACLs it references, as given to `make_policy`
+    - `acls`: ACL name to ACL, as made by `make_acl`, in document order
+    - `aces`: ACE name to the `(acl name, ace)` pairs using it (ACE names are only unique within an ACL)
+    - `domains`: lower-case domain (from `ietf-acldns` names and `manufacturer` matches) to the
+      `(acl name, ace name)` pairs referencing it
+    - `unresolved`: names referenced by a policy without a matching ACL in the document
+
+    """
+    __slots__ = ('support_info', 'policies', 'acls', 'aces', 'domains', 'unresolved')
+
+    def __init__(self, support_info, policies, acls, aces, domains, unresolved=()):
+        self.support_info = support_info
+        self.policies = policies
+        self.acls = acls
+        self.aces = aces
+        self.domains = domains
+        self.unresolved = list(unresolved)
+
+    def policy_acls(self, direction: Direction):
+        """Function to get the ACLs a policy references.
+
+        Args:
+            direction (Direction): `Direction.TO_DEVICE` for to-device-policy, `Direction.FROM_DEVICE` for
+                                   from-device-policy.
+
+        Returns:
+            list: The ACLs, in policy order. Unresolved names are skipped.
+
+        """
+        acls = self.acls
+        return [acls[name] for name in self.policies.get(direction, ()) if name in acls]
+
+    def referencing(self, domain: str):
+        """Function to find the ACEs referencing a domain.
+
+        Returns:
+            list: `(acl name, ace name)` pairs.
+
+        """
+        return self.domains.get(domain.rstrip('.').lower(), [])
+
+    def to_mud(self):
+        """Function to generate the MUD object back from the loaded structures.
+
+        Returns:
+            dict: The MUD object, as returned by `make_mud(support_info, policies, acls)`.
+
+        """
+        policies = {}
+        for direction, acl_names in self.policies.items():
+            policies.update(make_policy(direction, acl_names))
+        return make_mud(support_info=self.support_info, policies=policies, acls=list(self.acls.values()))
+
+
+def load_mud(mud: dict):
+    """Function to load a parsed MUD document.
+
+    Args:
+        mud (dict): The MUD document, e.g. from `json.load`.
+
+    Returns:
+        MudIndex: The loaded document.
+
+    """
+    container = mud.get('ietf-mud:mud') if isinstance(mud, dict) else None
+    if not isinstance(container, dict):
+        raise InputException('mud is not valid: missing ietf-mud:mud container')
+    support_info = {}
+    policies = {}
+    for key, value in container.items():
+        direction = _POLICY_KEYS.get(key)
+        if direction is None:
+            support_info[key] = value
+        else:
+            policies[direction] = parse_policy(value)
+
+    acls = {}
+    aces = {}
+    domains = {}
+    for acl in mud.get('ietf-access-control-list:acls', {}).get('acl', []):
+        acl_name = acl.get('name')
+        if acl_name is None:
+            raise InputException('acl is not valid: missing name')
+        acls[acl_name] = acl
+        for ace in acl.get('aces', {}).get('ace', []):
+            ace_name = ace.get('name')
+            entries = aces.get(ace_name)
+            if entries is None:
+                aces[ace_name] = [(acl_name, ace)]
+            else:
+                entries.append((acl_name, ace))
+            matches = ace.get('matches')
+            if matches:
+                _add_domains(domains, matches, acl_name, ace_name)
+
+    # not an error: make_acls keeps a single ACL per direction, even when the policy names two
+    unresolved = [name for acl_names in policies.values() for name in acl_names if name not in acls]
+    return MudIndex(support_info, policies, acls, aces, domains, unresolved)
+
+
+def loads(data):
+    """Function to load a MUD document from its JSON text (str or bytes)."""
+    try:
+        mud = json.loads(data)
+    except ValueError as e:
+        raise InputException(f'mud is not valid: {e}')
+    return load_mud(mud)
+
+
+def load(fp):
+    """Function to load a MUD document from a file object."""
+    return loads(fp.read())
@@ -1,17 +1,12 @@
-import random
-import re
-from datetime import datetime
-import json
+from functools import lru_cache
 
-from overload import overload
-
-from muddy.constants import DOMAIN_NAME_REGEX, HTTP_URL_REGEX, URN_URL_REGEX
 from muddy.exceptions import InputException
 from muddy.models import MatchType, IPVersion, Protocol, Direction
 from muddy.utils import (
     get_ipversion_string, get_ipversion_suffix_string, get_sub_ace_name,
-    get_ace_name, get_protocol_direction_suffix_string, get_policy_type_prefix_string
+    get_ace_name, get_protocol_direction_suffix_string, get_policy_type_prefix_string, get_spec_digest
 )
+from muddy.validation import is_domain_name, is_uri
 
 
 def make_support_info(mud_version: int, mud_url: str, is_supported: bool, cache_validity: int = None,
@@ -70,8 +65,10 @@ def make_support_info(mud_version: int, mud_url: str, is_supported: bool, cache_
     if cache_validity is not None:
         support_info['cache-validity'] = cache_validity
 
-    support_info['last-update'] = last_update if last_update is not None else datetime.now().strftime(
-        '%Y-%m-%dT%H:%M:%S%z')
+    if last_update is None:
+        from datetime import datetime
+        last_update = datetime.now().strftime('%Y-%m-%dT%H:%M:%S%z')
+    support_info['last-update'] = last_update
 
     return support_info
 
@@ -124,7 +121,7 @@ def make_acldns_match(domain: str, direction: Direction):
         dict: A dictionary representing the ACLDNS match.
 
     """
-    if not re.match(DOMAIN_NAME_REGEX, domain):
+    if not is_domain_name(domain):
         raise InputException(f"Not a domain name: {domain}")
 
     acldns_match = {}
@@ -149,8 +146,8 @@ def make_controller_match(url: str):
         dict: A dictionary representing the controller match.
 
     """
-    if not (re.match(HTTP_URL_REGEX, url) or re.match(URN_URL_REGEX, url)):
-        raise InputException('Not a valid URI: {}' % url)
+    if not is_uri(url):
+        raise InputException(f'Not a valid URI: {url}')
 
     return {'controller': url}
 
@@ -176,8 +173,8 @@ def make_manufacturer_match(domain: str):
         dict: A dictionary representing the manufacturer match.
 
     """
-    if not re.match(DOMAIN_NAME_REGEX, domain):
-        raise InputException("Not a domain name: {domain}")
+    if not is_domain_name(domain):
+        raise InputException(f"Not a domain name: {domain}")
 
     return {'manufacturer': domain}
 
@@ -193,15 +190,19 @@ def make_same_manufacturer_match():
     return {'same-manufacturer': []}
 
 
-def make_sub_ace(sub_ace_name, protocol_direction, target_url, protocol, match_type,
-                 direction_initiated, ip_version, local_port=None, remote_port=None):
-    if len(target_url) > 140:
-        raise InputException('target url is too long: {}' % target_url)
+SUB_ACE_TEMPLATE_CACHE_SIZE = 1024
+"""Maximum number of sub-ACE match templates kept by `make_sub_ace`."""
+
+
+@lru_cache(maxsize=SUB_ACE_TEMPLATE_CACHE_SIZE)
+def _sub_ace_template(match_type, protocol, protocol_direction, ip_version, target_url):
+    """Validate the port-independent inputs of a sub-ACE once, and build the skeleton of its matches.
+
+    Returns the matches skeleton, the transport key the port range goes under (None if there are no ports)
+    and whether the local port is the source port."""
     match = {}
 
     ip_version = get_ipversion_string(ip_version)
-    source_port = None
-    destination_port = None
     cloud_ipv4_entry = None
 
     if match_type is MatchType.IS_CLOUD:
@@ -218,65 +219,111 @@ def make_sub_ace(sub_ace_name, protocol_direction, target_url, protocol, match_t
     if match.get('ietf-mud:mud') is None and cloud_ipv4_entry is None:
         raise InputException(f"match_type is not valid: {match_type}")
 
+    transport = None
     if protocol is Protocol.ANY:
         if cloud_ipv4_entry:
             match[ip_version] = cloud_ipv4_entry
     else:
-        if protocol_direction is Direction.FROM_DEVICE:
-            source_port = remote_port
-            destination_port = local_port
-        elif protocol_direction is Direction.TO_DEVICE:
-            source_port = local_port
-            destination_port = remote_port
         if protocol is Protocol.TCP:
             match[ip_version] = {'protocol': 6}
-            match['tcp'] = make_port_range(direction_initiated, source_port, destination_port)
+            transport = 'tcp'
         elif protocol is Protocol.UDP:
             match[ip_version] = {'protocol': 17}
         else:
             raise InputException(f'protocol is not valid: {protocol}')
         if cloud_ipv4_entry:
             match[ip_version].update(cloud_ipv4_entry)
+    return match, transport, protocol_direction
+
+
+def make_sub_ace(sub_ace_name, protocol_direction, target_url, protocol, match_type,
+                 direction_initiated, ip_version, local_port=None, remote_port=None):
+    if len(target_url) > 140:
+        raise InputException(f'target url is too long: {target_url}')
+    # only the ports and the name change between the sub-ACEs of an ACL: everything else comes from a template
+    template = _sub_ace_template(match_type, protocol, protocol_direction, ip_version, target_url)
+    return _fill_sub_ace(template, sub_ace_name, direction_initiated, local_port, remote_port)
+
+
+def _fill_sub_ace(template, sub_ace_name, direction_initiated, local_port, remote_port):
+    skeleton, transport, protocol_direction = template
+    match = {key: value.copy() for key, value in skeleton.items()}
+    mud_match = match.get('ietf-mud:mud')
+    if mud_match is not None:
+        for key, value in mud_match.items():
+            if isinstance(value, list):
+                mud_match[key] = list(value)
+    if transport is not None:
+        if protocol_direction is Direction.FROM_DEVICE:
+            match[transport] = make_port_range(direction_initiated, remote_port, local_port)
+        elif protocol_direction is Direction.TO_DEVICE:
+            match[transport] = make_port_range(direction_initiated, local_port, remote_port)
+        else:
+            match[transport] = make_port_range(direction_initiated, None, None)
     return {'name': sub_ace_name, 'matches': match, 'actions': {'forwarding': 'accept'}}
 
 
-def make_ace(protocol_direction, target_url, protocol, match_types, direction_initiated, ip_version, local_ports=None,
+def sub_ace_template_cache_info():
+    """Function to get the hit/miss statistics of the sub-ACE template cache used by `make_sub_ace`.
+
+    Returns:
+        CacheInfo: `hits`, `misses`, `maxsize` and `currsize` of the cache, as from `functools.lru_cache`.
+
+    """
+    return _sub_ace_template.cache_info()
+
+
+def iter_ace(protocol_direction, target_url, protocol, match_types, direction_initiated, ip_version, local_ports=None,
              remote_ports=None):
-    ace = []
+    """Function to lazily generate the ACEs of an ACL, one sub-ACE per match type and port pair.
+
+    Yields the same entries, in the same order, as `make_ace`, without holding the
+    local_ports x remote_ports x match_types product in memory.
+
+    """
     number_local_ports = len(local_ports) if type(local_ports) == list else 1
     number_remote_ports = len(remote_ports) if type(remote_ports) == list else 1
+    if number_local_ports == 0 or number_remote_ports == 0:
+        return
     for i in range(len(match_types)) if not isinstance(match_types, MatchType) else range(1):
         match_type = match_types[i] if not isinstance(match_types, MatchType) else match_types
+        ace_name = get_ace_name(match_type)
+        if len(target_url) > 140:
+            raise InputException(f'target url is too long: {target_url}')
+        template = _sub_ace_template(match_type, protocol, protocol_direction, ip_version, target_url)
         for l in range(number_local_ports):
             for r in range(number_remote_ports):
-                ace.append(
-                    make_sub_ace(
-                        get_sub_ace_name(get_ace_name(match_type), direction_initiated, i + l + r),
-                        protocol_direction,
-                        target_url,
-                        protocol, match_type, direction_initiated, ip_version,
-                        local_ports[l] if local_ports is not None else None,
-                        remote_ports[r] if remote_ports is not None else None
-                    )
+                yield _fill_sub_ace(
+                    template,
+                    get_sub_ace_name(ace_name, direction_initiated, i + l + r),
+                    direction_initiated,
+                    local_ports[l] if local_ports is not None else None,
+                    remote_ports[r] if remote_ports is not None else None
                 )
-    return ace
+
+
+def make_ace(protocol_direction, target_url, protocol, match_types, direction_initiated, ip_version, local_ports=None,
+             remote_ports=None):
+    return list(iter_ace(protocol_direction, target_url, protocol, match_types, direction_initiated, ip_version,
+                         local_ports, remote_ports))
 
 
 def make_acl(protocol_direction, ip_version, target_url, protocol, match_types,
-             direction_initiated, local_ports=None, remote_ports=None, acl_name=None, mud_name=None):
+             direction_initiated, local_ports=None, remote_ports=None, acl_name=None, mud_name=None, lazy=False):
     acl_type_prefix = get_ipversion_string(ip_version)
     if acl_name is None and mud_name is None:
         raise InputException('acl_name and mud_name can\'t both by None at the same time')
     elif acl_name is None:
         acl_name = make_acl_name(mud_name, ip_version, direction_initiated)
+    ace = iter_ace if lazy else make_ace
     return {'name': acl_name, 'type': acl_type_prefix,
             'aces': {
-                'ace': make_ace(protocol_direction, target_url, protocol, match_types, direction_initiated, ip_version,
-                                local_ports, remote_ports)}}
+                'ace': ace(protocol_direction, target_url, protocol, match_types, direction_initiated, ip_version,
+                           local_ports, remote_ports)}}
 
 
 def make_acls(ip_version, target_url, protocol, match_types, direction_initiated, local_ports=None, remote_ports=None,
-              acl_names=None, mud_name=None):
+              acl_names=None, mud_name=None, lazy=False):
     acls = {}
     if acl_names is None and mud_name is None:
         raise InputException('acl_names and mud_name can\'t both by None at the same time')
@@ -288,7 +335,7 @@ def make_acls(ip_version, target_url, protocol, match_types, direction_initiated
         for protocol_direction in [Direction.TO_DEVICE, Direction.FROM_DEVICE]:
             acls.update(
                 make_acl(protocol_direction, ip_version[i], target_url, protocol, match_types, direction_initiated,
-                         local_ports, remote_ports, acl_names[i]))
+                         local_ports, remote_ports, acl_names[i], lazy=lazy))
     return acls
 
 
@@ -309,6 +356,25 @@ def make_acl_names(mud_name, ip_version, direction_initiated):
     return acl_names
 
 
+def make_mud_name(spec=None):
+    """Function to generate the name the ACLs of a MUD object are prefixed with.
+
+    Args:
+        spec (dict, optional): The inputs of the MUD object. When given, the name is derived from a hash of
+                               the spec (ignoring `last_update`), so identical inputs get identical names.
+                               Otherwise the name is random.
+
+    Returns:
+        str: A random name of the form `mud-NNNNN`, or `mud-` followed by the first 16 hex digits (64 bits) of the
+             hash of `spec`, so that the names of a large fleet don't collide.
+
+    """
+    if spec is None:
+        import random
+        return f'mud-{random.randint(10000, 99999)}'
+    return f"mud-{get_spec_digest(spec, exclude=('last_update',))[:16]}"
+
+
 def make_policy(direction_initiated, acl_names):
     policy_type_prefix = get_policy_type_prefix_string(direction_initiated)
     access_list = [{'name': name} for name in acl_names]
@@ -317,53 +383,202 @@ def make_policy(direction_initiated, acl_names):
     }
 
 
-@overload
-def make_mud(mud_version, mud_url, is_supported, directions_initiated, ip_version, target_url, protocol, match_types,
-             system_info=None, cache_validity=None, documentation=None, local_ports=None, remote_ports=None,
-             masa_server=None, mfg_name=None, last_update=None, model_name=None):
-    mud_name = f'mud-{random.randint(10000, 99999)}'
-    acl = []
-    policies = {}
-    for direction_initiated in directions_initiated:
-        acl_names = make_acl_names(mud_name, ip_version, direction_initiated)
-        policies.update(make_policy(direction_initiated, acl_names))
-        acl.append(
-            make_acls([ip_version], target_url, protocol, match_types, direction_initiated, local_ports, remote_ports,
-                      acl_names))
-    mud = make_support_info(mud_version, mud_url, is_supported, cache_validity, system_info, documentation, masa_server,
-                            mfg_name, last_update, model_name)
-    mud.update(policies)
-    return {'ietf-mud:mud': mud, 'ietf-access-control-list:acls': {'acl': acl}}
-
-
-@make_mud.add
-def make_mud_2(support_info, directions_initiated, ip_version: IPVersion, target_url, protocol, match_types,
-               local_ports=None, remote_ports=None):
-    acl = []
-    policies = {}
-    mud_name = f'mud-{random.randint(10000, 99999)}'
-    for direction_initiated in directions_initiated:
-        acl_names = make_acl_names(mud_name, ip_version, direction_initiated)
-        policies.update(make_policy(direction_initiated, acl_names))
-        acl.append(
-            make_acls([ip_version], target_url, protocol, match_types, direction_initiated, local_ports, remote_ports,
-                      acl_names))
-    mud = support_info
-    mud.update(policies)
-    return {'ietf-mud:mud': mud, 'ietf-access-control-list:acls': {'acl': acl}}
-
-
-@make_mud.add
-def make_mud_3(policies, acls, mud_version, mud_url, is_supported, cache_validity=None, system_info=None,
-               documentation=None, masa_server=None, mfg_name=None, last_update=None, model_name=None):
-    mud = make_support_info(mud_version, mud_url, is_supported, cache_validity, system_info, documentation, masa_server,
-                            mfg_name, last_update, model_name)
-    mud.update(policies)
-    return {'ietf-mud:mud': mud, 'ietf-access-control-list:acls': {'acl': acls}}
-
-
-@make_mud.add
-def make_mud_4(support_info, policies, acls):
-    mud = support_info
-    mud.update(policies)
-    return {'ietf-mud:mud': mud, 'ietf-access-control-list:acls': {'acl': acls}}
+def _deterministic_spec(arguments):
+    spec = {key: value for key, value in arguments.items() if key != 'deterministic'}
+    if 'support_info' in spec:
+        # make_support_info always stamps last-update, so it is lifted out to be ignored like last_update
+        spec['support_info'] = dict(spec['support_info'])
+        spec['last_update'] = spec['support_info'].pop('last-update', None)
+    if spec.get('last_update') is None:
+        raise InputException('last_update is required to generate a deterministic MUD object')
+    return spec
+
+
+def _freeze(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+_ACL_IP_VERSIONS = {IPVersion.IPV4: (IPVersion.IPV4,), IPVersion.IPV6: (IPVersion.IPV6,),
+                    IPVersion.BOTH: (IPVersion.IPV4, IPVersion.IPV6)}
+ACL_NAME_SUFFIXES = {
+    (ip_version, direction): f'{get_ipversion_suffix_string(ip_version)}{get_protocol_direction_suffix_string(direction)}'
+    for ip_version in (IPVersion.IPV4, IPVersion.IPV6) for direction in Direction
+}
+"""Suffix of the ACL names made by `make_acl_names` for each `(ip_version, direction)`, e.g. `-v4to`."""
+POLICY_KEYS = {direction: f'{get_policy_type_prefix_string(direction)}-device-policy' for direction in Direction}
+"""Member of the `ietf-mud:mud` container holding the policy of each direction, e.g. `to-device-policy`."""
+
+
+class MudBuilder:
+    """Builder for MUD objects, an explicit alternative to the `make_mud` overloads.
+
+    Example:
+        mud = MudBuilder().support(1, 'https://lighting.example.com/lightbulb2000', True, 48) \\
+            .allow([Direction.TO_DEVICE, Direction.FROM_DEVICE], IPVersion.IPV4, 'test.example.com',
+                   Protocol.ANY, [MatchType.IS_MYMFG], [88, 443], [88, 443]) \\
+            .build()
+
+    ACL and policy names are assembled from fragments computed once at import time, and nothing is
+    generated until `build` is called.
+
+    Args:
+        name (str, optional): Name the ACLs are prefixed with. A random `mud-NNNNN` name is used if None.
+
+    """
+    __slots__ = ('_name', '_support_info', '_rules', '_policies', '_acls')
+
+    def __init__(self, name: str = None):
+        self._name = name
+        self._support_info = None
+        self._rules = []
+        self._policies = []
+        self._acls = []
+
+    def support(self, mud_version: int, mud_url: str, is_supported: bool, cache_validity: int = None,
+                system_info: str = None, documentation: str = None, masa_server: str = None, mfg_name: str = None,
+                last_update: str = None, model_name: str = None, firmware_rev: str = None,
+                software_rev: str = None):
+        """Set the support information of the MUD object. Takes the arguments of `make_support_info`."""
+        self._support_info = make_support_info(mud_version, mud_url, is_supported, cache_validity, system_info,
+                                               documentation, masa_server, mfg_name, last_update, model_name,
+                                               firmware_rev, software_rev)
+        return self
+
+    def support_info(self, support_info: dict):
+        """Set the support information of the MUD object from a `make_support_info` result."""
+        self._support_info = support_info
+        return self
+
+    def allow(self, directions_initiated, ip_version: IPVersion, target_url: str, protocol: Protocol, match_types,
+              local_ports=None, remote_ports=None):
+        """Add ACLs allowing traffic with a target, for each direction in `directions_initiated`.
+        Takes the same arguments as `make_acls`."""
+        if ip_version not in _ACL_IP_VERSIONS:
+            raise InputException(f'ip_version is not valid: {ip_version}')
+        self._rules.append((directions_initiated, ip_version, target_url, protocol, match_types, local_ports,
+                            remote_ports))
+        return self
+
+    def acls(self, policies: dict, acls: list):
+        """Add already generated policies and ACLs, e.g. from `make_policy` and `make_acls`."""
+        self._policies.append(policies)
+        self._acls.extend(acls)
+        return self
+
+    def build(self, acl_cache: dict = None):
+        """Generate the MUD object.
+
+        Args:
+            acl_cache (dict, optional): ACLs of earlier builds, keyed by their names and inputs. ACLs found in it
+                                        are reused instead of generated, and every ACL of this build is stored
+                                        in it. Reused ACLs are shared between the MUD objects, see
+                                        `muddy.diff.Regenerator`.
+
+        Returns:
+            dict: The MUD object, as returned by `make_mud`.
+
+        """
+        if self._support_info is None:
+            raise InputException('support information is required to build a MUD object')
+        mud_name = self._name if self._name is not None else make_mud_name()
+        acl = []
+        policies = {}
+        for index, (directions_initiated, ip_version, target_url, protocol, match_types, local_ports,
+                    remote_ports) in enumerate(self._rules):
+            # ACLs of later rules get their own prefix so that names stay unique
+            prefix = mud_name if index == 0 else f'{mud_name}-{index}'
+            for direction_initiated in directions_initiated:
+                acl_names = [f'{prefix}{ACL_NAME_SUFFIXES[(version, direction_initiated)]}'
+                             for version in _ACL_IP_VERSIONS[ip_version]]
+                access_list = policies.setdefault(POLICY_KEYS[direction_initiated],
+                                                  {'access-lists': {'access-list': []}})
+                access_list['access-lists']['access-list'].extend({'name': name} for name in acl_names)
+                if acl_cache is None:
+                    acl.append(
+                        make_acls([ip_version], target_url, protocol, match_types, direction_initiated, local_ports,
+                                  remote_ports, acl_names))
+                    continue
+                key = (tuple(acl_names), ip_version, target_url, protocol, _freeze(match_types), direction_initiated,
+                       _freeze(local_ports), _freeze(remote_ports))
+                acls = acl_cache.get(key)
+                if acls is None:
+                    acls = make_acls([ip_version], target_url, protocol, match_types, direction_initiated,
+                                     local_ports, remote_ports, acl_names)
+                # stored even when found, so that a ChainMap cache collects the ACLs of this build in its first map
+                acl_cache[key] = acls
+                acl.append(acls)
+        for extra_policies in self._policies:
+            policies.update(extra_policies)
+        acl.extend(self._acls)
+
+        mud = dict(self._support_info)
+        mud.update(policies)
+        return {'ietf-mud:mud': mud, 'ietf-access-control-list:acls': {'acl': acl}}
+
+
+def _make_mud(mud_version, mud_url, is_supported, directions_initiated, ip_version, target_url, protocol, match_types,
+               system_info=None, cache_validity=None, documentation=None, local_ports=None, remote_ports=None,
+              masa_server=None, mfg_name=None, last_update=None, model_name=None, deterministic=False):
+    mud_name = make_mud_name(_deterministic_spec(locals()) if deterministic else None)
+    return MudBuilder(mud_name) \
+        .support(mud_version, mud_url, is_supported, cache_validity, system_info, documentation, masa_server,
+                 mfg_name, last_update, model_name) \
+        .allow(directions_initiated, ip_version, target_url, protocol, match_types, local_ports, remote_ports) \
+        .build()
+
+
+def _make_mud_2(support_info, directions_initiated, ip_version: IPVersion, target_url, protocol, match_types,
+                local_ports=None, remote_ports=None, deterministic=False):
+    mud_name = make_mud_name(_deterministic_spec(locals()) if deterministic else None)
+    return MudBuilder(mud_name).support_info(support_info) \
+        .allow(directions_initiated, ip_version, target_url, protocol, match_types, local_ports, remote_ports) \
+        .build()
+
+
+def _make_mud_3(policies, acls, mud_version, mud_url, is_supported, cache_validity=None, system_info=None,
+                documentation=None, masa_server=None, mfg_name=None, last_update=None, model_name=None):
+    return MudBuilder() \
+        .support(mud_version, mud_url, is_supported, cache_validity, system_info, documentation, masa_server,
+                 mfg_name, last_update, model_name) \
+        .acls(policies, acls) \
+        .build()
+
+
+def _make_mud_4(support_info, policies, acls):
+    return MudBuilder().support_info(support_info).acls(policies, acls).build()
+
+
+@lru_cache(maxsize=None)
+def _make_mud_overloads():
+    # overload imports unittest, which used to make up most of the import time of this module
+    from overload import overload
+    dispatcher = overload(_make_mud)
+    for implementation in (_make_mud_2, _make_mud_3, _make_mud_4):
+        dispatcher.add(implementation)
+    return dispatcher
+
+
+def make_mud(*args, **kwargs):
+    """Function to generate a MUD object, dispatching on the arguments to one of four signatures:
+
+        make_mud(mud_version, mud_url, is_supported, directions_initiated, ip_version, target_url, protocol,
+                 match_types, system_info=None, cache_validity=None, documentation=None, local_ports=None,
+                 remote_ports=None, masa_server=None, mfg_name=None, last_update=None, model_name=None,
+                 deterministic=False)
+        make_mud(support_info, directions_initiated, ip_version, target_url, protocol, match_types,
+                 local_ports=None, remote_ports=None, deterministic=False)
+        make_mud(policies, acls, mud_version, mud_url, is_supported, cache_validity=None, system_info=None,
+                 documentation=None, masa_server=None, mfg_name=None, last_update=None, model_name=None)
+        make_mud(support_info, policies, acls)
+
+    The dispatcher is built, and `overload` imported, on the first call.
+
+    Returns:
+        dict: The MUD object.
+
+    """
+    return _make_mud_overloads()(*args, **kwargs)
+
+
+# the overloads used to be registered under these names, which all referred to the dispatcher
+make_mud_2 = make_mud_3 = make_mud_4 = make_mud
@@ -0,0 +1,319 @@
+import hashlib
+import ipaddress
+import marshal
+import re
+from collections import namedtuple
+from urllib.parse import urlparse
+
+from muddy.evaluator import port_condition
+from muddy.exceptions import InputException
+from muddy.loader import load_mud
+from muddy.models import Direction
+
+NftStats = namedtuple('NftStats', ['devices', 'aces', 'chains', 'rules', 'sets'])
+NftStats.__doc__ = '''Counts of an `NftCompiler`: devices added, ACEs compiled (what a rule-per-ACE translation would
+emit), chains, rules and named sets of the ruleset.'''
+
+_PROTOCOLS = {6: 'tcp', 17: 'udp'}
+_DNSNAME_FIELDS = ('ietf-acldns:src-dnsname', 'ietf-acldns:dst-dnsname')
+_DIRECTION_INITIATED = {'to-device': Direction.TO_DEVICE, 'from-device': Direction.FROM_DEVICE}
+_SET_TYPES = {'ip': 'ipv4_addr', 'ip6': 'ipv6_addr'}
+_MAX_NAME_LENGTH = 48
+
+
+def _merge_conditions(conditions):
+    # None (any port) covers everything, inclusive ranges are merged when they overlap or touch
+    if None in conditions:
+        return [None]
+    merged = []
+    for lower, upper, negate in sorted(condition for condition in conditions if not condition[2]):
+        if merged and lower <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], upper), False)
+        else:
+            merged.append((lower, upper, False))
+    return merged + sorted(condition for condition in conditions if condition[2])
+
+
+def _format_port(condition):
+    lower, upper, negate = condition
+    value = str(lower) if lower == upper else f'{lower}-{upper}'
+    return f'!= {value}' if negate else value
+
+
+def _format_ports(conditions):
+    # negated conditions can't go in a set: each gets a rule of its own
+    positive = [condition for condition in conditions if condition is not None and not condition[2]]
+    alternatives = [None] if None in conditions else []
+    if len(positive) == 1:
+        alternatives.append(_format_port(positive[0]))
+    elif positive:
+        alternatives.append(f'{{ {", ".join(_format_port(condition) for condition in positive)} }}')
+    alternatives.extend(_format_port(condition) for condition in conditions if condition is not None and condition[2])
+    return alternatives
+
+
+def _merge_ports(pairs):
+    """Merge (source, destination) port conditions into (sources, destinations) products matching the same pairs."""
+    by_source = {}
+    for source, destination in pairs:
+        by_source.setdefault(source, set()).add(destination)
+    by_destinations = {}
+    for source, destinations in by_source.items():
+        by_destinations.setdefault(tuple(_merge_conditions(destinations)), set()).add(source)
+    products = {}
+    for destinations, sources in by_destinations.items():
+        sources = tuple(_merge_conditions(sources))
+        # a source set seen with several destination sets after merging gets them united
+        products[sources] = tuple(_merge_conditions(set(products.get(sources, ())) | set(destinations)))
+    return products.items()
+
+
+class NftCompiler:
+    """Compiler of the MUD policies of devices into an nftables ruleset.
+
+    Each device gets one chain per policy direction, which returns what its ACEs accept and drops the rest. Its ACEs are
+    merged: ACEs only differing in ports become one rule with anonymous port sets, and when a chain has rules for both
+    TCP and UDP, a `meta l4proto` verdict map goes to per-protocol chains after the rules matching any protocol, so a
+    packet is only checked against those and the rules of its protocol. Chains are named after a hash of their rules, so
+    devices with the same policies share them. The base chain accepts established and related traffic, then jumps to the
+    chains of the source device's from-device policy and of the destination device's to-device policy, through verdict
+    maps keyed on device addresses. A packet is only accepted once it returned from both, so traffic between two devices
+    has to pass the policies of each.
+
+    Domain names (`ietf-acldns`) and the `ietf-mud:mud` classes (manufacturer, same-manufacturer, controller,
+    my-controller) become named address sets with timeouts, for the MUD manager to fill in. All of them match the
+    remote host of their policy: the source address of to-device traffic, the destination address of from-device
+    traffic, whether a name is given as `src-dnsname` or `dst-dnsname`, as in `muddy.evaluator`.
+
+    Since the base chain accepts established traffic, ACEs whose `ietf-mud:direction-initiated` is the other
+    side of the policy only match packets that are already accepted, and are left out. Only ACEs accepting
+    traffic can be compiled, as rules are reordered.
+
+    Args:
+        table (str, optional): Name of the `inet` table holding the ruleset.
+        hook (str, optional): Netfilter hook of the base chain, e.g. `forward` on a gateway.
+        priority (str, optional): Priority of the base chain.
+
+    """
+
+    def __init__(self, table: str = 'muddy', hook: str = 'forward', priority: str = 'filter'):
+        self.table = table
+        self.hook = hook
+        self.priority = priority
+        self._sets = {}
+        self._chains = {}
+        self._dispatch = {}
+        self._devices = set()
+        self._aces = 0
+        self._set_names = {}
+        self._compiled = {}
+
+    def _set(self, kind, value, family):
+        name = self._set_names.get((kind, value, family))
+        if name is None:
+            name = self._set_names[(kind, value, family)] = self._new_set(kind, value, family)
+        return name
+
+    def _new_set(self, kind, value, family):
+        if not isinstance(value, str) or not value:
+            raise InputException(f'{kind} is not valid: {value}')
+        value = value.rstrip('.').lower()
+        name = f'{kind}{4 if family == "ip" else 6}_{re.sub("[^a-z0-9]+", "_", value).strip("_")}'
+        if len(name) > _MAX_NAME_LENGTH or self._sets.get(name, (None, value))[1] != value:
+            name = f'{name[:_MAX_NAME_LENGTH - 9]}_{hashlib.sha256(value.encode()).hexdigest()[:8]}'
+        self._sets[name] = (_SET_TYPES[family], value)
+        return name
+
+    def _parse_ace(self, ace, direction, family, mud_url):
+        name = ace.get('name')
+        if ace.get('actions', {}).get('forwarding') != 'accept':
+            raise InputException(f'ace is not valid: {name} does not accept traffic')
+        remote = 'daddr' if direction is Direction.FROM_DEVICE else 'saddr'
+        addresses = []
+        protocol = source = destination = None
+        for key, value in ace.get('matches', {}).items():
+            if key in ('ipv4', 'ipv6'):
+                family = 'ip' if key == 'ipv4' else 'ip6'
+                for field, item in value.items():
+                    if field == 'protocol':
+                        protocol = _PROTOCOLS.get(item, item)
+                    elif field in _DNSNAME_FIELDS:
+                        addresses.append((remote, 'dns', item))
+                    else:
+                        raise InputException(f'ace is not valid: {name} matches on {field}')
+            elif key in ('tcp', 'udp'):
+                protocol = key
+                for field, item in value.items():
+                    if field == 'source-port':
+                        source = port_condition(item)
+                    elif field == 'destination-port':
+                        destination = port_condition(item)
+                    elif field == 'ietf-mud:direction-initiated':
+                        if _DIRECTION_INITIATED.get(item) is not direction:
+                            return None
+                    else:
+                        raise InputException(f'ace is not valid: {name} matches on {field}')
+            elif key == 'ietf-mud:mud':
+                for field, item in value.items():
+                    if field == 'manufacturer':
+                        addresses.append((remote, 'mfg', item))
+                    elif field == 'same-manufacturer':
+                        addresses.append((remote, 'mfg', urlparse(mud_url or '').hostname))
+                    elif field == 'controller':
+                        addresses.append((remote, 'ctl', item))
+                    elif field == 'my-controller':
+                        addresses.append((remote, 'myctl', mud_url))
+                    else:
+                        raise InputException(f'ace is not valid: {name} matches on {field}')
+            else:
+                raise InputException(f'ace is not valid: {name} matches on {key}')
+        addresses = tuple(sorted((field, self._set(kind, value, family)) for field, kind, value in addresses))
+        return (family, addresses, protocol), (source, destination)
+
+    def _chain(self, rules):
+        name = f'mud_{hashlib.sha256(chr(10).join(rules).encode()).hexdigest()[:12]}'
+        self._chains.setdefault(name, rules)
+        return name
+
+    @staticmethod
+    def _rules(family, addresses, protocol, pairs, explicit_protocol):
+        prefix = [f'{family} {field} @{name}' for field, name in addresses] or [f'meta nfproto ipv{family[2:] or 4}']
+        rules = []
+        for sources, destinations in _merge_ports(pairs):
+            if protocol not in ('tcp', 'udp'):
+                if sources != (None,) or destinations != (None,):
+                    raise InputException(f'ports are not valid without tcp or udp: protocol {protocol}')
+                rules.append(' '.join(prefix + ([f'meta l4proto {protocol}'] if protocol is not None else [])))
+                continue
+            for source in _format_ports(sources):
+                for destination in _format_ports(destinations):
+                    parts = list(prefix)
+                    if source is not None:
+                        parts.append(f'{protocol} sport {source}')
+                    if destination is not None:
+                        parts.append(f'{protocol} dport {destination}')
+                    if explicit_protocol and source is None and destination is None:
+                        parts.append(f'meta l4proto {protocol}')
+                    rules.append(' '.join(parts))
+        # return to the base chain, which checks the policy of the device on the other side
+        return [f'{rule} return' for rule in rules]
+
+    def _device_chain(self, direction, acls, mud_url):
+        # devices of the same model have the same ACLs but for their names: their chains are only compiled once
+        try:
+            key = marshal.dumps((direction is Direction.FROM_DEVICE, mud_url,
+                                 [(acl.get('type'), acl.get('aces')) for acl in acls]), 2)
+        except ValueError:
+            key = None
+        compiled = self._compiled.get(key) if key is not None else None
+        if compiled is None:
+            compiled = self._compile_chain(direction, acls, mud_url)
+            if key is not None:
+                self._compiled[key] = compiled
+        chain, aces = compiled
+        self._aces += aces
+        return chain
+
+    def _compile_chain(self, direction, acls, mud_url):
+        aces = 0
+        groups = {}
+        for acl in acls:
+            family = 'ip6' if str(acl.get('type', '')).startswith('ipv6') else 'ip'
+            for ace in acl.get('aces', {}).get('ace', []):
+                aces += 1
+                parsed = self._parse_ace(ace, direction, family, mud_url)
+                if parsed is not None:
+                    key, ports = parsed
+                    groups.setdefault(key, []).append(ports)
+        by_protocol = {}
+        for key in groups:
+            by_protocol.setdefault(key[2], []).append(key)
+        dispatch = len([protocol for protocol in by_protocol if protocol in ('tcp', 'udp')]) > 1
+        rules = []
+        jumps = []
+        for protocol in sorted(by_protocol, key=str):
+            protocol_rules = sorted(rule for key in by_protocol[protocol]
+                                    for rule in self._rules(*key, groups[key], not dispatch))
+            if dispatch and protocol in ('tcp', 'udp'):
+                # goto, so that the return of a rule of the protocol chain goes back to the base chain
+                jumps.append(f'{protocol} : goto {self._chain(protocol_rules + ["drop"])}')
+            else:
+                rules.extend(protocol_rules)
+        if jumps:
+            # after the rules of any protocol, since the protocol chains end in drop
+            rules.append(f'meta l4proto vmap {{ {", ".join(jumps)} }}')
+        rules.append('drop')
+        return self._chain(rules), aces
+
+    def add(self, address: str, mud: dict):
+        """Function to compile the policies of a device.
+
+        Args:
+            address (str): IPv4 or IPv6 address of the device.
+            mud (dict): The MUD object of the device.
+
+        Returns:
+            tuple: The names of the chains of its from-device and to-device policies.
+
+        """
+        try:
+            address = ipaddress.ip_address(address)
+        except ValueError:
+            raise InputException(f'address is not valid: {address}')
+        if address in self._devices:
+            raise InputException(f'address is not valid: {address} was already added')
+        index = load_mud(mud)
+        mud_url = index.support_info.get('mud-url')
+        family = 'ip' if address.version == 4 else 'ip6'
+        chains = []
+        for direction, field in ((Direction.FROM_DEVICE, 'saddr'), (Direction.TO_DEVICE, 'daddr')):
+            chain = self._device_chain(direction, index.policy_acls(direction), mud_url)
+            self._dispatch.setdefault((family, field), []).append((address, chain))
+            chains.append(chain)
+        self._devices.add(address)
+        return tuple(chains)
+
+    def stats(self):
+        """Function to count what the ruleset holds.
+
+        Returns:
+            NftStats: The counts.
+
+        """
+        rules = sum(len(rules) for rules in self._chains.values()) + 1 + len(self._dispatch)
+        return NftStats(len(self._devices), self._aces, len(self._chains) + 1, rules, len(self._sets))
+
+    def render(self):
+        """Function to generate the ruleset.
+
+        Returns:
+            str: An `nft -f` script replacing the table with the ruleset.
+
+        """
+        lines = [f'table inet {self.table}', f'delete table inet {self.table}', f'table inet {self.table} {{']
+        for name, (set_type, _) in sorted(self._sets.items()):
+            lines.extend([f'\tset {name} {{', f'\t\ttype {set_type}', '\t\tflags timeout', '\t}', ''])
+        for name, rules in self._chains.items():
+            lines.append(f'\tchain {name} {{')
+            lines.extend(f'\t\t{rule}' for rule in rules)
+            lines.extend(['\t}', ''])
+        lines.extend([f'\tchain {self.hook} {{',
+                      f'\t\ttype filter hook {self.hook} priority {self.priority}; policy accept;',
+                      '\t\tct state established,related accept'])
+        for (family, field), devices in sorted(self._dispatch.items()):
+            entries = ', '.join(f'{address} : jump {chain}' for address, chain in sorted(devices))
+            lines.append(f'\t\t{family} {field} vmap {{ {entries} }}')
+        lines.extend(['\t}', '}'])
+        return '\n'.join(lines) + '\n'
+
+
+def compile_mud(mud: dict, address: str, table: str = 'muddy'):
+    """Function to compile the policies of a single device into an nftables ruleset.
+
+    Returns:
+        str: An `nft -f` script, see `NftCompiler`.
+
+    """
+    compiler = NftCompiler(table)
+    compiler.add(address, mud)
+    return compiler.render()
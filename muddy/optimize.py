@@ -0,0 +1,195 @@
+import copy
+import json
+from collections import namedtuple
+
+CompressionStats = namedtuple('CompressionStats', ['aces_before', 'aces_after', 'saved'])
+CompressionStats.__doc__ = """Number of ACEs before and after compression, and how many entries were saved."""
+
+_PORT_KEYS = ('source-port', 'destination-port')
+_TRANSPORT_KEYS = ('tcp', 'udp')
+
+
+def make_port_match(lower_port: int, upper_port: int):
+    """Function to generate a source-port or destination-port container for a port or a port range.
+
+    Args:
+        lower_port (int): First port of the range.
+        upper_port (int): Last port of the range, inclusive. Equal to `lower_port` for a single port.
+
+    Returns:
+        dict: An `eq` operator container for a single port, otherwise an RFC 8519
+              `lower-port`/`upper-port` range container.
+
+    """
+    if lower_port == upper_port:
+        return {'operator': 'eq', 'port': lower_port}
+    return {'lower-port': lower_port, 'upper-port': upper_port}
+
+
+def _port_ranges(ports):
+    ranges = []
+    for port in sorted(ports):
+        if ranges and ranges[-1][1] + 1 == port:
+            ranges[-1][1] = port
+        else:
+            ranges.append([port, port])
+    return [tuple(port_range) for port_range in ranges]
+
+
+def _split_ace(ace):
+    """Split an ACE into a port-less grouping key, a port-less matches template and its (source, destination)
+    port pair. Returns None for the pair when the ports can't be merged (non-`eq` operators)."""
+    matches = copy.deepcopy(ace.get('matches', {}))
+    pair = [None, None]
+    for transport in _TRANSPORT_KEYS:
+        port_range = matches.get(transport)
+        if not isinstance(port_range, dict):
+            continue
+        for i, port_key in enumerate(_PORT_KEYS):
+            port = port_range.get(port_key)
+            if port is None:
+                continue
+            if port.get('operator') != 'eq' or len(port) != 2:
+                return None, None, None
+            pair[i] = (transport, port['port'])
+            del port_range[port_key]
+    key = json.dumps([matches, ace.get('actions')], sort_keys=True)
+    return key, matches, tuple(pair)
+
+
+def _merge_pairs(pairs):
+    """Merge a set of (source, destination) port pairs into (source range, destination range) rectangles.
+
+    Returns a list of (source range, destination range, covered pairs) tuples."""
+    destinations_by_source = {}
+    for source, destination in pairs:
+        destinations_by_source.setdefault(source, set()).add(destination)
+
+    sources_by_ranges = {}
+    for source, destinations in destinations_by_source.items():
+        sources_by_ranges.setdefault(tuple(_to_ranges(destinations)), []).append(source)
+
+    merged = []
+    for ranges, sources in sources_by_ranges.items():
+        source_ranges = _to_ranges(sources)
+        covered = {(source_range, destination_range): []
+                   for source_range in source_ranges for destination_range in ranges}
+        for source in sources:
+            source_range = next(r for r in source_ranges if _covers(r, source))
+            for destination in destinations_by_source[source]:
+                destination_range = next(r for r in ranges if _covers(r, destination))
+                covered[(source_range, destination_range)].append((source, destination))
+        merged.extend((source_range, destination_range, pairs)
+                      for (source_range, destination_range), pairs in covered.items())
+    return merged
+
+
+def _to_ranges(ports):
+    """Turn (transport, port) values into sorted (transport, (lower, upper)) ranges. None (ANY) is kept as is."""
+    ports = list(ports)
+    ranges = [(transport, r) for transport in sorted({p[0] for p in ports if p is not None})
+              for r in _port_ranges(p[1] for p in ports if p is not None and p[0] == transport)]
+    if None in ports:
+        ranges.append(None)
+    return ranges
+
+
+def _covers(port_range, port):
+    if port_range is None or port is None:
+        return port_range is None and port is None
+    return port_range[0] == port[0] and port_range[1][0] <= port[1] <= port_range[1][1]
+
+
+def compress_acl(acl):
+    """Function to compress the ACEs of an ACL without changing the policy it describes.
+
+    Contiguous `eq` ports of otherwise identical ACEs are merged into `lower-port`/`upper-port` ranges,
+    and ACEs with identical matches (including across match types) are collapsed. Each remaining ACE keeps
+    the name of an ACE it replaces. ACEs are only merged when every ACE of the ACL has the same actions,
+    so that reordering can't change which ACE matches first; otherwise only exact duplicates are removed.
+
+    Args:
+        acl (dict): An ACL, as returned by `make_acl` / `make_acls`.
+
+    Returns:
+        tuple: The compressed ACL (the input is not modified) and its `CompressionStats`.
+
+    """
+    aces = list(acl['aces']['ace'])
+    uniform = len({json.dumps(ace.get('actions'), sort_keys=True) for ace in aces}) <= 1
+
+    groups = {}
+    order = []
+    for index, ace in enumerate(aces):
+        key, template, pair = _split_ace(ace) if uniform else (None, None, None)
+        if key is None:
+            key = json.dumps([ace.get('matches'), ace.get('actions')], sort_keys=True)
+            template = pair = None
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {'ace': ace, 'template': template, 'members': {}}
+            order.append(key)
+        group['members'].setdefault(pair, []).append(index)
+
+    used_names = set()
+    compressed = []
+    for key in order:
+        group = groups[key]
+        if group['template'] is None:
+            compressed.append(copy.deepcopy(group['ace']))
+            used_names.add(group['ace'].get('name'))
+            continue
+        for source_range, destination_range, pairs in _merge_pairs(group['members']):
+            covered = sorted(index for pair in pairs for index in group['members'][pair])
+            names = [aces[index].get('name') for index in covered]
+            name = next((n for n in names if n not in used_names), names[0])
+            used_names.add(name)
+
+            matches = copy.deepcopy(group['template'])
+            for port_key, port_range in zip(_PORT_KEYS, (source_range, destination_range)):
+                if port_range is not None:
+                    transport, (lower_port, upper_port) = port_range
+                    matches[transport][port_key] = make_port_match(lower_port, upper_port)
+            ace = {'name': name, 'matches': matches}
+            ace.update({k: copy.deepcopy(v) for k, v in group['ace'].items() if k not in ('name', 'matches')})
+            compressed.append(ace)
+
+    result = {k: v for k, v in acl.items() if k != 'aces'}
+    result['aces'] = {'ace': compressed}
+    return result, CompressionStats(len(aces), len(compressed), len(aces) - len(compressed))
+
+
+def compress_acls(acls):
+    """Function to compress a list of ACLs with `compress_acl`.
+
+    Args:
+        acls (list): ACLs, e.g. the `ietf-access-control-list:acls` `acl` list of a MUD object.
+
+    Returns:
+        tuple: The list of compressed ACLs and the combined `CompressionStats`.
+
+    """
+    compressed = []
+    before = after = 0
+    for acl in acls:
+        acl, stats = compress_acl(acl)
+        compressed.append(acl)
+        before += stats.aces_before
+        after += stats.aces_after
+    return compressed, CompressionStats(before, after, before - after)
+
+
+def compress_mud(mud):
+    """Function to compress every ACL of a MUD object with `compress_acl`.
+
+    Args:
+        mud (dict): A MUD object, as returned by `make_mud`.
+
+    Returns:
+        tuple: A new MUD object with compressed ACLs and the combined `CompressionStats`.
+
+    """
+    acls, stats = compress_acls(mud['ietf-access-control-list:acls']['acl'])
+    result = dict(mud)
+    result['ietf-access-control-list:acls'] = {'acl': acls}
+    return result, stats
@@ -0,0 +1,446 @@
+import asyncio
+import heapq
+import ipaddress
+import math
+import random
+import socket
+import struct
+import time
+from collections import namedtuple
+
+from muddy.exceptions import InputException
+from muddy.models import IPVersion
+
+Answer = namedtuple('Answer', ['addresses', 'ttl', 'error'], defaults=[None])
+Answer.__doc__ = '''Addresses of a domain, as returned by `DnsCache.resolve`: a tuple of address strings (empty for a
+negative answer), the seconds they remain valid for, and the error that prevented the lookup, if any.'''
+
+_QUERY_TYPES = {IPVersion.IPV4: 1, IPVersion.IPV6: 28}
+_FAMILIES = {IPVersion.IPV4: socket.AF_INET, IPVersion.IPV6: socket.AF_INET6}
+_ACLDNS_KEYS = ('ietf-acldns:src-dnsname', 'ietf-acldns:dst-dnsname')
+_SOA = 6
+_NXDOMAIN = 3
+_HEADER = struct.Struct('!HHHHHH')
+_RECORD = struct.Struct('!HHIH')
+
+
+def acldns_names(mud: dict):
+    """Function to collect the domains a MUD object's ACLs match on through `ietf-acldns`.
+
+    Returns:
+        set: `(domain, IPVersion)` pairs, the IP version being that of the match the name appears in.
+
+    """
+    names = set()
+    for acl in mud.get('ietf-access-control-list:acls', {}).get('acl', []):
+        for ace in acl.get('aces', {}).get('ace', []):
+            matches = ace.get('matches', {})
+            for key, ip_version in (('ipv4', IPVersion.IPV4), ('ipv6', IPVersion.IPV6)):
+                for name_key in _ACLDNS_KEYS:
+                    domain = matches.get(key, {}).get(name_key)
+                    if domain:
+                        names.add((domain.rstrip('.').lower(), ip_version))
+    return names
+
+
+class SystemBackend:
+    """Backend resolving through `getaddrinfo`, i.e. the system resolver. It doesn't see TTLs, so every positive
+       answer gets the same one.
+
+    Args:
+        ttl (int, optional): TTL given to answers, in seconds.
+
+    """
+
+    def __init__(self, ttl: int = 300):
+        self.ttl = ttl
+
+    async def lookup(self, domain: str, ip_version: IPVersion):
+        """Function to look up the addresses of a domain.
+
+        Returns:
+            tuple: The addresses and their TTL. No addresses, and a TTL or None, for a negative answer.
+
+        Raises:
+            OSError: If the lookup failed.
+
+        """
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(domain, None, family=_FAMILIES[ip_version],
+                                                                 type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            if e.errno in (socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)):
+                return [], None
+            raise
+        return sorted({info[4][0] for info in infos}), self.ttl
+
+
+def _encode_name(domain):
+    data = b''
+    for label in domain.rstrip('.').split('.'):
+        try:
+            encoded = label.encode('ascii')
+        except UnicodeEncodeError:
+            raise InputException(f'domain is not valid: {domain}')
+        if not 0 < len(encoded) < 64:
+            raise InputException(f'domain is not valid: {domain}')
+        data += bytes([len(encoded)]) + encoded
+    return data + b'\0'
+
+
+def _skip_name(message, offset):
+    while True:
+        if offset >= len(message):
+            raise OSError('dns message is truncated')
+        length = message[offset]
+        if length & 0xc0 == 0xc0:
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += length + 1
+
+
+def _parse_response(message, query_id, query_type):
+    """Parse a DNS response into the addresses of the queried type, with their smallest TTL, or for a negative
+    answer no addresses and the negative caching TTL of the SOA record (RFC 2308), if there is one."""
+    if len(message) < _HEADER.size:
+        raise OSError('dns message is truncated')
+    response_id, flags, questions, answers, authorities, _ = _HEADER.unpack_from(message)
+    if response_id != query_id or not flags & 0x8000:
+        raise OSError('dns response does not match the query')
+    rcode = flags & 0xf
+    if rcode not in (0, _NXDOMAIN):
+        raise OSError(f'dns server answered with rcode {rcode}')
+    offset = _HEADER.size
+    for _ in range(questions):
+        offset = _skip_name(message, offset) + 4
+    addresses = []
+    ttl = None
+    negative_ttl = None
+    for index in range(answers + authorities):
+        offset = _skip_name(message, offset)
+        if offset + _RECORD.size > len(message):
+            raise OSError('dns message is truncated')
+        record_type, _, record_ttl, length = _RECORD.unpack_from(message, offset)
+        offset += _RECORD.size
+        data = message[offset:offset + length]
+        if index < answers:
+            # CNAME records of the chain count towards the TTL too
+            ttl = record_ttl if ttl is None else min(ttl, record_ttl)
+            if record_type == query_type:
+                addresses.append(str(ipaddress.ip_address(data)))
+        elif record_type == _SOA:
+            minimum_offset = _skip_name(message, _skip_name(message, offset)) + 16
+            minimum, = struct.unpack_from('!I', message, minimum_offset)
+            negative_ttl = min(record_ttl, minimum)
+        offset += length
+    if not addresses:
+        return [], negative_ttl
+    return addresses, ttl
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, future):
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+def _nameservers(path='/etc/resolv.conf'):
+    try:
+        with open(path) as fp:
+            return [line.split()[1] for line in fp if line.startswith('nameserver') and len(line.split()) > 1]
+    except OSError:
+        return []
+
+
+class UdpBackend:
+    """Backend querying a DNS server directly over UDP, with the TTLs of its answers. Truncated answers are
+       queried again over TCP.
+
+    Args:
+        nameserver (str, optional): Address of the DNS server. Defaults to the first nameserver of
+                                    `/etc/resolv.conf`.
+        port (int, optional): Port of the DNS server.
+        timeout (float, optional): Seconds to wait for an answer.
+        attempts (int, optional): Number of queries sent before giving up.
+
+    """
+
+    def __init__(self, nameserver: str = None, port: int = 53, timeout: float = 2.0, attempts: int = 2):
+        self.nameserver = nameserver or next(iter(_nameservers()), '127.0.0.1')
+        self.port = port
+        self.timeout = timeout
+        self.attempts = attempts
+
+    async def _query_udp(self, query):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(lambda: _DatagramProtocol(future),
+                                                           remote_addr=(self.nameserver, self.port))
+        try:
+            transport.sendto(query)
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            transport.close()
+
+    async def _query_tcp(self, query):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.nameserver, self.port), self.timeout)
+        try:
+            writer.write(struct.pack('!H', len(query)) + query)
+            length, = struct.unpack('!H', await asyncio.wait_for(reader.readexactly(2), self.timeout))
+            return await asyncio.wait_for(reader.readexactly(length), self.timeout)
+        finally:
+            writer.close()
+
+    async def lookup(self, domain: str, ip_version: IPVersion):
+        """Function to look up the addresses of a domain.
+
+        Returns:
+            tuple: The addresses and their TTL. No addresses, and the negative caching TTL or None, for a
+                   negative answer.
+
+        Raises:
+            OSError: If the server didn't answer, or answered with an error.
+
+        """
+        query_type = _QUERY_TYPES[ip_version]
+        error = None
+        for _ in range(self.attempts):
+            query_id = random.getrandbits(16)
+            query = _HEADER.pack(query_id, 0x0100, 1, 0, 0, 0) + _encode_name(domain) + struct.pack('!HH', query_type, 1)
+            try:
+                message = await self._query_udp(query)
+                if len(message) > 2 and message[2] & 0x02:
+                    message = await self._query_tcp(query)
+                return _parse_response(message, query_id, query_type)
+            except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError, struct.error) as e:
+                error = e
+        raise OSError(f'dns lookup of {domain} failed: {error or "timed out"}')
+
+
+class _Entry:
+    __slots__ = ('addresses', 'ttl', 'expires', 'refresh_at', 'used', 'error')
+
+    def __init__(self, addresses, ttl, now, refresh_ahead, error=None):
+        self.addresses = tuple(addresses)
+        self.ttl = ttl
+        self.expires = now + ttl
+        self.refresh_at = now + ttl * (1 - refresh_ahead)
+        self.used = False
+        self.error = error
+
+
+class DnsCache:
+    """Cache of the addresses of the domains MUD ACLs match on, for turning `ietf-acldns` names into address sets.
+
+    Positive answers are kept for their TTL, clamped between `min_ttl` and `max_ttl`. Negative answers are kept for
+    the negative caching TTL the server gave, at most `negative_ttl`. Failed lookups are retried after `error_ttl`,
+    and in the meantime the expired addresses, if any, keep being served. Concurrent lookups of the same name share
+    a single query, and at most `concurrency` queries are in flight at once.
+
+    Entries are refreshed before they expire, once `1 - refresh_ahead` of their TTL has passed: right away in the
+    background when they are requested, or by `refresh_forever` for the watched names (see `watch`) and the names
+    requested since their last refresh. Others are dropped once expired.
+
+    Args:
+        backend (optional): Object with an async `lookup(domain, ip_version)` method returning the addresses and
+                            their TTL, like `UdpBackend` (the default) and `SystemBackend`. Tests can pass a stub.
+        min_ttl (int, optional): Shortest time answers are kept for, in seconds.
+        max_ttl (int, optional): Longest time answers are kept for, in seconds.
+        negative_ttl (int, optional): Longest time negative answers are kept for, in seconds.
+        error_ttl (int, optional): Time before a failed lookup is retried, in seconds.
+        refresh_ahead (float, optional): Fraction of the TTL left when entries are refreshed.
+        concurrency (int, optional): Maximum number of lookups in flight.
+        clock (callable, optional): Monotonic clock, in seconds.
+
+    """
+
+    def __init__(self, backend=None, min_ttl: int = 30, max_ttl: int = 86400, negative_ttl: int = 60,
+                 error_ttl: int = 5, refresh_ahead: float = 0.1, concurrency: int = 64, clock=time.monotonic):
+        if not 0 <= refresh_ahead < 1:
+            raise InputException(f'refresh_ahead is not valid: {refresh_ahead}')
+        self.backend = backend if backend is not None else UdpBackend()
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.error_ttl = error_ttl
+        self.refresh_ahead = refresh_ahead
+        self.concurrency = concurrency
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+        self._entries = {}
+        self._pending = {}
+        self._watched = set()
+        self._schedule = []
+        self._scheduled = None
+        self._semaphore = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _clamp(self, addresses, ttl):
+        if not addresses:
+            ttl = ttl if ttl is not None else self.negative_ttl
+            return min(max(ttl, 1), self.negative_ttl, self.max_ttl)
+        return min(max(ttl, self.min_ttl), self.max_ttl)
+
+    async def _lookup(self, key):
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore[0] is not loop:
+            # asyncio primitives are bound to a loop, and the cache may outlive one (e.g. across asyncio.run calls)
+            self._semaphore = (loop, asyncio.Semaphore(self.concurrency))
+        async with self._semaphore[1]:
+            try:
+                addresses, ttl = await self.backend.lookup(*key)
+            except (OSError, asyncio.TimeoutError, InputException) as e:
+                self.errors += 1
+                previous = self._entries.get(key)
+                entry = _Entry(previous.addresses if previous is not None else (), self.error_ttl, self.clock(), 0,
+                               str(e))
+            else:
+                entry = _Entry(addresses, self._clamp(addresses, ttl), self.clock(), self.refresh_ahead)
+        # a refreshed entry is only refreshed again if it is requested in the meantime, or watched
+        self._entries[key] = entry
+        heapq.heappush(self._schedule, (entry.refresh_at, key))
+        if self._scheduled is not None:
+            self._scheduled.set()
+        return entry
+
+    def _start_lookup(self, key):
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._lookup(key))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return task
+
+    def _answer(self, entry, now):
+        return Answer(entry.addresses, max(math.ceil(entry.expires - now), 0), entry.error)
+
+    def get(self, domain: str, ip_version: IPVersion = IPVersion.IPV4):
+        """Function to look up a name in the cache only.
+
+        Returns:
+            Answer: The cached answer, or None if the name isn't cached or its answer has expired.
+
+        """
+        entry = self._entries.get((domain.rstrip('.').lower(), ip_version))
+        now = self.clock()
+        if entry is None or entry.expires <= now:
+            return None
+        return self._answer(entry, now)
+
+    async def resolve(self, domain: str, ip_version: IPVersion = IPVersion.IPV4):
+        """Function to get the addresses of a name, from the cache or the backend.
+
+        Args:
+            domain (str): The domain name.
+            ip_version (IPVersion, optional): `IPVersion.IPV4` for A records, `IPVersion.IPV6` for AAAA records.
+
+        Returns:
+            Answer: The addresses. Failed lookups give the addresses of the expired answer, or none, with the error.
+
+        """
+        if ip_version not in _QUERY_TYPES:
+            raise InputException(f'ip_version is not valid: {ip_version}')
+        key = (domain.rstrip('.').lower(), ip_version)
+        entry = self._entries.get(key)
+        now = self.clock()
+        if entry is not None and entry.expires > now:
+            self.hits += 1
+            entry.used = True
+            if now >= entry.refresh_at and key not in self._pending:
+                self.refreshes += 1
+                self._start_lookup(key)
+            return self._answer(entry, now)
+        self.misses += 1
+        entry = await self._start_lookup(key)
+        entry.used = True
+        return self._answer(entry, self.clock())
+
+    async def resolve_many(self, names):
+        """Function to resolve names concurrently, e.g. the `acldns_names` of the MUD objects of a policy load.
+
+        Args:
+            names (iterable): `(domain, IPVersion)` pairs.
+
+        Returns:
+            dict: The `Answer` of each pair.
+
+        """
+        names = list(dict.fromkeys(names))
+        answers = await asyncio.gather(*(self.resolve(domain, ip_version) for domain, ip_version in names))
+        return dict(zip(names, answers))
+
+    def watch(self, names):
+        """Function to keep names refreshed by `refresh_forever` whether or not they are requested.
+
+        Args:
+            names (iterable): `(domain, IPVersion)` pairs, e.g. from `acldns_names`.
+
+        """
+        for domain, ip_version in names:
+            key = (domain.rstrip('.').lower(), ip_version)
+            self._watched.add(key)
+            if key not in self._entries:
+                heapq.heappush(self._schedule, (self.clock(), key))
+        if self._scheduled is not None:
+            self._scheduled.set()
+
+    def unwatch(self, names):
+        """Function to stop keeping names refreshed, see `watch`."""
+        for domain, ip_version in names:
+            self._watched.discard((domain.rstrip('.').lower(), ip_version))
+
+    async def refresh_due(self):
+        """Function to refresh the entries due, and drop the expired ones nobody asked for.
+
+        Returns:
+            float: The clock time of the next refresh, or None if there is nothing to refresh.
+
+        """
+        now = self.clock()
+        lookups = []
+        while self._schedule and self._schedule[0][0] <= now:
+            refresh_at, key = heapq.heappop(self._schedule)
+            entry = self._entries.get(key)
+            if entry is not None and entry.refresh_at != refresh_at:
+                continue  # rescheduled by a later lookup
+            if key in self._watched or (entry is not None and entry.used):
+                if key not in self._pending:
+                    self.refreshes += 1
+                    lookups.append(self._start_lookup(key))
+            elif entry is not None:
+                if entry.expires > now:
+                    heapq.heappush(self._schedule, (entry.expires, key))
+                    entry.refresh_at = entry.expires
+                else:
+                    del self._entries[key]
+        if lookups:
+            await asyncio.gather(*lookups)
+        return self._schedule[0][0] if self._schedule else None
+
+    async def refresh_forever(self):
+        """Function to keep refreshing entries before they expire, until cancelled."""
+        self._scheduled = asyncio.Event()
+        try:
+            while True:
+                next_refresh = await self.refresh_due()
+                self._scheduled.clear()
+                timeout = None if next_refresh is None else max(next_refresh - self.clock(), 0)
+                try:
+                    await asyncio.wait_for(self._scheduled.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._scheduled = None
@@ -0,0 +1,345 @@
+import heapq
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from collections import namedtuple
+from itertools import compress
+from multiprocessing import Pool
+
+from muddy.batch import BatchResult, init_worker, make_one
+from muddy.constants import DEFAULT_CACHE_VALIDITY
+from muddy.exceptions import InputException
+from muddy.utils import parse_last_update
+
+RefreshResult = namedtuple('RefreshResult', ['device', 'mud', 'error', 'deadline'])
+RefreshResult.__doc__ = '''Outcome of regenerating a due device in `RefreshScheduler.run_due`: the device, its new MUD
+object (None on failure), the `InputException` its regeneration failed with (None on success) and the deadline it was
+rescheduled at.'''
+
+DIGEST_SIZE = 8
+"""Size in bytes of the spec digests kept in the index."""
+
+_CONTAINER = 'ietf-mud:mud'
+_MAGIC = b'MUDQ'
+_VERSION = 3
+_MAX_FAILURES = 255
+_HEADER = struct.Struct('<4sBxxxQ')
+
+
+def refresh_deadline(mud: dict):
+    """Function to compute when a MUD object has to be regenerated: its `last-update` plus its `cache-validity`
+       (48 hours when it doesn't set one).
+
+    Args:
+        mud (dict): The MUD object.
+
+    Returns:
+        float: The deadline as a POSIX timestamp, or None if the MUD object has no valid `last-update`.
+
+    """
+    container = mud.get(_CONTAINER) if isinstance(mud, dict) else None
+    if not isinstance(container, dict):
+        raise InputException('mud is not valid: missing ietf-mud:mud container')
+    last_update = parse_last_update(container.get('last-update'))
+    if last_update is None:
+        return None
+    return last_update.timestamp() + _cache_validity(container)
+
+
+def _cache_validity(container):
+    return int(container.get('cache-validity', DEFAULT_CACHE_VALIDITY)) * 3600
+
+
+def _refresh_one(item):
+    try:
+        return make_one(item)
+    except Exception as e:
+        # anything else make_mud raises only fails this device, instead of aborting every run while it stays due
+        return BatchResult(item[0], None, InputException(f'spec is not valid: {e!r}'))
+
+
+class RefreshScheduler:
+    """Priority queue of devices ordered by the deadline their MUD object has to be regenerated by.
+
+    Scheduling a device pushes `(deadline, device)` on a heap, in O(log n). A device that is rescheduled leaves its
+    previous entry behind, which is skipped when it reaches the top of the heap; the heap is rebuilt from the current
+    deadlines when stale entries outnumber them. Along with its deadline, each device can carry a digest of the spec
+    it was generated from, to detect specs that changed since, and its number of failed regenerations in a row.
+    Failed devices are retried with an exponential backoff, see `retry_later`.
+
+    The schedule is saved to a single index file: a header, the deadlines as an array of doubles, the digests, a
+    byte per device telling whether it has a digest, the failure counts, and the device names. Loading it reads five
+    blocks instead of rescanning the MUD files. Devices must be strings without newlines to be saved. A scheduler
+    created with a `path` loads that index file if it exists, and saves to it by default.
+
+    Args:
+        path (str, optional): The index file.
+        retry_interval (float, optional): Seconds before the first retry of a device whose regeneration failed.
+        max_retry_interval (float, optional): Longest time between retries, in seconds.
+    """
+
+    def __init__(self, path: str = None, retry_interval: float = 300, max_retry_interval: float = 86400):
+        self.path = path
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._deadlines = {}
+        self._digests = {}
+        self._failures = {}
+        self._heap = []
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, device):
+        return device in self._deadlines
+
+    def deadline(self, device):
+        """Function to get the deadline of a scheduled device, or None if it isn't scheduled."""
+        return self._deadlines.get(device)
+
+    def digest(self, device):
+        """Function to get the spec digest of a device, or None if it has none."""
+        # digests are kept as integers, which load from the index as an array
+        digest = self._digests.get(device)
+        return digest.to_bytes(DIGEST_SIZE, 'little') if digest is not None else None
+
+    def failures(self, device):
+        """Function to get the number of failed regenerations in a row of a device."""
+        return self._failures.get(device, 0)
+
+    def schedule(self, device, deadline: float, digest: bytes = None):
+        """Function to schedule a device, or move it to a new deadline, in O(log n).
+
+        Args:
+            device: Hashable identifier of the device, e.g. the name of its MUD file.
+            deadline (float): POSIX timestamp the device has to be regenerated by. Use 0 to make it due now.
+            digest (bytes, optional): Digest of the device's spec, at most `DIGEST_SIZE` bytes. Kept when not given.
+                                      A new digest resets the failure count of the device.
+
+        """
+        if digest is not None:
+            if len(digest) > DIGEST_SIZE:
+                raise InputException(f'digest is not valid: longer than {DIGEST_SIZE} bytes')
+            digest = int.from_bytes(digest, 'little')
+            if self._digests.get(device) != digest:
+                self._digests[device] = digest
+                self._failures.pop(device, None)
+        deadline = float(deadline)
+        if self._deadlines.get(device) == deadline:
+            return
+        self._deadlines[device] = deadline
+        heapq.heappush(self._heap, (deadline, device))
+        if len(self._heap) > 2 * len(self._deadlines) + 1024:
+            self._heap = [(deadline, device) for device, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def schedule_mud(self, device, mud: dict, digest: bytes = None):
+        """Function to schedule a device at the deadline of its current MUD object, e.g. to seed the schedule from
+           existing MUD files. Devices whose MUD object has no valid `last-update` are due now.
+        """
+        self.schedule(device, refresh_deadline(mud) or 0, digest)
+
+    def remove(self, device):
+        """Function to drop a device from the schedule, along with its digest and failure count."""
+        self._deadlines.pop(device, None)
+        self._digests.pop(device, None)
+        self._failures.pop(device, None)
+
+    def retry_later(self, device, now: float = None):
+        """Function to reschedule a device whose regeneration failed, backing off exponentially: after the n-th
+           failure in a row, it is retried `retry_interval * 2 ** (n - 1)` seconds later, at most `max_retry_interval`.
+
+        Args:
+            device: Identifier of the device.
+            now (float, optional): POSIX timestamp of the failure. Defaults to the current time.
+
+        Returns:
+            float: The deadline the device was rescheduled at.
+
+        """
+        if now is None:
+            now = time.time()
+        failures = self._failures[device] = min(self._failures.get(device, 0) + 1, _MAX_FAILURES)
+        deadline = now + min(self.retry_interval * 2 ** (failures - 1), self.max_retry_interval)
+        self.schedule(device, deadline)
+        return deadline
+
+    def next_deadline(self):
+        """Function to get the earliest deadline.
+
+        Returns:
+            float: The deadline, or None if no device is scheduled.
+
+        """
+        heap = self._heap
+        while heap and self._deadlines.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now: float = None, limit: int = None):
+        """Function to take the devices that are due out of the schedule, earliest first. They keep their digest,
+           and are meant to be scheduled again once regenerated.
+
+        Args:
+            now (float, optional): POSIX timestamp devices are due at. Defaults to the current time.
+            limit (int, optional): Maximum number of devices to take.
+
+        Returns:
+            list: `(device, deadline)` pairs.
+
+        """
+        if now is None:
+            now = time.time()
+        heap = self._heap
+        deadlines = self._deadlines
+        due = []
+        while heap and heap[0][0] <= now and (limit is None or len(due) < limit):
+            deadline, device = heapq.heappop(heap)
+            if deadlines.get(device) == deadline:
+                del deadlines[device]
+                due.append((device, deadline))
+        return due
+
+    def run_due(self, specs, now: float = None, batch_size: int = 1024, workers: int = 1, chunksize: int = 16):
+        """Function to regenerate the MUD objects of the devices that are due, and reschedule them.
+
+        Due devices are taken in batches of `batch_size`, and the specs of a batch are generated across a pool of
+        `workers` processes, as in `muddy.batch.make_muds`. A regenerated device is rescheduled at the deadline of
+        its new MUD object, or a full `cache-validity` from `now` if that is already past. A device whose
+        regeneration fails, whatever the error, is rescheduled with `retry_later`, and the run goes on. Devices
+        without a spec are dropped from the schedule.
+
+        Args:
+            specs (mapping): Mapping of devices to the keyword arguments of their `make_mud` call. String values
+                             are converted with `parse_spec`.
+            now (float, optional): POSIX timestamp devices are due at. Defaults to the time of the call, so
+                                   devices becoming due during the run wait for the next one.
+            batch_size (int, optional): Number of devices taken out of the schedule at a time.
+            workers (int, optional): Number of worker processes. With 1 or fewer, specs are generated in the
+                                     calling process.
+            chunksize (int, optional): Number of specs sent to a worker at a time.
+
+        Yields:
+            RefreshResult: One result per regenerated device. Devices of a batch that aren't yielded when the
+                           generator is closed are put back at their deadline.
+
+        """
+        if batch_size < 1:
+            raise InputException(f'batch_size is not valid: {batch_size}')
+        if now is None:
+            now = time.time()
+        pool = Pool(workers, initializer=init_worker) if workers > 1 else None
+        pending = {}
+        try:
+            while True:
+                pending = dict(self.pop_due(now, batch_size))
+                if not pending:
+                    return
+                items = []
+                for device in list(pending):
+                    spec = specs.get(device)
+                    if spec is None:
+                        del pending[device]
+                        self.remove(device)
+                    else:
+                        items.append((device, spec))
+                results = pool.imap(_refresh_one, items, chunksize) if pool is not None else \
+                    map(_refresh_one, items)
+                for device, mud, error in results:
+                    del pending[device]
+                    if error is None:
+                        try:
+                            deadline = refresh_deadline(mud)
+                            if deadline is None or deadline <= now:
+                                deadline = now + _cache_validity(mud[_CONTAINER])
+                        except (TypeError, ValueError) as e:
+                            mud, error = None, InputException(f'cache_validity is not valid: {e}')
+                    if error is None:
+                        self._failures.pop(device, None)
+                        self.schedule(device, deadline)
+                    else:
+                        deadline = self.retry_later(device, now)
+                    yield RefreshResult(device, mud, error, deadline)
+        finally:
+            for device, deadline in pending.items():
+                self.schedule(device, deadline)
+            if pool is not None:
+                pool.terminate()
+
+    def load(self, path: str):
+        """Function to replace the schedule with the one saved in an index file."""
+        with open(path, 'rb') as fp:
+            data = fp.read()
+        try:
+            magic, version, count = _HEADER.unpack_from(data)
+        except struct.error:
+            raise InputException(f'index is not valid: {path}')
+        offset = _HEADER.size + count * 8
+        if magic != _MAGIC or version != _VERSION or len(data) < offset + count * (DIGEST_SIZE + 2):
+            raise InputException(f'index is not valid: {path}')
+        deadlines = array('d')
+        deadlines.frombytes(data[_HEADER.size:offset])
+        if sys.byteorder == 'big':
+            deadlines.byteswap()
+        digests = array('Q')
+        digests.frombytes(data[offset:offset + count * DIGEST_SIZE])
+        if sys.byteorder == 'big':
+            digests.byteswap()
+        offset += count * DIGEST_SIZE
+        # whether each device has a digest, as an all-zero digest is a valid one
+        has_digests = data[offset:offset + count]
+        offset += count
+        failures = data[offset:offset + count]
+        offset += count
+        devices = data[offset:].decode().split('\n') if count else []
+        if len(devices) != count:
+            raise InputException(f'index is not valid: {path}')
+        deadlines = deadlines.tolist()
+        self._deadlines = dict(zip(devices, deadlines))
+        self._digests = dict(compress(zip(devices, digests.tolist()), has_digests))
+        self._failures = {device: failure for device, failure in zip(devices, failures) if failure}
+        self._heap = list(zip(deadlines, devices))
+        heapq.heapify(self._heap)
+
+    def save(self, path: str = None):
+        """Function to write the schedule to an index file, atomically replacing it.
+
+        Devices taken out by `pop_due` and not scheduled again aren't saved.
+
+        Args:
+            path (str, optional): The index file. Defaults to the one the scheduler was created with.
+
+        """
+        path = path or self.path
+        if path is None:
+            raise InputException('path is not valid: no index file')
+        devices = list(self._deadlines)
+        for device in devices:
+            if not isinstance(device, str) or '\n' in device:
+                raise InputException(f'device is not valid: {device!r}')
+        deadlines = array('d', self._deadlines.values())
+        if sys.byteorder == 'big':
+            deadlines.byteswap()
+        digests = list(map(self._digests.get, devices))
+        if None in digests:
+            has_digests = bytes(digest is not None for digest in digests)
+            digests = [digest or 0 for digest in digests]
+        else:
+            has_digests = b'\x01' * len(devices)
+        digests = array('Q', digests)
+        if sys.byteorder == 'big':
+            digests.byteswap()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(_HEADER.pack(_MAGIC, _VERSION, len(devices)))
+            deadlines.tofile(fp)
+            digests.tofile(fp)
+            fp.write(has_digests)
+            fp.write(bytes(self._failures.get(device, 0) for device in devices))
+            fp.write('\n'.join(devices).encode())
+        os.replace(tmp_path, path)
@@ -0,0 +1,177 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+from urllib.parse import urlparse
+
+import click
+from muddy.daemon import MudClient
+from muddy.exceptions import InputException
+from muddy.specs import read_specs
+
+INDEX_FILE = '.muddy-schedule'
+"""Name of the index file `muddy refresh` keeps in the output directory by default."""
+
+
+def _guess_format(fp):
+    return 'csv' if getattr(fp, 'name', '').lower().endswith('.csv') else 'jsonl'
+
+
+def _file_name(record, index):
+    file_name = record.pop('file', None)
+    if file_name is None:
+        mud_url = record.get('mud_url') or record.get('support_info', {}).get('mud-url')
+        file_name = os.path.basename(urlparse(mud_url).path.rstrip('/')) if mud_url else None
+    if not file_name:
+        file_name = str(index)
+    return file_name if file_name.endswith('.json') else f'{file_name}.json'
+
+
+def _prepare_record(record, last_update):
+    # Names are derived from the specs so that regenerating an unchanged device gives the same document,
+    # apart from its last-update.
+    if 'policies' not in record:
+        record['deterministic'] = True
+        if isinstance(record.get('support_info'), dict):
+            record['support_info'] = dict(record['support_info'])
+            record['support_info'].setdefault('last-update', last_update)
+        else:
+            record.setdefault('last_update', last_update)
+    return record
+
+
+def _prepare(records, file_names, last_update):
+    for index, record in enumerate(records):
+        file_names[index] = _file_name(record, index)
+        yield _prepare_record(record, last_update)
+
+
+def _is_unchanged(path, mud):
+    try:
+        with open(path) as fp:
+            existing = json.load(fp)
+    except (OSError, ValueError):
+        return False
+    existing.get('ietf-mud:mud', {}).pop('last-update', None)
+    mud = dict(mud, **{'ietf-mud:mud': dict(mud['ietf-mud:mud'])})
+    mud['ietf-mud:mud'].pop('last-update', None)
+    return existing == mud
+
+
+def _generate(records, socket_path, jobs, chunksize):
+    if socket_path is not None:
+        try:
+            client = MudClient(socket_path)
+        except OSError as e:
+            click.echo(f'muddy daemon not reachable, generating locally: {e}', err=True)
+        else:
+            with client:
+                yield from client.make(records)
+            return
+    # imported here so that daemon clients don't load muddy.maker
+    from muddy.batch import make_muds
+    yield from make_muds(records, workers=jobs, chunksize=chunksize)
+
+
+def _write(path, mud):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as fp:
+        json.dump(mud, fp, indent=2)
+    os.replace(tmp_path, path)
+
+
+def make_files(specs, spec_format, output_dir, jobs, chunksize, skip_unchanged, socket_path):
+    """Function implementing `muddy make`, see its help.
+
+    Returns:
+        int: The number of specs that failed.
+
+    """
+    if skip_unchanged and output_dir is None:
+        raise click.UsageError('--skip-unchanged requires --output-dir')
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    file_names = {}
+    last_update = datetime.now().strftime('%Y-%m-%dT%H:%M:%S%z')
+    records = _prepare(read_specs(specs, spec_format or _guess_format(specs)), file_names, last_update)
+    written = unchanged = failed = 0
+    try:
+        for index, mud, error in _generate(records, socket_path, jobs, chunksize):
+            file_name = file_names.pop(index)
+            if error is not None:
+                failed += 1
+                click.echo(f'{file_name}: {error}', err=True)
+            elif output_dir is None:
+                click.echo(json.dumps(mud))
+                written += 1
+            else:
+                path = os.path.join(output_dir, file_name)
+                if skip_unchanged and _is_unchanged(path, mud):
+                    unchanged += 1
+                else:
+                    _write(path, mud)
+                    written += 1
+    except InputException as e:
+        raise click.ClickException(str(e))
+
+    if output_dir is not None:
+        click.echo(f'{written} written, {unchanged} unchanged, {failed} failed', err=True)
+    return failed
+
+
+def refresh_files(specs, spec_format, output_dir, index_path, jobs, chunksize, batch_size):
+    """Function implementing `muddy refresh`, see its help.
+
+    Returns:
+        int: The number of specs that failed.
+
+    """
+    # imported here so that `muddy make` doesn't load the scheduler
+    from muddy.scheduler import DIGEST_SIZE, RefreshScheduler
+    from muddy.utils import get_spec_digest
+
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        scheduler = RefreshScheduler(index_path or os.path.join(output_dir, INDEX_FILE))
+    except (OSError, InputException) as e:
+        raise click.ClickException(f'cannot load the index, remove it to regenerate every file: {e}')
+
+    last_update = datetime.now().strftime('%Y-%m-%dT%H:%M:%S%z')
+    records = {}
+    for index, record in enumerate(read_specs(specs, spec_format or _guess_format(specs))):
+        digest = bytes.fromhex(get_spec_digest(record))[:DIGEST_SIZE]
+        file_name = _file_name(record, index)
+        records[file_name] = _prepare_record(record, last_update)
+        if scheduler.digest(file_name) != digest or file_name not in scheduler:
+            # new and changed specs are due now
+            scheduler.schedule(file_name, 0, digest)
+
+    written = failed = 0
+    results = scheduler.run_due(records, batch_size=batch_size, workers=jobs, chunksize=chunksize)
+    try:
+        for file_name, mud, error, _ in results:
+            if error is not None:
+                failed += 1
+                click.echo(f'{file_name}: {error}', err=True)
+            else:
+                try:
+                    _write(os.path.join(output_dir, file_name), mud)
+                except OSError as e:
+                    failed += 1
+                    click.echo(f'{file_name}: {e}', err=True)
+                    scheduler.retry_later(file_name)
+                    continue
+                written += 1
+    except InputException as e:
+        raise click.ClickException(str(e))
+    finally:
+        # devices taken out of the schedule but not written yet are put back before saving
+        results.close()
+        scheduler.save()
+
+    next_deadline = scheduler.next_deadline()
+    next_refresh = datetime.fromtimestamp(next_deadline).isoformat(timespec='seconds') if next_deadline else 'never'
+    click.echo(f'{written} written, {len(records) - written - failed} not due, {failed} failed, '
+               f'next refresh {next_refresh}', err=True)
+    return failed
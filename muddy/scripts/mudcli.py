@@ -1,30 +1,196 @@
 import click
-from muddy.constants import MUD_MODEL_DEF
-from muddy.models import IPVersion, Direction
-from muddy.utils import get_sub_ace_name
+from muddy.constants import SPEC_FORMATS
+
 
 @click.group()
 def cli():
     pass
 
+
 @cli.command()
-@click.option('--mud-version', '-v', required=True, default=1, help=MUD_MODEL_DEF["mud-version"], show_default=True)
-@click.option('--mud-url', '-u', required=True, help=MUD_MODEL_DEF["mud-url"])
-@click.option('+supported/-supported', required=True, default=True, help=MUD_MODEL_DEF["is-supported"], show_default=True)
-@click.option('--cache-validity', default=48, help=MUD_MODEL_DEF["cache-validity"], show_default=True)
-@click.option('--systeminfo', help=MUD_MODEL_DEF["systeminfo"])
-@click.option('--documentation', help=MUD_MODEL_DEF["documentation"])
-@click.option('--mfg-name', help=MUD_MODEL_DEF["mfg-name"])
-@click.option('--model-name', help=MUD_MODEL_DEF["model-name"])
-@click.option('--firmware-rev', help=MUD_MODEL_DEF["firmware-rev"])
-@click.option('--software-rev', help=MUD_MODEL_DEF["software-rev"])
-@click.option('--extensions', help=MUD_MODEL_DEF["extensions"])
-@click.option('+ipv4/-ipv4', required=True, help="Does this device speak IPv4?")
-@click.option('+ipv6/-ipv6', required=True, help="Does this device speak IPv6?")
-@click.option('--acldns', type=(str, str, str, str), help="DNS ACL")
-def make(mud_version, mud_url, cache_validity, supported, systeminfo,
-        mfg_name, documentation, model_name, firmware_rev, software_rev,
-        extensions, ipv4, ipv6, acldns):
-    click.echo('make mud file')
-    click.echo(acldns)
-    click.echo(get_sub_ace_name("test", Direction.FROM_DEVICE))
\ No newline at end of file
+@click.argument('specs', type=click.File('r'), default='-')
+@click.option('--format', 'spec_format', type=click.Choice(SPEC_FORMATS),
+              help='Format of SPECS. Guessed from the file extension, JSONL by default.')
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False),
+              help='Write one MUD file per spec to this directory, instead of streaming JSONL to stdout.')
+@click.option('--jobs', '-j', default=1, show_default=True, help='Number of worker processes.')
+@click.option('--chunksize', default=16, show_default=True, help='Number of specs sent to a worker at a time.')
+@click.option('--skip-unchanged', is_flag=True,
+              help='Leave MUD files that only differ in their last-update untouched. Requires --output-dir.')
+@click.option('--socket', 'socket_path', envvar='MUDDY_SOCKET', type=click.Path(dir_okay=False),
+              help='Send the specs to the `muddy serve` daemon listening on this socket. '
+                   'Generates locally if it is not reachable.')
+@click.pass_context
+def make(ctx, specs, spec_format, output_dir, jobs, chunksize, skip_unchanged, socket_path):
+    """Generate MUD files from SPECS, a JSONL or CSV file (or stdin) with one device per line.
+
+    Each spec holds the keyword arguments of a make_mud call, with enums given by name (to_device, ipv4, tcp,
+    is_cloud, ...). An optional `file` key names the output file, which otherwise comes from the MUD URL.
+    """
+    # the implementation is imported on use, so that `muddy --help` only loads click
+    from muddy.scripts.make import make_files
+    if make_files(specs, spec_format, output_dir, jobs, chunksize, skip_unchanged, socket_path):
+        ctx.exit(1)
+
+
+@cli.command()
+@click.argument('specs', type=click.File('r'), default='-')
+@click.option('--format', 'spec_format', type=click.Choice(SPEC_FORMATS),
+              help='Format of SPECS. Guessed from the file extension, JSONL by default.')
+@click.option('--output-dir', '-o', required=True, type=click.Path(file_okay=False),
+              help='Directory of the MUD files.')
+@click.option('--index', 'index_path', type=click.Path(dir_okay=False),
+              help='Index file keeping the schedule. Defaults to .muddy-schedule in the output directory.')
+@click.option('--jobs', '-j', default=1, show_default=True, help='Number of worker processes.')
+@click.option('--chunksize', default=16, show_default=True, help='Number of specs sent to a worker at a time.')
+@click.option('--batch-size', default=1024, show_default=True, help='Number of due devices regenerated at a time.')
+@click.pass_context
+def refresh(ctx, specs, spec_format, output_dir, index_path, jobs, chunksize, batch_size):
+    """Regenerate the MUD files of SPECS that are due: past their last-update plus cache-validity, new, or whose
+    spec changed since they were generated.
+
+    The schedule is kept in an index file, so runs only read SPECS and the index, not the MUD files.
+    """
+    from muddy.scripts.make import refresh_files
+    if refresh_files(specs, spec_format, output_dir, index_path, jobs, chunksize, batch_size):
+        ctx.exit(1)
+
+
+@cli.command()
+@click.argument('old', type=click.File('r'))
+@click.argument('new', type=click.File('r'))
+@click.pass_context
+def diff(ctx, old, new):
+    """Print the changes from the MUD file OLD to NEW as a JSON Patch, ACL by ACL and ACE by ACE.
+
+    Exits with status 1 if the files differ.
+    """
+    import json
+    from muddy.diff import diff_muds
+    from muddy.exceptions import InputException
+    try:
+        patch = diff_muds(json.load(old), json.load(new))
+    except (ValueError, InputException) as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(patch, indent=2))
+    if patch:
+        ctx.exit(1)
+
+
+@cli.command()
+@click.option('--socket', 'socket_path', required=True, type=click.Path(dir_okay=False),
+              help='Path of the Unix socket to listen on.')
+@click.option('--jobs', '-j', default=1, show_default=True, help='Number of worker processes per request.')
+def serve(socket_path, jobs):
+    """Run a daemon keeping muddy loaded, for `muddy make --socket`.
+
+    Requests and responses are JSON documents, each prefixed by its length as a 4-byte big-endian integer.
+    """
+    from muddy.daemon import serve as serve_forever
+    from muddy.exceptions import InputException
+    click.echo(f'muddy daemon listening on {socket_path}', err=True)
+    try:
+        serve_forever(socket_path, jobs)
+    except InputException as e:
+        raise click.ClickException(str(e))
+
+
+@cli.command()
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--host', default='127.0.0.1', show_default=True, help='Address to listen on.')
+@click.option('--port', '-p', default=8080, show_default=True, help='Port to listen on.')
+@click.option('--reload-interval', default=2.0, show_default=True,
+              help='Seconds between rescans of DIRECTORY for new, changed or removed MUD files.')
+def http(directory, host, port, reload_interval):
+    """Serve the MUD files of DIRECTORY over HTTP, at the path of their MUD URL.
+
+    Documents are kept serialized and gzip-compressed in memory, with ETag, Last-Modified (from last-update) and
+    Cache-Control (from cache-validity) headers.
+    """
+    import asyncio
+    from muddy.server import MudFileServer
+    server = MudFileServer(directory, reload_interval)
+    click.echo(f'serving {len(server)} MUD files on http://{host}:{port}', err=True)
+    try:
+        asyncio.run(server.serve_forever(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+@click.argument('devices', nargs=-1, required=True, metavar='ADDRESS=FILE...')
+@click.option('--table', default='muddy', show_default=True, help='Name of the inet table to generate.')
+@click.option('--hook', default='forward', show_default=True, help='Netfilter hook of the base chain.')
+def nft(devices, table, hook):
+    """Compile the MUD files of devices into an nftables ruleset, for `nft -f`.
+
+    Each device is given as its IP address and MUD file, e.g. 192.168.1.10=lightbulb2000.json. Devices with the
+    same policies share their chains. Domain names and manufacturer or controller classes become named sets.
+    """
+    import json
+    from muddy.exceptions import InputException
+    from muddy.nftables import NftCompiler
+    compiler = NftCompiler(table, hook)
+    for device in devices:
+        address, _, path = device.partition('=')
+        if not path:
+            raise click.BadParameter(f'{device} is not ADDRESS=FILE', param_hint='DEVICES')
+        try:
+            with open(path) as fp:
+                compiler.add(address, json.load(fp))
+        except (OSError, ValueError, InputException) as e:
+            raise click.ClickException(f'{path}: {e}')
+    click.echo(compiler.render(), nl=False)
+
+
+def _import_signing():
+    try:
+        import muddy.signing
+    except ImportError as e:
+        raise click.ClickException(f'{e}. Install the sign extra: pip install muddy[sign]')
+    return muddy.signing
+
+
+@cli.command()
+@click.argument('files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--key', 'key_path', required=True, type=click.Path(exists=True, dir_okay=False),
+              help='PEM-encoded private key.')
+@click.option('--cert', 'cert_path', required=True, type=click.Path(exists=True, dir_okay=False),
+              help='PEM-encoded certificate of the key.')
+@click.option('--password', envvar='MUDDY_KEY_PASSWORD', help='Password of the key, if it is encrypted.')
+@click.option('--jobs', '-j', default=1, show_default=True, help='Number of worker processes.')
+@click.pass_context
+def sign(ctx, files, key_path, cert_path, password, jobs):
+    """Write a detached CMS signature (.p7s) next to each of the MUD FILES."""
+    signing = _import_signing()
+    failed = 0
+    for result in signing.sign_files(files, key_path, cert_path, password.encode() if password else None, jobs):
+        if result.error is not None:
+            failed += 1
+            click.echo(f'{result.path}: {result.error}', err=True)
+    click.echo(f'{len(files) - failed} signed, {failed} failed', err=True)
+    if failed:
+        ctx.exit(1)
+
+
+@cli.command()
+@click.argument('files', nargs=-1, required=True, type=click.Path(dir_okay=False))
+@click.option('--trusted', 'trusted_path', required=True, type=click.Path(exists=True, dir_okay=False),
+              help='PEM-encoded certificates trusted to sign MUD files, or to issue their signing certificates.')
+@click.option('--jobs', '-j', default=1, show_default=True, help='Number of worker processes.')
+@click.pass_context
+def verify(ctx, files, trusted_path, jobs):
+    """Check each of the MUD FILES against its detached signature (.p7s)."""
+    signing = _import_signing()
+    failed = 0
+    for result in signing.verify_files(files, trusted_path, jobs):
+        if result.error is not None:
+            failed += 1
+            click.echo(f'{result.path}: {result.error}', err=True)
+    click.echo(f'{len(files) - failed} valid, {failed} invalid', err=True)
+    if failed:
+        ctx.exit(1)
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,351 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, formatdate, parsedate_to_datetime
+from urllib.parse import urlparse
+
+from muddy.constants import DEFAULT_CACHE_VALIDITY
+from muddy.exceptions import InputException
+from muddy.utils import parse_last_update
+
+MUD_CONTENT_TYPE = 'application/mud+json'
+
+_logger = logging.getLogger(__name__)
+
+_REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+_MAX_HEADERS = 100
+
+
+def _accepts_gzip(accept_encoding):
+    # RFC 9110 12.5.3: gzip is acceptable if listed, or covered by *, with a non-zero q-value
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, *parameters = item.split(';')
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+class MudDocument:
+    """A MUD object rendered once for serving: serialized and gzip-compressed bytes, and the validators and
+       caching headers derived from it.
+
+    The ETag is a digest of the serialized document, which includes its `last-update`, suffixed with `-gzip` for
+    the compressed body, so that caches never mix up the two representations. Last-Modified is the `last-update`
+    (read as local time when it has no UTC offset, as `make_mud` stamps it, or `mtime` if it can't be parsed), and
+    Cache-Control allows caching for `cache-validity` hours.
+
+    Args:
+        mud (dict): The MUD object.
+        mtime (float, optional): Fallback modification time, as a POSIX timestamp.
+
+    """
+    __slots__ = ('mud_url', 'body', 'gzip_body', 'etag', 'gzip_etag', 'last_modified', 'headers', 'gzip_headers')
+
+    def __init__(self, mud, mtime: float = None):
+        container = mud.get('ietf-mud:mud') if isinstance(mud, dict) else None
+        if not isinstance(container, dict):
+            raise InputException('mud is not valid: missing ietf-mud:mud container')
+        self.mud_url = container.get('mud-url')
+        self.body = json.dumps(mud).encode()
+        # mtime=0 keeps the compressed bytes identical across reloads of the same document
+        self.gzip_body = gzip.compress(self.body, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+        last_modified = parse_last_update(container.get('last-update'))
+        if last_modified is None:
+            last_modified = datetime.fromtimestamp(mtime if mtime is not None else 0, timezone.utc)
+        self.last_modified = last_modified.replace(microsecond=0)
+        cache_validity = container.get('cache-validity', DEFAULT_CACHE_VALIDITY)
+        try:
+            max_age = int(cache_validity) * 3600
+        except (TypeError, ValueError, OverflowError):
+            raise InputException(f'cache-validity is not valid: {cache_validity!r}')
+        headers = (f'Content-Type: {MUD_CONTENT_TYPE}\r\n'
+                   f'Last-Modified: {format_datetime(self.last_modified.astimezone(timezone.utc), True)}\r\n'
+                   f'Cache-Control: max-age={max_age}\r\n'
+                   'Vary: Accept-Encoding\r\n')
+        self.headers = f'{headers}ETag: {self.etag}\r\n'.encode()
+        self.gzip_headers = f'{headers}ETag: {self.gzip_etag}\r\n'.encode()
+
+    @property
+    def path(self):
+        """str: The path of the `mud-url`, which devices request."""
+        return urlparse(self.mud_url).path if self.mud_url else None
+
+    def is_not_modified(self, if_none_match, if_modified_since, compressed: bool = False):
+        """Function to evaluate the conditional headers of a GET or HEAD request.
+
+        Args:
+            if_none_match (str): The If-None-Match header, or None.
+            if_modified_since (str): The If-Modified-Since header, or None. Ignored if If-None-Match is set.
+            compressed (bool, optional): Whether the gzip body is selected, whose ETag If-None-Match is
+                                         checked against.
+
+        Returns:
+            bool: True if a 304 response should be sent.
+
+        """
+        if if_none_match is not None:
+            etag = self.gzip_etag if compressed else self.etag
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags or f'W/{etag}' in tags
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since is None:
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return self.last_modified <= since
+        return False
+
+
+def _load_document(path, stat):
+    with open(path, 'rb') as fp:
+        return MudDocument(json.load(fp), stat.st_mtime)
+
+
+class MudFileServer:
+    """Asyncio HTTP server for MUD files, answering from documents rendered in memory.
+
+    Documents are served at the path of their `mud-url`, or at `/<file name>` if they don't have one.
+    They come from the `.json` files of `directory`, which is rescanned every `reload_interval` seconds,
+    and from `add`. Files are read and rendered in a worker thread, and the documents are swapped in at once,
+    so requests are never blocked by a reload. GET and HEAD requests are supported. They honor If-None-Match,
+    If-Modified-Since and gzip Accept-Encoding, including its q-values.
+
+    Args:
+        directory (str, optional): Directory of MUD files to serve, e.g. the output of `muddy make`.
+        reload_interval (float, optional): Seconds between rescans of `directory`. None to never rescan.
+
+    """
+
+    def __init__(self, directory: str = None, reload_interval: float = 2.0):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._documents = {}
+        self._files = {}
+        self._server = None
+        self._reload_task = None
+        if directory is not None:
+            self._apply(self._scan())
+
+    def __len__(self):
+        return len(self._documents)
+
+    def get(self, path: str):
+        """Function to look up the document served at a path.
+
+        Returns:
+            MudDocument: The document, or None.
+
+        """
+        return self._documents.get(path)
+
+    def add(self, mud, path: str = None):
+        """Function to serve a MUD object.
+
+        Args:
+            mud (dict): The MUD object.
+            path (str, optional): Path to serve it at. Defaults to the path of its `mud-url`.
+
+        Returns:
+            str: The path the document is served at.
+
+        """
+        document = MudDocument(mud)
+        path = path or document.path
+        if not path:
+            raise InputException('path is required for a MUD object without mud-url')
+        documents = dict(self._documents)
+        documents[path] = document
+        self._documents = documents
+        return path
+
+    def _scan(self):
+        # runs in a worker thread: reads and renders new or changed files only
+        changes = {}
+        seen = set()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json') or not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                key = (stat.st_mtime_ns, stat.st_size)
+                previous = self._files.get(entry.name)
+                if previous is not None and previous[0] == key:
+                    continue
+                try:
+                    document = _load_document(entry.path, stat)
+                except (OSError, ValueError, InputException) as e:
+                    _logger.warning('could not load %s: %s', entry.path, e)
+                    document = None
+                changes[entry.name] = (key, document)
+        for name in self._files.keys() - seen:
+            changes[name] = (None, None)
+        return changes
+
+    def _apply(self, changes):
+        if not changes:
+            return
+        documents = dict(self._documents)
+        for name, (key, document) in changes.items():
+            _, previous_path, previous_document = self._files.pop(name, (None, None, None))
+            if key is not None and document is None:
+                # unreadable, e.g. caught in the middle of a write: keep serving the previous version
+                self._files[name] = (key, previous_path, previous_document)
+                continue
+            if previous_path is not None and documents.get(previous_path) is previous_document:
+                del documents[previous_path]
+                # another file with the same mud-url takes the path back
+                for _, path, other in self._files.values():
+                    if path == previous_path:
+                        documents[path] = other
+                        break
+            if document is not None:
+                path = document.path or f'/{name}'
+                documents[path] = document
+                self._files[name] = (key, path, document)
+        self._documents = documents
+
+    async def reload(self):
+        """Function to rescan `directory` without blocking the event loop."""
+        if self.directory is None:
+            return
+        changes = await asyncio.get_running_loop().run_in_executor(None, self._scan)
+        self._apply(changes)
+
+    async def _reload_forever(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.reload()
+            except OSError as e:
+                _logger.warning('reload of %s failed: %s', self.directory, e)
+
+    def respond(self, method: str, path: str, headers: dict):
+        """Function to build the response to a request.
+
+        Args:
+            method (str): The request method.
+            path (str): The request target.
+            headers (dict): The request headers, with lower-case names.
+
+        Returns:
+            tuple: The status line and headers of the response, minus the Date and Connection headers, and its body.
+
+        """
+        if method not in ('GET', 'HEAD'):
+            return self._error(405, 'Allow: GET, HEAD\r\n')
+        document = self._documents.get(urlparse(path).path)
+        if document is None:
+            return self._error(404)
+        compressed = _accepts_gzip(headers.get('accept-encoding', ''))
+        document_headers = document.gzip_headers if compressed else document.headers
+        if document.is_not_modified(headers.get('if-none-match'), headers.get('if-modified-since'), compressed):
+            return b'HTTP/1.1 304 Not Modified\r\n' + document_headers, b''
+        if compressed:
+            body = document.gzip_body
+            document_headers += b'Content-Encoding: gzip\r\n'
+        else:
+            body = document.body
+        head = b'HTTP/1.1 200 OK\r\n' + document_headers + f'Content-Length: {len(body)}\r\n'.encode()
+        return head, body if method == 'GET' else b''
+
+    @staticmethod
+    def _error(status, extra_headers=''):
+        body = f'{status} {_REASONS[status]}\n'.encode()
+        return (f'HTTP/1.1 {status} {_REASONS[status]}\r\n{extra_headers}Content-Type: text/plain\r\n'
+                f'Content-Length: {len(body)}\r\n').encode(), body
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise InputException('request line is not valid')
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if len(headers) >= _MAX_HEADERS:
+                raise InputException('too many headers')
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return parts, headers
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (InputException, ValueError, asyncio.LimitOverrunError):
+                    head, body = self._error(400)
+                    writer.write(head + b'Connection: close\r\n\r\n' + body)
+                    break
+                if request is None:
+                    break
+                (method, path, version), headers = request
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                head, body = self.respond(method, path, headers)
+                writer.write(head + f'Date: {formatdate(usegmt=True)}\r\n'.encode() +
+                             (b'\r\n' if keep_alive else b'Connection: close\r\n\r\n') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080):
+        """Function to start listening, and rescanning `directory` in the background.
+
+        Returns:
+            asyncio.base_events.Server: The listening server. Use `close` to stop everything.
+
+        """
+        self._server = await asyncio.start_server(self._handle, host, port)
+        if self.directory is not None and self.reload_interval is not None:
+            self._reload_task = asyncio.ensure_future(self._reload_forever())
+        return self._server
+
+    async def close(self):
+        """Function to stop listening and reloading."""
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            self._reload_task = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self, host: str = '127.0.0.1', port: int = 8080):
+        """Function to serve until cancelled."""
+        server = await self.start(host, port)
+        try:
+            await server.serve_forever()
+        finally:
+            await self.close()
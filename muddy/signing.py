@@ -0,0 +1,420 @@
+import os
+import tempfile
+from collections import namedtuple
+from datetime import datetime, timezone
+from functools import lru_cache
+from multiprocessing import Pool
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.hazmat.primitives.serialization import pkcs7
+
+from muddy.exceptions import InputException
+
+SIGNATURE_SUFFIX = '.p7s'
+
+SignResult = namedtuple('SignResult', ['path', 'signature_path', 'error'])
+SignResult.__doc__ = """Outcome of signing a single file in a batch.
+
+    `signature_path` is where the detached signature was written, and `error` is the `InputException` raised
+    for that file (None on success).
+"""
+
+VerifyResult = namedtuple('VerifyResult', ['path', 'signature_path', 'error'])
+VerifyResult.__doc__ = """Outcome of verifying a single file/signature pair in a batch.
+
+    `error` is the `InputException` describing why the signature was rejected, or None if it is valid.
+"""
+
+_HASHES = {
+    '2.16.840.1.101.3.4.2.1': hashes.SHA256,
+    '2.16.840.1.101.3.4.2.2': hashes.SHA384,
+    '2.16.840.1.101.3.4.2.3': hashes.SHA512,
+}
+_DATA = '1.2.840.113549.1.7.1'
+_SIGNED_DATA = '1.2.840.113549.1.7.2'
+_CONTENT_TYPE = '1.2.840.113549.1.9.3'
+_MESSAGE_DIGEST = '1.2.840.113549.1.9.4'
+
+
+def get_signature_path(path: str):
+    """Function to get the path of the detached signature of a MUD file: its path with a `.p7s` extension."""
+    return os.path.splitext(path)[0] + SIGNATURE_SUFFIX
+
+
+class Signer:
+    """Produces detached CMS signatures of MUD files with a private key and its certificate.
+
+    The key and certificate are parsed once, when the signer is created. Use `load_signer` to share signers
+    across calls.
+
+    Args:
+        key_pem (bytes): PEM-encoded private key (RSA or EC).
+        cert_pem (bytes): PEM-encoded certificate of the key.
+        password (bytes, optional): Password of the key, if it is encrypted.
+
+    """
+    __slots__ = ('key', 'cert', '_options')
+
+    def __init__(self, key_pem: bytes, cert_pem: bytes, password: bytes = None):
+        try:
+            self.key = serialization.load_pem_private_key(key_pem, password)
+            self.cert = x509.load_pem_x509_certificate(cert_pem)
+        except (TypeError, ValueError) as e:
+            raise InputException(f'signing key or certificate is not valid: {e}')
+        spki = (serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+        if self.key.public_key().public_bytes(*spki) != self.cert.public_key().public_bytes(*spki):
+            raise InputException('signing certificate does not match the key')
+        self._options = [pkcs7.PKCS7Options.DetachedSignature, pkcs7.PKCS7Options.Binary]
+
+    def sign(self, data: bytes):
+        """Function to sign a serialized MUD object.
+
+        Args:
+            data (bytes): The exact bytes served as the MUD file.
+
+        Returns:
+            bytes: The DER-encoded detached CMS SignedData.
+
+        """
+        return pkcs7.PKCS7SignatureBuilder().set_data(data) \
+            .add_signer(self.cert, self.key, hashes.SHA256()) \
+            .sign(serialization.Encoding.DER, self._options)
+
+
+@lru_cache(maxsize=8)
+def _load_signer(key_path, cert_path, password, key_mtime, cert_mtime):
+    with open(key_path, 'rb') as fp:
+        key_pem = fp.read()
+    with open(cert_path, 'rb') as fp:
+        cert_pem = fp.read()
+    return Signer(key_pem, cert_pem, password)
+
+
+def load_signer(key_path: str, cert_path: str, password: bytes = None):
+    """Function to get a `Signer` for key and certificate files. Signers are cached per process, and
+       reloaded when either file changes.
+
+    Args:
+        key_path (str): Path of the PEM-encoded private key.
+        cert_path (str): Path of the PEM-encoded certificate.
+        password (bytes, optional): Password of the key, if it is encrypted.
+
+    Returns:
+        Signer: The signer.
+
+    """
+    return _load_signer(key_path, cert_path, password, os.stat(key_path).st_mtime_ns, os.stat(cert_path).st_mtime_ns)
+
+
+def sign_file(path: str, key_path: str, cert_path: str, password: bytes = None, signature_path: str = None):
+    """Function to write the detached signature of a MUD file next to it.
+
+    Args:
+        path (str): Path of the MUD file.
+        key_path (str): Path of the PEM-encoded private key.
+        cert_path (str): Path of the PEM-encoded certificate.
+        password (bytes, optional): Password of the key, if it is encrypted.
+        signature_path (str, optional): Where to write the signature. Defaults to `get_signature_path(path)`.
+
+    Returns:
+        str: The path of the signature.
+
+    """
+    signer = load_signer(key_path, cert_path, password)
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    signature = signer.sign(data)
+    signature_path = signature_path or get_signature_path(path)
+    # a reader never sees a partly written signature
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(signature_path) or '.', suffix='.tmp')
+    with os.fdopen(fd, 'wb') as fp:
+        fp.write(signature)
+    os.replace(tmp_path, signature_path)
+    return signature_path
+
+
+# DER walking, enough to verify SignedData with signed attributes, as produced by `Signer` and `openssl cms`
+
+def _read_tlv(data, offset):
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7f
+        if not size:
+            raise InputException('signature is not valid: indefinite length BER is not supported')
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    end = offset + length
+    if end > len(data):
+        raise InputException('signature is not valid: truncated DER')
+    return tag, offset, end
+
+
+def _children(data, start, end):
+    children = []
+    while start < end:
+        tag, value_start, value_end = _read_tlv(data, start)
+        children.append((tag, start, value_start, value_end))
+        start = value_end
+    return children
+
+
+def _oid(value):
+    parts = []
+    number = 0
+    for byte in value:
+        number = (number << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            parts.append(number)
+            number = 0
+    first = min(parts[0] // 40, 2)
+    return '.'.join(str(part) for part in [first, parts[0] - first * 40] + parts[1:])
+
+
+def _parse_signed_data(signature):
+    tag, start, end = _read_tlv(signature, 0)
+    content_info = _children(signature, start, end)
+    if tag != 0x30 or len(content_info) < 2 or \
+            _oid(signature[content_info[0][2]:content_info[0][3]]) != _SIGNED_DATA:
+        raise InputException('signature is not valid: not a CMS SignedData')
+    _, _, start, end = content_info[1]
+    _, start, end = _read_tlv(signature, start)
+    fields = _children(signature, start, end)
+    encapsulated = _children(signature, fields[2][2], fields[2][3])[0]
+    content_type = _oid(signature[encapsulated[2]:encapsulated[3]])
+    certificates = []
+    signer_infos = None
+    for field_tag, field_start, value_start, value_end in fields[3:]:
+        if field_tag == 0xa0:
+            certificates = [x509.load_der_x509_certificate(signature[child[1]:child[3]])
+                            for child in _children(signature, value_start, value_end) if child[0] == 0x30]
+        elif field_tag == 0x31:
+            signer_infos = _children(signature, value_start, value_end)
+    if not signer_infos:
+        raise InputException('signature is not valid: no signer')
+    return content_type, certificates, signer_infos
+
+
+def _verify_signer_info(signature, signer_info, data, content_type, certificates):
+    _, _, start, end = signer_info
+    fields = _children(signature, start, end)
+    sid = fields[1]
+    digest_oid = _oid(signature[slice(*_read_tlv(signature, fields[2][2])[1:])])
+    hash_type = _HASHES.get(digest_oid)
+    if hash_type is None:
+        raise InputException(f'signature is not valid: unsupported digest algorithm {digest_oid}')
+    index = 3
+    signed_attributes = None
+    if fields[index][0] == 0xa0:
+        signed_attributes = fields[index]
+        index += 1
+    signature_value = signature[fields[index + 1][2]:fields[index + 1][3]]
+
+    if sid[0] != 0x30:
+        raise InputException('signature is not valid: signer must be identified by issuer and serial number')
+    issuer, serial = _children(signature, sid[2], sid[3])[:2]
+    cert = next((cert for cert in certificates
+                 if cert.issuer.public_bytes() == signature[issuer[1]:issuer[3]] and
+                 cert.serial_number == int.from_bytes(signature[serial[2]:serial[3]], 'big', signed=True)), None)
+    if cert is None:
+        raise InputException('signature is not valid: signer certificate is missing')
+
+    digest = hashes.Hash(hash_type())
+    digest.update(data)
+    digest = digest.finalize()
+    if signed_attributes is None:
+        # RFC 5652 5.3: only id-data content may be signed without signed attributes
+        if content_type != _DATA:
+            raise InputException('signature is not valid: signed content type does not match')
+        signed = data
+    else:
+        message_digest = signed_content_type = None
+        for attribute in _children(signature, signed_attributes[2], signed_attributes[3]):
+            attribute_type, values = _children(signature, attribute[2], attribute[3])[:2]
+            attribute_type = _oid(signature[attribute_type[2]:attribute_type[3]])
+            value = _children(signature, values[2], values[3])[0]
+            if attribute_type == _MESSAGE_DIGEST:
+                message_digest = signature[value[2]:value[3]]
+            elif attribute_type == _CONTENT_TYPE:
+                signed_content_type = _oid(signature[value[2]:value[3]])
+        # RFC 5652 5.3: signed attributes must include the content type, matching the encapsulated one
+        if signed_content_type != content_type:
+            raise InputException('signature is not valid: signed content type does not match')
+        if message_digest != digest:
+            raise InputException('signature is not valid: the MUD file was modified')
+        # the signature covers the DER encoding of the attributes as a SET, not as the [0] field
+        signed = b'\x31' + signature[signed_attributes[1] + 1:signed_attributes[3]]
+
+    public_key = cert.public_key()
+    try:
+        if isinstance(public_key, rsa.RSAPublicKey):
+            public_key.verify(signature_value, signed, padding.PKCS1v15(), hash_type())
+        elif isinstance(public_key, ec.EllipticCurvePublicKey):
+            public_key.verify(signature_value, signed, ec.ECDSA(hash_type()))
+        else:
+            raise InputException('signature is not valid: unsupported key type')
+    except InvalidSignature:
+        raise InputException('signature is not valid: bad signature')
+    return cert
+
+
+class Verifier:
+    """Verifies detached CMS signatures of MUD files against trusted certificates.
+
+    A signature is accepted if its signed message digest and content type match the file, its signature verifies
+    with the embedded signer certificate, and that certificate is currently valid and is either one of the trusted
+    certificates or directly issued by one of them. An issuer must be a CA: its basic constraints must have `cA`
+    set and, if it has a key usage extension, it must allow `keyCertSign`.
+
+    Args:
+        trusted_pem (bytes): One or more PEM-encoded trusted certificates (signers or issuing CAs).
+
+    """
+    __slots__ = ('trusted',)
+
+    def __init__(self, trusted_pem: bytes):
+        try:
+            self.trusted = x509.load_pem_x509_certificates(trusted_pem)
+        except ValueError as e:
+            raise InputException(f'trusted certificates are not valid: {e}')
+
+    @staticmethod
+    def _is_ca(cert):
+        try:
+            if not cert.extensions.get_extension_for_class(x509.BasicConstraints).value.ca:
+                return False
+        except x509.ExtensionNotFound:
+            return False
+        try:
+            return cert.extensions.get_extension_for_class(x509.KeyUsage).value.key_cert_sign
+        except x509.ExtensionNotFound:
+            return True
+
+    def _is_trusted(self, cert):
+        for trusted in self.trusted:
+            if cert == trusted:
+                return True
+            if not self._is_ca(trusted):
+                continue
+            try:
+                cert.verify_directly_issued_by(trusted)
+                return True
+            except (ValueError, TypeError, InvalidSignature):
+                continue
+        return False
+
+    def verify(self, data: bytes, signature: bytes):
+        """Function to verify a MUD file against its detached signature.
+
+        Args:
+            data (bytes): The MUD file.
+            signature (bytes): The DER-encoded detached signature.
+
+        Raises:
+            InputException: If the signature is not valid.
+
+        """
+        try:
+            content_type, certificates, signer_infos = _parse_signed_data(signature)
+            cert = _verify_signer_info(signature, signer_infos[0], data, content_type, certificates)
+        except (IndexError, ValueError) as e:
+            raise InputException(f'signature is not valid: {e}')
+        now = datetime.now(timezone.utc)
+        if not cert.not_valid_before_utc <= now <= cert.not_valid_after_utc:
+            raise InputException('signature is not valid: signer certificate is expired or not yet valid')
+        if not self._is_trusted(cert):
+            raise InputException('signature is not valid: signer certificate is not trusted')
+
+
+@lru_cache(maxsize=8)
+def _load_verifier(trusted_path, trusted_mtime):
+    with open(trusted_path, 'rb') as fp:
+        return Verifier(fp.read())
+
+
+def load_verifier(trusted_path: str):
+    """Function to get a `Verifier` for a file of trusted certificates, cached per process."""
+    return _load_verifier(trusted_path, os.stat(trusted_path).st_mtime_ns)
+
+
+def _sign_one(item):
+    path, key_path, cert_path, password = item
+    try:
+        return SignResult(path, sign_file(path, key_path, cert_path, password), None)
+    except InputException as e:
+        return SignResult(path, None, e)
+    except OSError as e:
+        return SignResult(path, None, InputException(f'file is not valid: {e}'))
+
+
+def _verify_one(item):
+    path, signature_path, trusted_path = item
+    try:
+        with open(path, 'rb') as fp:
+            data = fp.read()
+        with open(signature_path, 'rb') as fp:
+            signature = fp.read()
+        load_verifier(trusted_path).verify(data, signature)
+        return VerifyResult(path, signature_path, None)
+    except InputException as e:
+        return VerifyResult(path, signature_path, e)
+    except OSError as e:
+        return VerifyResult(path, signature_path, InputException(f'file is not valid: {e}'))
+
+
+def _map(function, items, workers, chunksize):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunksize < 1:
+        raise InputException(f'chunksize is not valid: {chunksize}')
+    if workers <= 1:
+        for item in items:
+            yield function(item)
+        return
+    # each worker parses the key material once, on its first item, and keeps it in its load_* cache
+    with Pool(workers) as pool:
+        yield from pool.imap(function, items, chunksize)
+
+
+def sign_files(paths, key_path: str, cert_path: str, password: bytes = None, workers: int = None,
+               chunksize: int = 16):
+    """Function to sign many MUD files, spread across a process pool.
+
+    Args:
+        paths (iterable): Paths of the MUD files. Each signature is written to `get_signature_path(path)`.
+        key_path (str): Path of the PEM-encoded private key.
+        cert_path (str): Path of the PEM-encoded certificate.
+        password (bytes, optional): Password of the key, if it is encrypted.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+                                 With 1 or fewer, files are signed in the calling process.
+        chunksize (int, optional): Number of files sent to a worker at a time.
+
+    Yields:
+        SignResult: One result per file, in input order.
+
+    """
+    items = ((path, key_path, cert_path, password) for path in paths)
+    yield from _map(_sign_one, items, workers, chunksize)
+
+
+def verify_files(paths, trusted_path: str, workers: int = None, chunksize: int = 16):
+    """Function to verify many MUD files against their detached signatures, spread across a process pool.
+
+    Args:
+        paths (iterable): Paths of the MUD files, or `(path, signature_path)` pairs. Signatures default to
+                          `get_signature_path(path)`.
+        trusted_path (str): Path of the PEM-encoded trusted certificates, see `Verifier`.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        chunksize (int, optional): Number of files sent to a worker at a time.
+
+    Yields:
+        VerifyResult: One result per file, in input order.
+
+    """
+    items = ((path, get_signature_path(path), trusted_path) if isinstance(path, str) else
+             (path[0], path[1], trusted_path) for path in paths)
+    yield from _map(_verify_one, items, workers, chunksize)
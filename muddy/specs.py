@@ -0,0 +1,109 @@
+import csv
+import json
+
+from muddy.constants import SPEC_FORMATS
+from muddy.exceptions import InputException
+from muddy.utils import get_direction_object, get_ipversion_object, get_match_type_object, get_protocol_object
+
+
+def _split(value):
+    # CSV cells hold lists as space or semicolon separated values
+    return value.replace(';', ' ').split() if isinstance(value, str) else value
+
+
+def _to_int(key):
+    def convert(value):
+        if not isinstance(value, str):
+            return value
+        try:
+            return int(value)
+        except ValueError:
+            raise InputException(f'{key} is not valid: {value}')
+    return convert
+
+
+def _to_bool(value):
+    if not isinstance(value, str):
+        return value
+    if value.lower() in ('true', 'yes', '1'):
+        return True
+    if value.lower() in ('false', 'no', '0'):
+        return False
+    raise InputException(f'is_supported is not valid: {value}')
+
+
+def _to_objects(get_object):
+    return lambda value: [get_object(item) if isinstance(item, str) else item for item in _split(value)]
+
+
+def _to_ports(key):
+    to_int = _to_int(key)
+    return lambda value: [to_int(port) for port in _split(value)]
+
+
+_SPEC_CONVERTERS = {
+    'mud_version': _to_int('mud_version'),
+    'is_supported': _to_bool,
+    'cache_validity': _to_int('cache_validity'),
+    'directions_initiated': _to_objects(get_direction_object),
+    'ip_version': lambda value: get_ipversion_object(value) if isinstance(value, str) else value,
+    'protocol': lambda value: get_protocol_object(value) if isinstance(value, str) else value,
+    'match_types': _to_objects(get_match_type_object),
+    'local_ports': _to_ports('local_ports'),
+    'remote_ports': _to_ports('remote_ports'),
+}
+
+
+def parse_spec(record):
+    """Function to turn a spec with string values, as read from JSON or CSV, into `make_mud` keyword arguments.
+
+    Enums are given by the names accepted by the `muddy.utils` `get_*_object` functions (e.g. `to_device`,
+    `ipv4`, `tcp`, `is_cloud`), and lists either as lists or as space or semicolon separated strings. Values
+    that are already converted are kept as they are, and empty values are dropped.
+
+    Args:
+        record (dict): The spec to convert.
+
+    Returns:
+        dict: The keyword arguments of a `make_mud` call.
+
+    """
+    spec = {}
+    for key, value in record.items():
+        if value is None or value == '':
+            continue
+        converter = _SPEC_CONVERTERS.get(key)
+        spec[key] = converter(value) if converter is not None else value
+    return spec
+
+
+def read_specs(fp, spec_format: str = 'jsonl'):
+    """Function to read specs from a JSONL or CSV file, one device per line or row.
+
+    CSV files must have a header row naming the `make_mud` keyword arguments. The specs are not converted,
+    see `parse_spec`.
+
+    Args:
+        fp (file): The file to read from, opened in text mode.
+        spec_format (str, optional): One of `SPEC_FORMATS`.
+
+    Yields:
+        dict: One spec per device.
+
+    """
+    if spec_format == 'csv':
+        for row in csv.DictReader(fp):
+            yield row
+    elif spec_format == 'jsonl':
+        for number, line in enumerate(fp, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise InputException(f'spec on line {number} is not valid: {e}')
+            if not isinstance(record, dict):
+                raise InputException(f'spec on line {number} is not valid: not an object')
+            yield record
+    else:
+        raise InputException(f'spec_format is not valid: {spec_format}')
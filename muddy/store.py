@@ -0,0 +1,255 @@
+import copy
+import hashlib
+import json
+import marshal
+import sys
+from collections import namedtuple
+
+from muddy.exceptions import InputException
+from muddy.maker import POLICY_KEYS
+
+_CONTAINER = 'ietf-mud:mud'
+_ACLS = 'ietf-access-control-list:acls'
+_POLICY_KEY_SET = frozenset(POLICY_KEYS.values())
+_NO_MEMBERS = {}
+
+StoreStats = namedtuple('StoreStats', ['devices', 'acls', 'fragments', 'aces', 'unique_aces'])
+StoreStats.__doc__ = '''Counts of an `AclStore`: devices, ACLs referenced by them, unique ACL bodies, ACEs of the unique
+ACL bodies and unique ACEs.'''
+
+
+def _digest(value):
+    data = json.dumps(value, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _fast_key(value):
+    # several times faster than _digest, but depends on the order of keys: it only serves as a shortcut to it.
+    # Version 2 doesn't write back-references, so equal values in the same order always give the same bytes
+    try:
+        return marshal.dumps(value, 2)
+    except ValueError:
+        return None
+
+
+def _pack_policy(policy, names):
+    # a policy as made by make_policy is kept as the tuple of its ACL names, anything else as it is
+    try:
+        access_list = policy['access-lists']['access-list']
+        if len(policy) == 1 and len(policy['access-lists']) == 1 and all(len(entry) == 1 for entry in access_list):
+            return tuple(names.get(entry['name'], entry['name']) for entry in access_list)
+    except (KeyError, TypeError):
+        pass
+    return policy
+
+
+def _unpack_policy(policy):
+    if isinstance(policy, tuple):
+        return {'access-lists': {'access-list': [{'name': name} for name in policy]}}
+    return policy
+
+
+class AclFragment:
+    """An ACL body (the ACL minus its name) shared by all the devices whose ACLs have the same content.
+
+    Its ACEs are shared with the other fragments holding equal ACEs. Both must be treated as read-only.
+    """
+    __slots__ = ('digest', 'body', 'aces', 'refs', '_keys')
+
+    def __init__(self, digest, body, aces):
+        self.digest = digest
+        self.body = body
+        self.aces = aces
+        self.refs = 0
+        self._keys = []
+
+    def to_dict(self, name):
+        """Function to materialize the ACL under a device's name for it.
+
+        Returns:
+            dict: The ACL. Its `aces` container is new, the ACEs in it are shared.
+
+        """
+        acl = {'name': name}
+        acl.update(self.body)
+        if self.aces is not None:
+            acl['aces'] = {'ace': list(self.aces)}
+        return acl
+
+
+class AclStore:
+    """In-memory store of the MUD objects of a fleet, keeping one copy of each distinct ACL and ACE.
+
+    MUD objects generated for devices of the same kind only differ in their support information and the
+    random `mud-NNNNN` prefix of their ACL names. The store hashes the normalized content of each ACL, without its
+    name, and keeps a single `AclFragment` per distinct content, referenced by every device using it. Content is
+    first looked up by its `marshal` serialization, and only hashed when that isn't known yet. ACEs are
+    interned the same way across fragments. Fragments and ACEs are reference counted and dropped with the last
+    device using them.
+
+    The ACLs of documents given to `add` are copied into the store, the other members of the documents are kept
+    by reference. `get` turns the stored structures back into an equal MUD object.
+    """
+
+    def __init__(self):
+        self._devices = {}
+        self._fragments = {}
+        self._fragment_keys = {}
+        self._aces = {}
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, device):
+        return device in self._devices
+
+    def _intern_ace(self, ace):
+        digest = _digest(ace)
+        entry = self._aces.get(digest)
+        if entry is None:
+            entry = self._aces[digest] = [ace, 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _intern_acl(self, acl):
+        if not isinstance(acl, dict) or 'name' not in acl:
+            raise InputException('acl is not valid: missing name')
+        body = {key: value for key, value in acl.items() if key != 'name'}
+        key = _fast_key(body)
+        fragment = self._fragment_keys.get(key) if key is not None else None
+        if fragment is not None:
+            fragment.refs += 1
+            return acl['name'], fragment
+        digest = _digest(body)
+        fragment = self._fragments.get(digest)
+        if fragment is None:
+            # copied once per distinct content, so that the store doesn't share objects with the caller
+            body = copy.deepcopy(body)
+            aces = body.get('aces')
+            if isinstance(aces, dict) and len(aces) == 1 and isinstance(aces.get('ace'), list):
+                del body['aces']
+                aces = tuple(self._intern_ace(ace) for ace in aces['ace'])
+            else:
+                aces = None
+            fragment = self._fragments[digest] = AclFragment(digest, body, aces)
+        if key is not None:
+            self._fragment_keys[key] = fragment
+            fragment._keys.append(key)
+        fragment.refs += 1
+        return acl['name'], fragment
+
+    def _release(self, fragment):
+        fragment.refs -= 1
+        if fragment.refs:
+            return
+        del self._fragments[fragment.digest]
+        for key in fragment._keys:
+            del self._fragment_keys[key]
+        for ace in fragment.aces or ():
+            digest = _digest(ace)
+            entry = self._aces[digest]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._aces[digest]
+
+    def add(self, device, mud: dict):
+        """Function to store the MUD object of a device, replacing the one it had.
+
+        Args:
+            device: Hashable identifier of the device, e.g. its MAC address or MUD URL.
+            mud (dict): The MUD object.
+
+        """
+        container = mud.get(_CONTAINER) if isinstance(mud, dict) else None
+        if not isinstance(container, dict):
+            raise InputException('mud is not valid: missing ietf-mud:mud container')
+        extra = {key: value for key, value in mud.items() if key not in (_CONTAINER, _ACLS)}
+        acls_container = mud.get(_ACLS)
+        if acls_container is not None and not isinstance(acls_container, dict):
+            raise InputException(f'mud is not valid: {_ACLS} is not an object')
+        # None when the document has no ACLs container, otherwise its members besides the ACL list
+        acls_members = None if acls_container is None else \
+            {key: value for key, value in acls_container.items() if key != 'acl'} or _NO_MEMBERS
+        acls = []
+        try:
+            for acl in (acls_container or {}).get('acl', []):
+                acls.append(self._intern_acl(acl))
+        except InputException:
+            for _, fragment in acls:
+                self._release(fragment)
+            raise
+        # policies refer to the same name strings as the ACLs, and member names are interned: for a fleet, strings
+        # make up most of what is left once ACLs are shared
+        names = {name: name for name, _ in acls}
+        container = {sys.intern(key): _pack_policy(value, names) if key in _POLICY_KEY_SET else value
+                     for key, value in container.items()}
+        # interned before the previous version is released, so that fragments both use are kept
+        self.remove(device)
+        acls = tuple(acls) if acls_container is not None and 'acl' in acls_container else None
+        self._devices[device] = (container, acls, acls_members, extra or None)
+
+    def remove(self, device):
+        """Function to drop the MUD object of a device, and the fragments no other device uses."""
+        stored = self._devices.pop(device, None)
+        if stored is not None:
+            for _, fragment in stored[1] or ():
+                self._release(fragment)
+
+    def get(self, device):
+        """Function to rebuild the MUD object of a device.
+
+        Returns:
+            dict: The MUD object, equal to the one given to `add`: the ACLs container is only there if it was in
+                  the document given to `add`. The ACEs in it are shared with the store and the other devices, and
+                  must not be modified.
+
+        Raises:
+            KeyError: If the device isn't in the store.
+
+        """
+        container, acls, acls_members, extra = self._devices[device]
+        mud = {_CONTAINER: {key: _unpack_policy(value) for key, value in container.items()}}
+        if acls_members is not None:
+            acls_container = mud[_ACLS] = {}
+            if acls is not None:
+                acls_container['acl'] = [fragment.to_dict(name) for name, fragment in acls]
+            acls_container.update(acls_members)
+        if extra:
+            mud.update(extra)
+        return mud
+
+    def acl(self, device, name: str):
+        """Function to look up an ACL of a device by name.
+
+        Returns:
+            dict: The ACL, or None if the device has no ACL with this name.
+
+        """
+        for acl_name, fragment in self._devices[device][1] or ():
+            if acl_name == name:
+                return fragment.to_dict(name)
+        return None
+
+    def fragment(self, device, name: str):
+        """Function to get the shared fragment behind an ACL of a device, e.g. to find devices with equal ACLs
+           by comparing `digest`.
+
+        Returns:
+            AclFragment: The fragment, or None if the device has no ACL with this name.
+
+        """
+        for acl_name, fragment in self._devices[device][1] or ():
+            if acl_name == name:
+                return fragment
+        return None
+
+    def stats(self):
+        """Function to count what the store holds.
+
+        Returns:
+            StoreStats: The counts.
+
+        """
+        return StoreStats(len(self._devices), sum(len(stored[1] or ()) for stored in self._devices.values()),
+                          len(self._fragments), sum(len(fragment.aces or ()) for fragment in self._fragments.values()),
+                          len(self._aces))
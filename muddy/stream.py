@@ -0,0 +1,88 @@
+import json
+
+_encoder = json.JSONEncoder()
+
+
+def iterencode(obj):
+    """Function to incrementally encode a MUD object as JSON.
+
+    Dicts and lists are walked so that any lazily generated ACE list (e.g. from `make_acls(..., lazy=True)`)
+    is consumed one entry at a time. The concatenated chunks are byte-identical to `json.dumps(obj)` of the
+    equivalent eager object.
+
+    Args:
+        obj: MUD object, or any part of one. Iterators and generators are encoded as JSON arrays.
+
+    Yields:
+        str: JSON text chunks.
+
+    """
+    if isinstance(obj, dict):
+        yield '{'
+        first = True
+        for key, value in obj.items():
+            if not first:
+                yield ', '
+            first = False
+            yield _encode_key(key)
+            yield ': '
+            yield from iterencode(value)
+        yield '}'
+    elif isinstance(obj, (list, tuple)):
+        yield '['
+        first = True
+        for value in obj:
+            if not first:
+                yield ', '
+            first = False
+            yield from iterencode(value)
+        yield ']'
+    elif hasattr(obj, '__next__'):
+        # elements of a lazy sequence are usually small, fully built ACEs: encode each one in a single call,
+        # and only walk the ones that hold lazy parts themselves (e.g. a generator of lazy ACLs)
+        yield '['
+        first = True
+        for value in obj:
+            if not first:
+                yield ', '
+            first = False
+            try:
+                chunk = _encoder.encode(value)
+            except TypeError:
+                yield from iterencode(value)
+            else:
+                yield chunk
+        yield ']'
+    else:
+        yield _encoder.encode(obj)
+
+
+def _encode_key(key):
+    if isinstance(key, str):
+        return _encoder.encode(key)
+    # json.dumps coerces scalar keys to strings
+    return _encoder.encode(next(iter(json.loads(_encoder.encode({key: None})))))
+
+
+def dump(obj, fp):
+    """Function to write a MUD object as JSON to a file-like object in bounded memory.
+
+    Args:
+        obj: MUD object, possibly holding lazily generated ACE lists.
+        fp: Text file-like object with a `write` method, e.g. an open file or `socket.makefile('w')`.
+
+    """
+    write = fp.write
+    for chunk in iterencode(obj):
+        write(chunk)
+
+
+def dump_acls(acls, fp):
+    """Function to write the `ietf-access-control-list:acls` container for a list of ACLs.
+
+    Args:
+        acls (iterable): ACLs as returned by `make_acl` / `make_acls`, possibly built with `lazy=True`.
+        fp: Text file-like object with a `write` method.
+
+    """
+    dump({'acl': acls if isinstance(acls, list) else iter(acls)}, fp)
@@ -65,7 +65,7 @@ def get_ipversion_object(ip_version):
     if ip_version == 'ipv4':
         return IPVersion.IPV4
     if ip_version == 'ipv6':
-        return IPVersion.IPV4
+        return IPVersion.IPV6
     if ip_version == 'both':
         return IPVersion.BOTH
     raise InputException(f'ip_version is not valid: {ip_version}')
@@ -101,3 +101,46 @@ def get_match_type_object(match_type):
     if match_type == 'is_cloud':
         return MatchType.IS_CLOUD
     raise InputException(f'match_type is not valid: {match_type}')
+
+
+def get_spec_digest(spec, exclude=()):
+    """Function to hash a MUD spec (e.g. the keyword arguments of a `make_mud` call) independently of
+       dict ordering. Enum members are hashed by name.
+
+    Args:
+        spec (dict): The spec to hash.
+        exclude (iterable, optional): Top-level keys to leave out of the hash.
+
+    Returns:
+        str: Hex SHA-256 digest of the normalized spec.
+
+    """
+    import hashlib
+    import json
+    normalized = {key: value for key, value in spec.items() if key not in exclude}
+    data = json.dumps(normalized, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def parse_last_update(last_update):
+    """Function to parse the `last-update` of a MUD object.
+
+    `make_support_info` stamps the local time without a UTC offset, so a `last-update` without one is read as
+    local time.
+
+    Args:
+        last_update (str): The `last-update`, `YYYY-MM-DDTHH:MM:SS` with an optional UTC offset.
+
+    Returns:
+        datetime: The time, timezone-aware, or None if `last_update` isn't valid.
+
+    """
+    from datetime import datetime
+    for date_format in ('%Y-%m-%dT%H:%M:%S%z', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            value = datetime.strptime(last_update, date_format)
+        except (TypeError, ValueError):
+            continue
+        # astimezone reads a naive time as local time
+        return value if value.tzinfo is not None else value.astimezone()
+    return None
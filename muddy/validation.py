@@ -0,0 +1,141 @@
+from collections import namedtuple
+from functools import lru_cache
+
+from muddy.constants import DOMAIN_NAME_REGEX, HTTP_URL_REGEX, URN_URL_REGEX
+from muddy.exceptions import InputException
+
+DOMAIN = 'domain'
+"""Domain names, as used by `make_acldns_match` and `make_manufacturer_match`."""
+URI = 'uri'
+"""Controller class URIs (HTTP(S) URLs or URNs), as used by `make_controller_match`."""
+MUD_URL = 'mud-url'
+"""MUD URLs, which RFC 8520 requires to use the https scheme."""
+
+
+@lru_cache(maxsize=None)
+def _pattern(regex):
+    # compiled on first use, which keeps re and the compilation out of the import time of muddy.maker
+    import re
+    return re.compile(regex)
+
+
+_RULES = {
+    DOMAIN: (lambda value: _pattern(DOMAIN_NAME_REGEX).match(value) is not None, 'Not a domain name'),
+    URI: (lambda value: _pattern(HTTP_URL_REGEX).match(value) is not None or
+          _pattern(URN_URL_REGEX).match(value) is not None, 'Not a valid URI'),
+    MUD_URL: (lambda value: value[:8].lower() == 'https://' and _pattern(HTTP_URL_REGEX).match(value) is not None,
+              'Not a valid MUD URL'),
+}
+
+ValidationReport = namedtuple('ValidationReport', ['valid', 'errors'])
+ValidationReport.__doc__ = """Outcome of a batch validation.
+
+    `valid` lists the accepted values in input order, and `errors` lists `(index, value, message)` for
+    every rejected value.
+"""
+
+
+class Validator:
+    """Validates domains, URIs and MUD URLs with precompiled rules, remembering the values it has seen.
+
+    Accepted values are cached per kind, so validating them again (in a later batch, or from `make_sub_ace`
+    through the module-level functions) is a set lookup.
+
+    Args:
+        max_cache_size (int, optional): Maximum number of remembered values per kind. The cache of a kind
+                                        is cleared when it is full.
+
+    """
+
+    def __init__(self, max_cache_size: int = 100000):
+        self.max_cache_size = max_cache_size
+        self._accepted = {kind: set() for kind in _RULES}
+        self._rejected = {kind: set() for kind in _RULES}
+
+    def is_valid(self, kind: str, value: str):
+        """Function to check a single value.
+
+        Args:
+            kind (str): One of `DOMAIN`, `URI` or `MUD_URL`.
+            value (str): The value to check.
+
+        Returns:
+            bool: Whether the value is valid.
+
+        """
+        if not isinstance(value, str):
+            return False
+        accepted = self._accepted[kind]
+        if value in accepted:
+            return True
+        rejected = self._rejected[kind]
+        if value in rejected:
+            return False
+        valid = _RULES[kind][0](value)
+        cache = accepted if valid else rejected
+        if len(cache) >= self.max_cache_size:
+            cache.clear()
+        cache.add(value)
+        return valid
+
+    def validate(self, values, kind: str):
+        """Function to validate a batch of values in one pass.
+
+        Args:
+            values (iterable): The values to validate.
+            kind (str): One of `DOMAIN`, `URI` or `MUD_URL`.
+
+        Returns:
+            ValidationReport: The accepted values and an error for each rejected one.
+
+        """
+        if kind not in _RULES:
+            raise InputException(f'validation kind is not valid: {kind}')
+        message = _RULES[kind][1]
+        valid = []
+        errors = []
+        for index, value in enumerate(values):
+            if self.is_valid(kind, value):
+                valid.append(value)
+            else:
+                errors.append((index, value, f'{message}: {value}'))
+        return ValidationReport(valid, errors)
+
+    def clear(self):
+        """Function to forget every value seen so far."""
+        for kind in _RULES:
+            self._accepted[kind].clear()
+            self._rejected[kind].clear()
+
+
+default_validator = Validator()
+"""The validator shared by `muddy.maker`. Values accepted by `validate` are not re-checked by `make_sub_ace`."""
+
+
+def validate(values, kind: str):
+    """Function to validate a batch of values with the shared `default_validator`.
+
+    Args:
+        values (iterable): The values to validate.
+        kind (str): One of `DOMAIN`, `URI` or `MUD_URL`.
+
+    Returns:
+        ValidationReport: The accepted values and an error for each rejected one.
+
+    """
+    return default_validator.validate(values, kind)
+
+
+def is_domain_name(value: str):
+    """Function to check a domain name with the shared `default_validator`."""
+    return default_validator.is_valid(DOMAIN, value)
+
+
+def is_uri(value: str):
+    """Function to check a controller class URI with the shared `default_validator`."""
+    return default_validator.is_valid(URI, value)
+
+
+def is_mud_url(value: str):
+    """Function to check a MUD URL with the shared `default_validator`."""
+    return default_validator.is_valid(MUD_URL, value)
@@ -14,6 +14,10 @@ setup(
         'Click>=7,<8',
         'overload>=1.1'
     ],
+    extras_require={
+        'audit': ['numpy'],
+        'sign': ['cryptography>=42'],
+    },
     entry_points='''
         [console_scripts]
         muddy=muddy.scripts.mudcli:cli
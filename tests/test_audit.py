@@ -0,0 +1,142 @@
+import itertools
+import random
+
+import pytest
+
+from muddy.evaluator import Flow, PolicyEvaluator
+from muddy.maker import make_mud
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+from muddy.nftables import NftCompiler
+
+np = pytest.importorskip('numpy')
+audit = pytest.importorskip('muddy.audit')
+
+MUD_URL = 'https://lighting.example.com/lightbulb2000'
+PEERS = ['cloud.example.com', 'Cloud.Example.com.', 'other.example.com', 'Lighting.example.com',
+         'https://controller.example.com/lights']
+PORTS = [-1, 80, 443, 1024, 8883, 40000]
+MATCH_TYPES = [MatchType.IS_CLOUD, MatchType.IS_CONTROLLER, MatchType.IS_MY_CONTROLLER, MatchType.IS_MFG,
+               MatchType.IS_MYMFG]
+
+
+def made_mud(ip_version, protocol, match_type, directions):
+    target = PEERS[4] if match_type is MatchType.IS_CONTROLLER else PEERS[0]
+    return make_mud(mud_version=1, mud_url=MUD_URL, is_supported=True, last_update='2024-01-01T00:00:00',
+                    directions_initiated=directions, ip_version=ip_version, target_url=target, protocol=protocol,
+                    match_types=[match_type], local_ports=[80, 8883], remote_ports=[443])
+
+
+def handwritten_mud():
+    """Port operators, ranges, src-dnsname and a drop ACE, which make_mud doesn't generate."""
+    aces = [
+        {'name': 'drop-neq', 'matches': {'ipv4': {'protocol': 6, 'ietf-acldns:src-dnsname': 'other.example.com'},
+                                         'tcp': {'source-port': {'operator': 'neq', 'port': 443}}},
+         'actions': {'forwarding': 'drop'}},
+        {'name': 'range', 'matches': {'ipv4': {'protocol': 17},
+                                      'udp': {'destination-port': {'lower-port': 1000, 'upper-port': 9000}}},
+         'actions': {'forwarding': 'accept'}},
+        {'name': 'src-name', 'matches': {'ipv4': {'ietf-acldns:src-dnsname': 'cloud.example.com'}},
+         'actions': {'forwarding': 'accept'}},
+        {'name': 'gte', 'matches': {'tcp': {'ietf-mud:direction-initiated': 'from-device',
+                                            'destination-port': {'operator': 'gte', 'port': 8000}}},
+         'actions': {'forwarding': 'accept'}},
+        {'name': 'mfg', 'matches': {'ietf-mud:mud': {'manufacturer': 'Other.example.com'}},
+         'actions': {'forwarding': 'accept'}},
+        {'name': 'ctl', 'matches': {'ietf-mud:mud': {'controller': 'https://controller.example.com/lights'}},
+         'actions': {'forwarding': 'accept'}},
+    ]
+    acl = {'name': 'hand-v4', 'type': 'ipv4-acl-type', 'aces': {'ace': aces}}
+    policy = {'access-lists': {'access-list': [{'name': 'hand-v4'}]}}
+    return {'ietf-mud:mud': {'mud-version': 1, 'mud-url': MUD_URL, 'to-device-policy': policy,
+                             'from-device-policy': policy},
+            'ietf-access-control-list:acls': {'acl': [acl]}}
+
+
+def muds():
+    for ip_version, protocol, match_type in itertools.product(
+            IPVersion, (Protocol.TCP, Protocol.UDP, Protocol.ANY), MATCH_TYPES):
+        yield made_mud(ip_version, protocol, match_type, [Direction.TO_DEVICE, Direction.FROM_DEVICE])
+    yield handwritten_mud()
+
+
+def random_flows(count, seed):
+    rng = random.Random(seed)
+    columns = {
+        'direction': [rng.choice((0, 1)) for _ in range(count)],
+        'ip_version': [rng.choice((4, 6)) for _ in range(count)],
+        'protocol': [rng.choice((6, 17)) for _ in range(count)],
+        'source_port': [rng.choice(PORTS) for _ in range(count)],
+        'destination_port': [rng.choice(PORTS) for _ in range(count)],
+        'peer': [rng.randrange(-1, len(PEERS)) for _ in range(count)],
+        'manufacturer': [rng.randrange(-1, len(PEERS)) for _ in range(count)],
+        'controller': [rng.randrange(-1, len(PEERS)) for _ in range(count)],
+        'direction_initiated': [rng.choice((0, 1, 2)) for _ in range(count)],
+        'same_manufacturer': [rng.random() < 0.5 for _ in range(count)],
+        'my_controller': [rng.random() < 0.5 for _ in range(count)],
+    }
+    return audit.make_flow_arrays(peers=PEERS, **columns)
+
+
+def evaluator_flow(flows, i):
+    """The flow at `i`, named on the side of its remote host only."""
+    initiated = {0: None, 1: Direction.TO_DEVICE, 2: Direction.FROM_DEVICE}
+    peer, manufacturer, controller = (flows.peers[column[i]] if column[i] >= 0 else None
+                                      for column in (flows.peer, flows.manufacturer, flows.controller))
+    ports = [int(port) if port >= 0 else None for port in (flows.source_port[i], flows.destination_port[i])]
+    if flows.direction[i] == 0:
+        direction, names = Direction.TO_DEVICE, {'src_dnsname': peer}
+    else:
+        direction, names = Direction.FROM_DEVICE, {'dst_dnsname': peer}
+    return Flow(direction, f'ipv{flows.ip_version[i]}', int(flows.protocol[i]), *ports, manufacturer=manufacturer,
+                controllers=(controller,) if controller else (), same_manufacturer=bool(flows.same_manufacturer[i]),
+                my_controller=bool(flows.my_controller[i]),
+                direction_initiated=initiated[int(flows.direction_initiated[i])], **names)
+
+
+@pytest.mark.parametrize('seed, mud', list(enumerate(muds())))
+def test_audit_agrees_with_evaluator(seed, mud):
+    table = audit.make_ace_table(mud)
+    evaluator = PolicyEvaluator(mud)
+    flows = random_flows(300, seed)
+    result = audit.audit_flows(table, flows)
+    assert table.unresolved == evaluator.unresolved
+    for i in range(len(flows.direction)):
+        flow = evaluator_flow(flows, i)
+        name = table.names[result.ace[i]] if result.ace[i] >= 0 else None
+        assert (name, bool(result.allowed[i])) == (evaluator.match(flow), evaluator.is_allowed(flow)), flow
+
+
+def test_remote_host_name_in_every_backend():
+    # make_mud names the cloud with dst-dnsname in both policies, it is the remote host in both
+    mud = made_mud(IPVersion.IPV4, Protocol.TCP, MatchType.IS_CLOUD, [Direction.TO_DEVICE, Direction.FROM_DEVICE])
+    evaluator = PolicyEvaluator(mud)
+    to_device = Flow(Direction.TO_DEVICE, IPVersion.IPV4, Protocol.TCP, 443, 80, src_dnsname='cloud.example.com',
+                     direction_initiated=Direction.TO_DEVICE)
+    from_device = Flow(Direction.FROM_DEVICE, IPVersion.IPV4, Protocol.TCP, 443, 80, dst_dnsname='cloud.example.com',
+                       direction_initiated=Direction.FROM_DEVICE)
+    assert [evaluator.match(to_device), evaluator.match(from_device)] == ['cl0-todev', 'cl0-frdev']
+    # the name of the device itself is never matched
+    assert evaluator.match(to_device._replace(src_dnsname=None, dst_dnsname='cloud.example.com')) is None
+
+    table = audit.make_ace_table(mud)
+    flows = audit.make_flow_arrays([0, 1], [6, 6], [443, 443], [80, 80], peer=[0, 0], peers=['cloud.example.com'],
+                                   ip_version=[4, 4], direction_initiated=[1, 2])
+    result = audit.audit_flows(table, flows)
+    assert [table.names[i] for i in result.ace] == ['cl0-todev', 'cl0-frdev']
+    assert result.allowed.tolist() == [True, True]
+
+    compiler = NftCompiler()
+    from_chain, to_chain = compiler.add('192.168.1.10', mud)
+    chains = {block.split(' {')[0]: block for block in compiler.render().split('\tchain ')[1:]}
+    assert 'ip saddr @dns4_cloud_example_com tcp sport 443 tcp dport { 80, 8883 } return' in chains[to_chain]
+    assert 'ip daddr @dns4_cloud_example_com tcp sport 443 tcp dport { 80, 8883 } return' in chains[from_chain]
+
+
+def test_manufacturer_and_controller_are_not_dnsnames():
+    table = audit.make_ace_table(handwritten_mud())
+    peers = ['other.example.com', 'OTHER.example.com', 'https://controller.example.com/lights']
+    # a remote host named other.example.com matches neither the manufacturer nor the controller ACE
+    flows = audit.make_flow_arrays([1, 1, 1], [1, 1, 1], peer=[0, 2, -1], manufacturer=[-1, -1, 1],
+                                   controller=[2, -1, -1], peers=peers, ip_version=[4, 4, 4])
+    result = audit.audit_flows(table, flows)
+    assert [table.names[i] if i >= 0 else None for i in result.ace] == ['ctl', None, 'mfg']
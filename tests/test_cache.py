@@ -0,0 +1,81 @@
+import json
+import os
+import re
+
+import pytest
+
+import muddy.cache
+from muddy.cache import MudCache
+from muddy.exceptions import InputException
+from muddy.maker import make_mud, make_mud_name
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+SPEC = {'mud_version': 1, 'mud_url': 'https://lighting.example.com/lightbulb2000', 'is_supported': True,
+        'directions_initiated': [Direction.FROM_DEVICE], 'ip_version': IPVersion.IPV4,
+        'target_url': 'cloud.example.com', 'protocol': Protocol.TCP, 'match_types': [MatchType.IS_CLOUD],
+        'local_ports': [80], 'remote_ports': [443], 'last_update': '2024-01-01T00:00:00'}
+
+
+def spec(i=0, **changes):
+    return dict(SPEC, mud_url=f'https://lighting.example.com/lightbulb{i}', **changes)
+
+
+def test_deterministic_names_keep_64_bits():
+    names = {make_mud_name(spec(i)) for i in range(2000)}
+    assert len(names) == 2000
+    assert all(re.fullmatch('mud-[0-9a-f]{16}', name) for name in names)
+    assert make_mud_name(spec(1)) == make_mud_name(spec(1, last_update='2025-01-01T00:00:00'))
+
+
+def test_hits_and_misses(tmp_path):
+    cache = MudCache(str(tmp_path))
+    data = cache.make(spec())
+    assert json.loads(data) == make_mud(**dict(spec(), deterministic=True))
+    assert cache.make(spec()) == data
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+    # entries survive reopening the directory
+    assert MudCache(str(tmp_path)).get(spec()) == data
+
+
+@pytest.mark.parametrize('changes', [{'mud_url': 'https://lighting.example.com/other'}, {'system_info': 'Lightbulb'},
+                                     {'last_update': '2024-02-01T00:00:00'}])
+def test_spec_change_misses(tmp_path, changes):
+    cache = MudCache(str(tmp_path))
+    cache.make(spec())
+    changed = dict(spec(), **changes)
+    assert cache.get(changed) is None
+    cache.make(changed)
+    assert (cache.hits, cache.misses, len(cache)) == (0, 3, 2)
+
+
+def test_generator_version_change_misses(tmp_path, monkeypatch):
+    cache = MudCache(str(tmp_path))
+    cache.make(spec())
+    monkeypatch.setattr(muddy.cache, 'GENERATOR_VERSION', muddy.cache.GENERATOR_VERSION + 1)
+    assert MudCache(str(tmp_path)).get(spec()) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = MudCache(str(tmp_path))
+    size = len(cache.make(spec(0)))
+    cache = MudCache(str(tmp_path), max_bytes=2 * size + 10)
+    cache.make(spec(1))
+    cache.get(spec(0))
+    cache.make(spec(2))
+    assert [cache.get(spec(i)) is not None for i in range(3)] == [True, False, True]
+    assert cache.size <= cache.max_bytes
+
+
+def test_opening_an_oversized_directory_evicts(tmp_path):
+    cache = MudCache(str(tmp_path))
+    for i in range(4):
+        cache.make(spec(i))
+        os.utime(cache._path(cache.key(spec(i))), (i, i))
+    cache = MudCache(str(tmp_path), max_bytes=cache.size // 2)
+    assert len(cache) == 2
+    assert [cache.get(spec(i)) is not None for i in range(4)] == [False, False, True, True]
+
+
+def test_invalid_max_bytes(tmp_path):
+    with pytest.raises(InputException):
+        MudCache(str(tmp_path), max_bytes=-1)
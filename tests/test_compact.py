@@ -0,0 +1,49 @@
+import itertools
+
+import pytest
+
+from muddy.compact import CompactAce, CompactAcl, make_compact_mud
+from muddy.exceptions import InputException
+from muddy.maker import make_acl, make_mud, make_support_info
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+SUPPORT_INFO = make_support_info(1, 'https://lighting.example.com/lightbulb2000', True, 48,
+                                 last_update='2024-01-01T00:00:00')
+ARGUMENTS = {'directions_initiated': [Direction.TO_DEVICE, Direction.FROM_DEVICE], 'target_url': 'cloud.example.com',
+             'match_types': [MatchType.IS_CLOUD, MatchType.IS_MYMFG], 'local_ports': [0, 80, 65535],
+             'remote_ports': [443]}
+
+
+@pytest.mark.parametrize('ip_version, protocol', list(itertools.product(IPVersion, Protocol)))
+def test_compact_mud_round_trip(ip_version, protocol):
+    mud = make_mud(support_info=SUPPORT_INFO, ip_version=ip_version, protocol=protocol, **ARGUMENTS)
+    mud_name = mud['ietf-access-control-list:acls']['acl'][0]['name'].rsplit('-', 1)[0]
+    compact = make_compact_mud(SUPPORT_INFO, ip_version=ip_version, protocol=protocol, mud_name=mud_name, **ARGUMENTS)
+    assert compact.to_dict() == mud
+
+
+@pytest.mark.parametrize('local_ports, remote_ports', [(None, None), ([], [443]), ([0, 80, 65535], None),
+                                                       ([80, 8883], [443, 8443])])
+def test_compact_acl_round_trip(local_ports, remote_ports):
+    arguments = (Direction.FROM_DEVICE, IPVersion.IPV4, 'cloud.example.com', Protocol.TCP,
+                 [MatchType.IS_CLOUD, MatchType.IS_MYMFG], Direction.TO_DEVICE, local_ports, remote_ports)
+    acl = make_acl(*arguments, 'mud-12345-v4to')
+    compact = CompactAcl('mud-12345-v4to', *arguments)
+    assert compact.to_dict() == acl
+    aces = acl['aces']['ace']
+    assert len(compact) == len(aces)
+    assert [ace.to_dict() for ace in compact] == aces
+
+
+@pytest.mark.parametrize('port', [65536, -1, 'http', None])
+def test_invalid_port(port):
+    with pytest.raises(InputException, match='port is not valid'):
+        CompactAcl('mud-12345-v4to', Direction.FROM_DEVICE, IPVersion.IPV4, 'cloud.example.com', Protocol.TCP,
+                   [MatchType.IS_CLOUD], Direction.TO_DEVICE, [80, port])
+
+
+@pytest.mark.parametrize('port', [65536, -1])
+def test_invalid_ace_port(port):
+    with pytest.raises(InputException, match='port is not valid'):
+        CompactAce('cl0-todev', Direction.FROM_DEVICE, 'cloud.example.com', Protocol.TCP, MatchType.IS_CLOUD,
+                   Direction.TO_DEVICE, IPVersion.IPV4, remote_port=port)
@@ -0,0 +1,97 @@
+import copy
+import json
+
+import pytest
+
+from muddy.diff import Regenerator, apply_patch, diff_muds
+from muddy.exceptions import InputException
+from muddy.maker import make_mud
+from muddy.specs import parse_spec
+
+SPEC = {'mud_version': 1, 'mud_url': 'https://lighting.example.com/lightbulb2000', 'is_supported': True,
+        'directions_initiated': ['to_device', 'from_device'], 'ip_version': 'ipv4', 'target_url': 'cloud.example.com',
+        'protocol': 'tcp', 'match_types': ['is_cloud', 'is_mfg'], 'local_ports': [80, 8883], 'remote_ports': [443],
+        'system_info': 'Lightbulb', 'last_update': '2024-01-01T00:00:00'}
+CHANGES = [
+    {'system_info': 'Smart lightbulb'},
+    {'local_ports': [80, 8884]},
+    {'local_ports': [80]},
+    {'local_ports': [80, 8080, 8883]},
+    {'match_types': ['is_cloud']},
+    {'match_types': ['is_mfg', 'is_cloud']},
+    {'directions_initiated': ['from_device']},
+    {'ip_version': 'both'},
+    {'target_url': 'other.example.com', 'cache_validity': 24},
+]
+
+
+def build(spec, name='mud-12345'):
+    return Regenerator(name=name).update(spec).mud
+
+
+@pytest.mark.parametrize('change', CHANGES)
+def test_patch_turns_old_into_new(change):
+    old, new = build(SPEC), build(dict(SPEC, **change))
+    patch = diff_muds(old, new)
+    assert patch
+    assert apply_patch(old, patch) == new
+    # the patch is JSON, and the old document is left as is
+    assert apply_patch(old, json.loads(json.dumps(patch))) == new
+    assert old == build(SPEC)
+
+
+def test_patch_of_unrelated_documents():
+    old = make_mud(**parse_spec(SPEC))
+    new = copy.deepcopy(old)
+    new['ietf-mud:mud']['a/b~c'] = 1
+    del new['ietf-access-control-list:acls']
+    assert apply_patch(old, diff_muds(old, new)) == new
+    assert apply_patch(new, diff_muds(new, old)) == old
+
+
+def test_equal_documents_give_an_empty_patch():
+    mud = build(SPEC)
+    assert diff_muds(mud, copy.deepcopy(mud)) == []
+
+
+def test_unchanged_spec_gives_an_empty_patch():
+    regenerator = Regenerator(name='mud-12345')
+    first = regenerator.update(SPEC)
+    assert first.patch is None
+    # only last-update differs: the previous document is kept
+    update = regenerator.update(dict(SPEC, last_update='2024-02-01T00:00:00'))
+    assert (update.mud, update.patch, update.rebuilt, update.reused) == (first.mud, [], 0, 2)
+
+
+def test_one_port_change_only_replaces_the_aces_using_it():
+    regenerator = Regenerator(build(SPEC))
+    update = regenerator.update(dict(SPEC, local_ports=[80, 8884]))
+    # both ACLs use the local ports, and each replaces only its ACEs of port 8883
+    assert (update.rebuilt, update.reused) == (2, 0)
+    assert [operation['op'] for operation in update.patch] == ['replace'] * 4
+    assert all('/aces/ace/' in operation['path'] and '8884' in json.dumps(operation['value'])
+               for operation in update.patch)
+
+
+def test_unaffected_acls_are_reused():
+    regenerator = Regenerator(name='mud-12345')
+    previous = regenerator.update(SPEC).mud
+    update = regenerator.update(dict(SPEC, directions_initiated=['from_device'], system_info='Smart lightbulb'))
+    assert (update.rebuilt, update.reused) == (0, 1)
+    assert update.mud['ietf-access-control-list:acls']['acl'][0] is \
+        previous['ietf-access-control-list:acls']['acl'][1]
+    assert apply_patch(previous, update.patch) == update.mud
+
+
+def test_regenerator_keeps_the_acl_names():
+    mud = build(SPEC, name='mud-54321')
+    update = Regenerator(mud).update(dict(SPEC, system_info='Smart lightbulb'))
+    assert update.patch == [{'op': 'replace', 'path': '/ietf-mud:mud/systeminfo', 'value': 'Smart lightbulb'}]
+
+
+@pytest.mark.parametrize('operation', [{'op': 'move', 'path': '/a'}, {'op': 'add', 'path': ''},
+                                       {'op': 'remove', 'path': '/ietf-mud:mud/missing'},
+                                       {'op': 'add', 'path': '/ietf-access-control-list:acls/acl/9', 'value': 1}])
+def test_invalid_patch(operation):
+    with pytest.raises(InputException):
+        apply_patch(build(SPEC), [operation])
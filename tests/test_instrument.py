@@ -0,0 +1,59 @@
+import muddy.maker
+from muddy import instrument
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+
+SPEC = {'mud_version': 1, 'mud_url': 'https://lighting.example.com/lightbulb2000', 'is_supported': True,
+        'last_update': '2024-01-01T00:00:00', 'directions_initiated': [Direction.TO_DEVICE, Direction.FROM_DEVICE],
+        'ip_version': IPVersion.IPV4, 'target_url': 'cloud.example.com', 'protocol': Protocol.TCP,
+        'match_types': [MatchType.IS_CLOUD, MatchType.IS_MYMFG], 'local_ports': [80, 8883], 'remote_ports': [443]}
+NAMES = list(instrument.STAGES) + list(instrument.VALIDATORS) + ['iter_ace']
+
+
+def maker_functions():
+    return {name: getattr(muddy.maker, name) for name in NAMES}, muddy.maker.MudBuilder.build
+
+
+def test_enable_then_disable_restores_maker():
+    originals = maker_functions()
+    stages = []
+    metrics = instrument.enable(lambda stage, seconds: stages.append(stage))
+    try:
+        # enabling again replaces the instrumentation instead of wrapping the wrappers
+        metrics = instrument.enable(lambda stage, seconds: stages.append(stage))
+        assert instrument.get_instrumentation() is metrics
+        functions, build = maker_functions()
+        assert build is not originals[1]
+        assert all(functions[name] is not originals[0][name] for name in NAMES)
+        assert all(functions[name].__wrapped__ is originals[0][name] for name in NAMES)
+        # a target no other test uses, so that its sub-ACE templates are validated rather than found in the cache
+        mud = muddy.maker.make_mud(**dict(SPEC, target_url='instrumented.example.com'))
+        with metrics.stage('serialize'):
+            pass
+    finally:
+        assert instrument.disable() is metrics
+    assert maker_functions() == originals
+    assert instrument.get_instrumentation() is None and instrument.disable() is None
+
+    aces = sum(len(acl['aces']['ace']) for acl in mud['ietf-access-control-list:acls']['acl'])
+    stats = metrics.stats()
+    # make_acls also generates the ACEs of the ACL it replaces, see make_acls
+    assert (stats.documents, stats.aces, aces) == (1, 16, 8)
+    assert (metrics.aces_per_document.count, metrics.aces_per_document.sum) == (1, aces)
+    assert metrics.validation_calls == {'is_domain_name': 2, 'is_uri': 0}
+    assert sorted(metrics.stages) == ['ace', 'acl', 'acls', 'build', 'mud_name', 'serialize', 'support_info']
+    assert sorted(set(stages)) == sorted(metrics.stages)
+    assert metrics.stages['build'].count == 1 and metrics.stages['acls'].count == 2
+    assert 'muddy_documents_total 1\n' in metrics.to_prometheus()
+
+    # nothing is recorded once disabled
+    muddy.maker.make_mud(**SPEC)
+    assert metrics.stats()[:3] == stats[:3]
+
+
+def test_instrumented_block():
+    originals = maker_functions()
+    with instrument.instrumented() as metrics:
+        muddy.maker.make_mud(**SPEC)
+    assert maker_functions() == originals
+    assert metrics.stats().documents == 1
+    assert metrics.stages['build'].cumulative()[-1] == (float('inf'), 1)
@@ -0,0 +1,200 @@
+import textwrap
+
+import pytest
+
+from muddy.exceptions import InputException
+from muddy.nftables import NftCompiler, compile_mud
+
+MUD_URL = 'https://lighting.example.com/lightbulb2000'
+CLOUD = {'protocol': 6, 'ietf-acldns:dst-dnsname': 'cloud.example.com'}
+
+
+def ruleset(text):
+    """The expected ruleset, indented with four spaces for tabs."""
+    return textwrap.dedent(text).lstrip('\n').replace('    ', '\t')
+
+
+def ace(name, ipv4=None, tcp=None, udp=None, mud=None, forwarding='accept'):
+    matches = {key: value for key, value in (('ipv4', ipv4), ('tcp', tcp), ('udp', udp), ('ietf-mud:mud', mud))
+               if value is not None}
+    return {'name': name, 'matches': matches, 'actions': {'forwarding': forwarding}}
+
+
+def port(number):
+    return {'operator': 'eq', 'port': number}
+
+
+def make(from_device=(), to_device=()):
+    container = {'mud-version': 1, 'mud-url': MUD_URL, 'is-supported': True, 'last-update': '2024-01-01T00:00:00'}
+    acls = []
+    for suffix, policy, aces in (('v4fr', 'from-device-policy', from_device), ('v4to', 'to-device-policy', to_device)):
+        if aces:
+            acls.append({'name': f'mud-12345-{suffix}', 'type': 'ipv4-acl-type', 'aces': {'ace': list(aces)}})
+            container[policy] = {'access-lists': {'access-list': [{'name': f'mud-12345-{suffix}'}]}}
+    return {'ietf-mud:mud': container, 'ietf-access-control-list:acls': {'acl': acls}}
+
+
+def test_ports_merged_into_set():
+    mud = make([ace('cl0-frdev', CLOUD, {'destination-port': port(443)}),
+                ace('cl1-frdev', CLOUD, {'destination-port': port(8883)}),
+                ace('cl2-frdev', CLOUD, {'destination-port': {'lower-port': 8000, 'upper-port': 8080}})])
+    assert compile_mud(mud, '192.168.1.10') == ruleset('''
+        table inet muddy
+        delete table inet muddy
+        table inet muddy {
+            set dns4_cloud_example_com {
+                type ipv4_addr
+                flags timeout
+            }
+
+            chain mud_dd126e572552 {
+                ip daddr @dns4_cloud_example_com tcp dport { 443, 8000-8080, 8883 } return
+                drop
+            }
+
+            chain mud_d90ee9ccf6be {
+                drop
+            }
+
+            chain forward {
+                type filter hook forward priority filter; policy accept;
+                ct state established,related accept
+                ip daddr vmap { 192.168.1.10 : jump mud_d90ee9ccf6be }
+                ip saddr vmap { 192.168.1.10 : jump mud_dd126e572552 }
+            }
+        }
+        ''')
+
+
+def test_protocol_chains():
+    mud = make([ace('cl0-frdev', {'protocol': 6}, tcp={'destination-port': port(443)}),
+                ace('cl1-frdev', {'protocol': 17}, udp={'destination-port': port(123)})])
+    assert compile_mud(mud, '192.168.1.10') == ruleset('''
+        table inet muddy
+        delete table inet muddy
+        table inet muddy {
+            chain mud_def70f68aefc {
+                meta nfproto ipv4 tcp dport 443 return
+                drop
+            }
+
+            chain mud_e62ad65ec0f9 {
+                meta nfproto ipv4 udp dport 123 return
+                drop
+            }
+
+            chain mud_e26e3ec2a282 {
+                meta l4proto vmap { tcp : goto mud_def70f68aefc, udp : goto mud_e62ad65ec0f9 }
+                drop
+            }
+
+            chain mud_d90ee9ccf6be {
+                drop
+            }
+
+            chain forward {
+                type filter hook forward priority filter; policy accept;
+                ct state established,related accept
+                ip daddr vmap { 192.168.1.10 : jump mud_d90ee9ccf6be }
+                ip saddr vmap { 192.168.1.10 : jump mud_e26e3ec2a282 }
+            }
+        }
+        ''')
+
+
+def test_any_protocol_rules_before_protocol_chains():
+    mud = make([ace('cl0-frdev', CLOUD, {'destination-port': port(443)}),
+                ace('ntp0-frdev', {'protocol': 17}, udp={'destination-port': port(123)}),
+                ace('myman0-frdev', mud={'same-manufacturer': []})])
+    # the same-manufacturer rule comes first: TCP and UDP packets never leave the protocol chains
+    assert compile_mud(mud, '192.168.1.10') == ruleset('''
+        table inet muddy
+        delete table inet muddy
+        table inet muddy {
+            set dns4_cloud_example_com {
+                type ipv4_addr
+                flags timeout
+            }
+
+            set mfg4_lighting_example_com {
+                type ipv4_addr
+                flags timeout
+            }
+
+            chain mud_53ce2cff8d07 {
+                ip daddr @dns4_cloud_example_com tcp dport 443 return
+                drop
+            }
+
+            chain mud_e62ad65ec0f9 {
+                meta nfproto ipv4 udp dport 123 return
+                drop
+            }
+
+            chain mud_03cbc2502aa5 {
+                ip daddr @mfg4_lighting_example_com return
+                meta l4proto vmap { tcp : goto mud_53ce2cff8d07, udp : goto mud_e62ad65ec0f9 }
+                drop
+            }
+
+            chain mud_d90ee9ccf6be {
+                drop
+            }
+
+            chain forward {
+                type filter hook forward priority filter; policy accept;
+                ct state established,related accept
+                ip daddr vmap { 192.168.1.10 : jump mud_d90ee9ccf6be }
+                ip saddr vmap { 192.168.1.10 : jump mud_03cbc2502aa5 }
+            }
+        }
+        ''')
+
+
+def test_devices_share_chains_and_both_policies_apply():
+    mud = make([ace('myman0-frdev', mud={'same-manufacturer': []})],
+               [ace('myman0-todev', mud={'same-manufacturer': []})])
+    compiler = NftCompiler()
+    compiler.add('192.168.1.10', mud)
+    compiler.add('192.168.1.11', mud)
+    # traffic between the two devices returns from the from-device chain of one and the to-device chain of the other
+    assert compiler.render() == ruleset('''
+        table inet muddy
+        delete table inet muddy
+        table inet muddy {
+            set mfg4_lighting_example_com {
+                type ipv4_addr
+                flags timeout
+            }
+
+            chain mud_7b7632bb4984 {
+                ip daddr @mfg4_lighting_example_com return
+                drop
+            }
+
+            chain mud_18006366a1e8 {
+                ip saddr @mfg4_lighting_example_com return
+                drop
+            }
+
+            chain forward {
+                type filter hook forward priority filter; policy accept;
+                ct state established,related accept
+                ip daddr vmap { 192.168.1.10 : jump mud_18006366a1e8, 192.168.1.11 : jump mud_18006366a1e8 }
+                ip saddr vmap { 192.168.1.10 : jump mud_7b7632bb4984, 192.168.1.11 : jump mud_7b7632bb4984 }
+            }
+        }
+        ''')
+    assert compiler.stats() == (2, 4, 3, 7, 1)
+
+
+def test_other_direction_initiated_left_out():
+    mud = make([ace('cl0-frdev', CLOUD, {'ietf-mud:direction-initiated': 'to-device', 'source-port': port(443)})])
+    assert '\t\tdrop\n\t}' in compile_mud(mud, '192.168.1.10')
+    assert 'sport' not in compile_mud(mud, '192.168.1.10')
+
+
+def test_drop_ace_not_compiled():
+    mud = make([ace('cl0-frdev', CLOUD, forwarding='drop')])
+    with pytest.raises(InputException):
+        compile_mud(mud, '192.168.1.10')
@@ -0,0 +1,71 @@
+import json
+import random
+
+import pytest
+
+from muddy.evaluator import Flow, PolicyEvaluator
+from muddy.maker import make_mud
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+from muddy.optimize import compress_mud
+
+MUD_URL = 'https://lighting.example.com/lightbulb2000'
+NAMES = ['cloud.example.com', 'other.example.com']
+PORTS = [None, 79, 80, 81, 85, 86, 443, 444, 8000, 8001, 8883, 8884]
+
+
+def made_mud(protocol, match_types, local_ports, remote_ports):
+    return make_mud(mud_version=1, mud_url=MUD_URL, is_supported=True, last_update='2024-01-01T00:00:00',
+                    directions_initiated=[Direction.TO_DEVICE, Direction.FROM_DEVICE], ip_version=IPVersion.IPV4,
+                    target_url=NAMES[0], protocol=protocol, match_types=match_types, local_ports=local_ports,
+                    remote_ports=remote_ports)
+
+
+def mixed_actions_mud():
+    """An ACL mixing drop and accept ACEs, where only exact duplicates may go."""
+    def ace(name, port, forwarding):
+        return {'name': name, 'matches': {'ipv4': {'protocol': 6, 'ietf-acldns:dst-dnsname': NAMES[0]},
+                                          'tcp': {'destination-port': {'operator': 'eq', 'port': port}}},
+                'actions': {'forwarding': forwarding}}
+    aces = [ace('a80', 80, 'drop'), ace('a81', 81, 'accept'), ace('a80-again', 80, 'accept'),
+            ace('a81-again', 81, 'accept'), ace('a82', 82, 'accept')]
+    policy = {'access-lists': {'access-list': [{'name': 'mixed-v4fr'}]}}
+    return {'ietf-mud:mud': {'mud-version': 1, 'mud-url': MUD_URL, 'from-device-policy': policy},
+            'ietf-access-control-list:acls': {'acl': [{'name': 'mixed-v4fr', 'type': 'ipv4', 'aces': {'ace': aces}}]}}
+
+
+def muds():
+    # make_mud only writes ports for TCP
+    for match_types in ([MatchType.IS_CLOUD], [MatchType.IS_CLOUD, MatchType.IS_MYMFG]):
+        yield made_mud(Protocol.TCP, match_types, [80, 81, 82, 83, 84, 85, 8883], [443, 444, 8000])
+    yield made_mud(Protocol.UDP, [MatchType.IS_CLOUD, MatchType.IS_MYMFG], [80, 81], [443])
+    yield mixed_actions_mud()
+
+
+def flows(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        direction = rng.choice((Direction.TO_DEVICE, Direction.FROM_DEVICE))
+        name = rng.choice(NAMES + [None])
+        names = {'src_dnsname': name} if direction is Direction.TO_DEVICE else {'dst_dnsname': name}
+        yield Flow(direction, IPVersion.IPV4, rng.choice((Protocol.TCP, Protocol.UDP)), rng.choice(PORTS),
+                   rng.choice(PORTS), same_manufacturer=rng.random() < 0.3,
+                   direction_initiated=rng.choice((None, Direction.TO_DEVICE, Direction.FROM_DEVICE)), **names)
+
+
+@pytest.mark.parametrize('seed, mud', list(enumerate(muds())))
+def test_compression_keeps_verdicts(seed, mud):
+    compressed, stats = compress_mud(mud)
+    assert stats.saved > 0
+    if seed < 2:
+        # contiguous ports were merged into ranges
+        assert '"lower-port"' in json.dumps(compressed)
+    before, after = PolicyEvaluator(mud), PolicyEvaluator(compressed)
+    for flow in flows(seed, 2000):
+        assert before.is_allowed(flow) == after.is_allowed(flow), flow
+
+
+def test_mixed_actions_keep_first_match():
+    compressed, stats = compress_mud(mixed_actions_mud())
+    aces = compressed['ietf-access-control-list:acls']['acl'][0]['aces']['ace']
+    assert [ace['name'] for ace in aces] == ['a80', 'a81', 'a80-again', 'a82']
+    assert stats == (5, 4, 1)
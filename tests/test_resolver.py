@@ -0,0 +1,217 @@
+import asyncio
+
+import pytest
+
+from muddy.exceptions import InputException
+from muddy.models import IPVersion
+from muddy.resolver import Answer, DnsCache, acldns_names
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubBackend:
+    """Answers from a dict of domain to `(addresses, ttl)` or exception, counting lookups. While `gate` is set to
+    an unset event, lookups wait for it."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.lookups = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.gate = None
+
+    async def lookup(self, domain, ip_version):
+        self.lookups.append((domain, ip_version))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.gate is not None:
+                await self.gate.wait()
+            answer = self.answers[domain]
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+        finally:
+            self.in_flight -= 1
+
+
+def make_cache(answers, **kwargs):
+    clock = Clock()
+    backend = StubBackend(answers)
+    return DnsCache(backend, clock=clock, **kwargs), backend, clock
+
+
+def test_ttl_expiry():
+    cache, backend, clock = make_cache({'cloud.example.com': (['192.0.2.1'], 300)}, refresh_ahead=0)
+
+    async def run():
+        first = await cache.resolve('cloud.example.com')
+        clock.now += 299
+        second = await cache.resolve('Cloud.Example.com.')
+        clock.now += 1
+        third = await cache.resolve('cloud.example.com')
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == Answer(('192.0.2.1',), 300)
+    assert second == Answer(('192.0.2.1',), 1)
+    assert third == Answer(('192.0.2.1',), 300)
+    assert len(backend.lookups) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_ttl_clamped():
+    cache, backend, clock = make_cache({'short.example.com': (['192.0.2.1'], 1),
+                                        'long.example.com': (['192.0.2.2'], 10 ** 6)}, min_ttl=30, max_ttl=3600)
+    answers = asyncio.run(cache.resolve_many([('short.example.com', IPVersion.IPV4),
+                                              ('long.example.com', IPVersion.IPV4)]))
+    assert [answer.ttl for answer in answers.values()] == [30, 3600]
+
+
+def test_get_only_returns_unexpired_answers():
+    cache, backend, clock = make_cache({'cloud.example.com': (['192.0.2.1'], 60)})
+    assert cache.get('cloud.example.com') is None
+    asyncio.run(cache.resolve('cloud.example.com'))
+    assert cache.get('cloud.example.com') == Answer(('192.0.2.1',), 60)
+    clock.now += 60
+    assert cache.get('cloud.example.com') is None
+    assert len(backend.lookups) == 1
+
+
+def test_negative_caching():
+    cache, backend, clock = make_cache({'missing.example.com': ([], 30), 'nosoa.example.com': ([], None)},
+                                       negative_ttl=60)
+
+    async def run():
+        answers = [await cache.resolve('missing.example.com'), await cache.resolve('missing.example.com'),
+                   await cache.resolve('nosoa.example.com')]
+        clock.now += 30
+        answers.append(await cache.resolve('missing.example.com'))
+        return answers
+
+    missing, cached, nosoa, expired = asyncio.run(run())
+    assert missing == Answer((), 30)
+    assert cached == Answer((), 30)
+    # without an SOA record, negative answers are kept for negative_ttl
+    assert nosoa == Answer((), 60)
+    assert expired == Answer((), 30)
+    assert backend.lookups.count(('missing.example.com', IPVersion.IPV4)) == 2
+
+
+def test_negative_ttl_is_capped():
+    cache, backend, clock = make_cache({'missing.example.com': ([], 3600)}, negative_ttl=60)
+    assert asyncio.run(cache.resolve('missing.example.com')).ttl == 60
+
+
+def test_errors_serve_expired_addresses():
+    answers = {'cloud.example.com': (['192.0.2.1'], 60)}
+    cache, backend, clock = make_cache(answers, error_ttl=5)
+
+    async def run():
+        await cache.resolve('cloud.example.com')
+        clock.now += 60
+        answers['cloud.example.com'] = OSError('timed out')
+        failed = await cache.resolve('cloud.example.com')
+        clock.now += 5
+        answers['cloud.example.com'] = (['192.0.2.2'], 60)
+        return failed, await cache.resolve('cloud.example.com')
+
+    failed, recovered = asyncio.run(run())
+    assert failed == Answer(('192.0.2.1',), 5, 'timed out')
+    assert recovered == Answer(('192.0.2.2',), 60)
+    assert cache.errors == 1
+
+
+def test_concurrent_lookups_coalesce():
+    cache, backend, clock = make_cache({'cloud.example.com': (['192.0.2.1'], 60)})
+
+    async def run():
+        backend.gate = asyncio.Event()
+        tasks = [asyncio.ensure_future(cache.resolve('cloud.example.com')) for _ in range(10)]
+        await asyncio.sleep(0)
+        backend.gate.set()
+        return await asyncio.gather(*tasks)
+
+    answers = asyncio.run(run())
+    assert set(answers) == {Answer(('192.0.2.1',), 60)}
+    assert backend.lookups == [('cloud.example.com', IPVersion.IPV4)]
+
+
+def test_concurrency_limit():
+    domains = [f'host{i}.example.com' for i in range(8)]
+    cache, backend, clock = make_cache({domain: (['192.0.2.1'], 60) for domain in domains}, concurrency=3)
+
+    async def run():
+        backend.gate = asyncio.Event()
+        task = asyncio.ensure_future(cache.resolve_many((domain, IPVersion.IPV4) for domain in domains))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        backend.gate.set()
+        return await task
+
+    assert len(asyncio.run(run())) == 8
+    assert backend.max_in_flight == 3
+    assert len(backend.lookups) == 8
+
+
+def test_refresh_ahead():
+    cache, backend, clock = make_cache({'cloud.example.com': (['192.0.2.1'], 100)}, refresh_ahead=0.1)
+
+    async def run():
+        await cache.resolve('cloud.example.com')
+        clock.now += 95
+        # served from the cache while the refresh runs in the background
+        answer = await cache.resolve('cloud.example.com')
+        await asyncio.sleep(0)
+        return answer
+
+    assert asyncio.run(run()) == Answer(('192.0.2.1',), 5)
+    assert len(backend.lookups) == 2
+    assert cache.refreshes == 1
+    assert cache.get('cloud.example.com') == Answer(('192.0.2.1',), 100)
+
+
+def test_refresh_due_keeps_watched_names():
+    cache, backend, clock = make_cache({'cloud.example.com': (['192.0.2.1'], 100),
+                                        'other.example.com': (['192.0.2.2'], 100)}, refresh_ahead=0.1)
+
+    async def run():
+        await cache.resolve('other.example.com')
+        cache.watch([('cloud.example.com', IPVersion.IPV4)])
+        await cache.refresh_due()
+        # both are refreshed: one is watched, the other was requested since it was looked up
+        clock.now += 90
+        await cache.refresh_due()
+        # only the watched name is refreshed, the other is dropped once expired
+        clock.now += 90
+        await cache.refresh_due()
+        clock.now += 10
+        return await cache.refresh_due()
+
+    next_refresh = asyncio.run(run())
+    assert cache.get('cloud.example.com') == Answer(('192.0.2.1',), 90)
+    assert cache.get('other.example.com') is None
+    assert len(cache) == 1
+    assert backend.lookups.count(('cloud.example.com', IPVersion.IPV4)) == 3
+    assert backend.lookups.count(('other.example.com', IPVersion.IPV4)) == 2
+    assert next_refresh == clock.now + 80
+
+
+def test_acldns_names():
+    ace = {'matches': {'ipv6': {'ietf-acldns:dst-dnsname': 'Cloud.Example.com.'}}}
+    mud = {'ietf-access-control-list:acls': {'acl': [{'aces': {'ace': [ace]}}]}}
+    assert acldns_names(mud) == {('cloud.example.com', IPVersion.IPV6)}
+
+
+@pytest.mark.parametrize('ip_version', [IPVersion.BOTH, None])
+def test_invalid_ip_version(ip_version):
+    cache, backend, clock = make_cache({})
+    with pytest.raises(InputException):
+        asyncio.run(cache.resolve('cloud.example.com', ip_version))
+    assert not backend.lookups
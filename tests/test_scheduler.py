@@ -0,0 +1,62 @@
+import pytest
+
+from muddy.exceptions import InputException
+from muddy.scheduler import DIGEST_SIZE, RefreshScheduler
+
+SPEC = {'mud_version': 1, 'mud_url': 'https://lighting.example.com/lightbulb2000', 'is_supported': True,
+        'cache_validity': 48, 'last_update': '2024-01-01T00:00:00+00:00'}
+
+
+def test_failing_device_backs_off_without_stopping_the_run():
+    scheduler = RefreshScheduler(retry_interval=300, max_retry_interval=1000)
+    specs = {'bad': dict(SPEC, mud_version='abc'), 'good': SPEC}
+    scheduler.schedule('bad', 0, b'\x01')
+    scheduler.schedule('good', 0)
+    deadlines = []
+    for now in (0, 300, 900, 1900):
+        results = {result.device: result for result in scheduler.run_due(specs, now=now)}
+        assert results['bad'].mud is None and results['bad'].error is not None
+        deadlines.append(results['bad'].deadline - now)
+        specs.pop('good', None)
+    assert deadlines == [300, 600, 1000, 1000]
+    assert scheduler.failures('bad') == 4
+    # a changed spec gets a fresh start
+    scheduler.schedule('bad', 0, b'\x02')
+    assert scheduler.failures('bad') == 0
+
+
+def test_index_keeps_failures(tmp_path):
+    path = str(tmp_path / 'index')
+    scheduler = RefreshScheduler(path)
+    scheduler.schedule('bad', 0, b'\x01')
+    scheduler.retry_later('bad', now=0)
+    scheduler.retry_later('bad', now=300)
+    scheduler.save()
+    loaded = RefreshScheduler(path)
+    assert (loaded.failures('bad'), loaded.digest('bad')[:1], loaded.next_deadline()) == (2, b'\x01', 900)
+
+
+def test_index_keeps_all_zero_digests(tmp_path):
+    path = str(tmp_path / 'index')
+    scheduler = RefreshScheduler(path)
+    zero = bytes(DIGEST_SIZE)
+    scheduler.schedule('zero', 10, zero)
+    scheduler.schedule('none', 20)
+    scheduler.save()
+    loaded = RefreshScheduler(path)
+    assert (loaded.digest('zero'), loaded.digest('none')) == (zero, None)
+    assert (loaded.deadline('zero'), loaded.deadline('none')) == (10, 20)
+    # the same digest is not a change
+    loaded.retry_later('zero', now=0)
+    loaded.schedule('zero', 10, zero)
+    assert loaded.failures('zero') == 1
+
+
+def test_index_of_another_version(tmp_path):
+    path = tmp_path / 'index'
+    RefreshScheduler(str(path)).save()
+    data = bytearray(path.read_bytes())
+    data[4] = 1
+    path.write_bytes(bytes(data))
+    with pytest.raises(InputException, match='index is not valid'):
+        RefreshScheduler(str(path))
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import gzip
+import http.client
+import os
+import time
+from email.utils import format_datetime, parsedate_to_datetime
+
+import pytest
+
+from muddy.exceptions import InputException
+from muddy.server import MudDocument, MudFileServer
+
+MUD = {'ietf-mud:mud': {'mud-version': 1, 'mud-url': 'https://lighting.example.com/lightbulb2000',
+                        'last-update': '2024-01-01T12:00:00+00:00', 'cache-validity': 24, 'is-supported': True}}
+
+
+def request(port, method, path='/lightbulb2000', headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def served():
+    """Runs a MudFileServer serving MUD on a free port, and yields a function sending requests to it."""
+    loop = asyncio.new_event_loop()
+    server = MudFileServer(reload_interval=None)
+    server.add(MUD)
+    listening = loop.run_until_complete(server.start('127.0.0.1', 0))
+    port = listening.sockets[0].getsockname()[1]
+
+    def send(*args, **kwargs):
+        return loop.run_until_complete(loop.run_in_executor(None, lambda: request(port, *args, **kwargs)))
+
+    yield send
+    loop.run_until_complete(server.close())
+    loop.close()
+
+
+def test_get_gzip(served):
+    status, headers, body = served('GET', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert status == 200
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['ETag'].endswith('-gzip"')
+    assert headers['Cache-Control'] == 'max-age=86400'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(body) == MudDocument(MUD).body
+
+
+def test_get_identity(served):
+    status, headers, body = served('GET')
+    assert status == 200
+    assert 'Content-Encoding' not in headers
+    assert not headers['ETag'].endswith('-gzip"')
+    assert body == MudDocument(MUD).body
+
+
+def test_gzip_refused_by_q_value(served):
+    status, headers, body = served('GET', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+    assert 'Content-Encoding' not in headers
+    assert body == MudDocument(MUD).body
+    _, headers, _ = served('GET', headers={'Accept-Encoding': '*;q=0.5'})
+    assert headers['Content-Encoding'] == 'gzip'
+
+
+def test_not_modified_on_etag(served):
+    for accept_encoding in ('gzip', 'identity'):
+        _, headers, _ = served('GET', headers={'Accept-Encoding': accept_encoding})
+        etag = headers['ETag']
+        status, headers, body = served('GET', headers={'Accept-Encoding': accept_encoding, 'If-None-Match': etag})
+        assert (status, headers['ETag'], body) == (304, etag, b'')
+
+
+def test_etag_of_other_encoding_is_modified(served):
+    _, headers, _ = served('GET')
+    status, _, _ = served('GET', headers={'Accept-Encoding': 'gzip', 'If-None-Match': headers['ETag']})
+    assert status == 200
+
+
+def test_not_modified_since(served):
+    _, headers, _ = served('GET')
+    last_modified = headers['Last-Modified']
+    assert parsedate_to_datetime(last_modified) == parsedate_to_datetime('Mon, 01 Jan 2024 12:00:00 GMT')
+    assert served('GET', headers={'If-Modified-Since': last_modified})[0] == 304
+    earlier = format_datetime(parsedate_to_datetime(last_modified).replace(hour=11), True)
+    assert served('GET', headers={'If-Modified-Since': earlier})[0] == 200
+
+
+def test_post_not_allowed(served):
+    status, headers, _ = served('POST')
+    assert status == 405
+    assert headers['Allow'] == 'GET, HEAD'
+
+
+def test_not_found(served):
+    assert served('GET', '/missing')[0] == 404
+
+
+@pytest.fixture
+def timezone():
+    """Sets the local timezone to UTC+5 for the test."""
+    previous = os.environ.get('TZ')
+    os.environ['TZ'] = 'UTC-05'
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ['TZ']
+    else:
+        os.environ['TZ'] = previous
+    time.tzset()
+
+
+def test_naive_last_update_is_local_time(timezone):
+    mud = {'ietf-mud:mud': dict(MUD['ietf-mud:mud'], **{'last-update': '2024-01-01T12:00:00'})}
+    headers = MudDocument(mud).headers.decode()
+    assert 'Last-Modified: Mon, 01 Jan 2024 07:00:00 GMT\r\n' in headers
+
+
+@pytest.mark.parametrize('cache_validity', ['a day', None, [24], float('inf')])
+def test_invalid_cache_validity(cache_validity):
+    mud = {'ietf-mud:mud': dict(MUD['ietf-mud:mud'], **{'cache-validity': cache_validity})}
+    with pytest.raises(InputException, match='cache-validity'):
+        MudFileServer(reload_interval=None).add(mud)
+
+
+def write(directory, name, system_info):
+    with open(os.path.join(directory, name), 'w') as fp:
+        json.dump({'ietf-mud:mud': dict(MUD['ietf-mud:mud'], systeminfo=system_info)}, fp)
+
+
+def served_system_info(server):
+    asyncio.run(server.reload())
+    document = server.get('/lightbulb2000')
+    return document and json.loads(document.body)['ietf-mud:mud']['systeminfo']
+
+
+def test_files_sharing_a_mud_url(tmp_path):
+    directory = str(tmp_path)
+    write(directory, 'a.json', 'a')
+    server = MudFileServer(directory, reload_interval=None)
+    write(directory, 'b.json', 'b')
+    assert served_system_info(server) == 'b'
+    # removing the file which isn't served leaves the other one served
+    os.remove(os.path.join(directory, 'a.json'))
+    assert served_system_info(server) == 'b'
+    # renaming the served file serves it under the new name
+    write(directory, 'a.json', 'a')
+    assert served_system_info(server) == 'a'
+    os.rename(os.path.join(directory, 'b.json'), os.path.join(directory, 'c.json'))
+    assert served_system_info(server) == 'b'
+    # removing the served file serves the one left
+    os.remove(os.path.join(directory, 'c.json'))
+    assert served_system_info(server) == 'a'
+    os.remove(os.path.join(directory, 'a.json'))
+    assert served_system_info(server) is None
+    assert len(server) == 0
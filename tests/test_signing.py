@@ -0,0 +1,121 @@
+import datetime
+import os
+
+import pytest
+
+from muddy.exceptions import InputException
+
+x509 = pytest.importorskip('cryptography.x509')
+hashes = pytest.importorskip('cryptography.hazmat.primitives.hashes')
+serialization = pytest.importorskip('cryptography.hazmat.primitives.serialization')
+ec = pytest.importorskip('cryptography.hazmat.primitives.asymmetric.ec')
+rsa = pytest.importorskip('cryptography.hazmat.primitives.asymmetric.rsa')
+signing = pytest.importorskip('muddy.signing')
+
+DATA = b'{"ietf-mud:mud": {"mud-version": 1}}'
+
+
+def make_cert(name, key, issuer=None, issuer_key=None, ca=False, key_cert_sign=None):
+    """A certificate for `key`, self-signed unless an issuer is given, valid from yesterday for a day."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    subject = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, name)])
+    builder = x509.CertificateBuilder().subject_name(subject) \
+        .issuer_name(issuer.subject if issuer is not None else subject) \
+        .public_key(key.public_key()).serial_number(x509.random_serial_number()) \
+        .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1)) \
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+    if key_cert_sign is not None:
+        builder = builder.add_extension(x509.KeyUsage(
+            digital_signature=True, content_commitment=False, key_encipherment=False, data_encipherment=False,
+            key_agreement=False, key_cert_sign=key_cert_sign, crl_sign=key_cert_sign, encipher_only=False,
+            decipher_only=False), critical=True)
+    return builder.sign(issuer_key or key, hashes.SHA256())
+
+
+def pem(*certs):
+    return b''.join(cert.public_bytes(serialization.Encoding.PEM) for cert in certs)
+
+
+def key_pem(key):
+    return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                             serialization.NoEncryption())
+
+
+@pytest.fixture(scope='module')
+def pki():
+    """A CA, a signer it issued, and certificates that must not be trusted through them."""
+    keys = {name: ec.generate_private_key(ec.SECP256R1()) for name in ('ca', 'signer', 'leaf', 'other', 'noca')}
+    keys['rsa'] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    certs = {'ca': make_cert('ca', keys['ca'], ca=True, key_cert_sign=True),
+             'noca': make_cert('noca', keys['noca'], ca=True, key_cert_sign=False),
+             'other': make_cert('other', keys['other'])}
+    certs['signer'] = make_cert('signer', keys['signer'], certs['ca'], keys['ca'])
+    certs['rsa'] = make_cert('rsa', keys['rsa'], certs['ca'], keys['ca'])
+    # issued by a signer, which is not a CA
+    certs['leaf'] = make_cert('leaf', keys['leaf'], certs['signer'], keys['signer'])
+    certs['nocaleaf'] = make_cert('nocaleaf', keys['leaf'], certs['noca'], keys['noca'])
+    keys['nocaleaf'] = keys['leaf']
+    return {name: signing.Signer(key_pem(keys[name]), pem(cert)) for name, cert in certs.items()}, certs
+
+
+@pytest.mark.parametrize('name', ['signer', 'rsa'])
+def test_sign_then_verify(pki, name):
+    signers, certs = pki
+    signature = signers[name].sign(DATA)
+    signing.Verifier(pem(certs['ca'])).verify(DATA, signature)
+    # the signer can also be trusted directly
+    signing.Verifier(pem(certs[name])).verify(DATA, signature)
+
+
+def test_tampered_data(pki):
+    signers, certs = pki
+    signature = signers['signer'].sign(DATA)
+    with pytest.raises(InputException, match='modified'):
+        signing.Verifier(pem(certs['ca'])).verify(DATA.replace(b'1', b'2'), signature)
+
+
+def test_wrong_signer(pki):
+    signers, certs = pki
+    with pytest.raises(InputException, match='not trusted'):
+        signing.Verifier(pem(certs['ca'], certs['signer'])).verify(DATA, signers['other'].sign(DATA))
+
+
+@pytest.mark.parametrize('name, trusted', [('leaf', 'signer'), ('nocaleaf', 'noca')])
+def test_issuer_must_be_a_ca(pki, name, trusted):
+    signers, certs = pki
+    with pytest.raises(InputException, match='not trusted'):
+        signing.Verifier(pem(certs[trusted])).verify(DATA, signers[name].sign(DATA))
+
+
+def test_malformed_der(pki):
+    signers, certs = pki
+    verifier = signing.Verifier(pem(certs['ca']))
+    signature = signers['signer'].sign(DATA)
+    for malformed in (b'', b'\x30', b'\x30\x80\x00\x00', b'\x04\x03abc', signature[:len(signature) // 2],
+                      signature[:40] + b'\xff' * 40 + signature[80:]):
+        with pytest.raises(InputException):
+            verifier.verify(DATA, malformed)
+
+
+def test_sign_and_verify_files(pki, tmp_path):
+    signers, certs = pki
+    paths = []
+    for name in ('a', 'b'):
+        paths.append(str(tmp_path / f'{name}.json'))
+        with open(paths[-1], 'wb') as fp:
+            fp.write(DATA + name.encode())
+    key_path, cert_path, trusted_path = (str(tmp_path / name) for name in ('key.pem', 'cert.pem', 'trusted.pem'))
+    for path, content in ((key_path, key_pem(signers['signer'].key)), (cert_path, pem(certs['signer'])),
+                          (trusted_path, pem(certs['ca']))):
+        with open(path, 'wb') as fp:
+            fp.write(content)
+
+    results = list(signing.sign_files(paths, key_path, cert_path, workers=1))
+    assert [(result.signature_path, result.error) for result in results] == \
+        [(signing.get_signature_path(path), None) for path in paths]
+    with open(paths[1], 'ab') as fp:
+        fp.write(b' ')
+    errors = [result.error for result in signing.verify_files(paths, trusted_path, workers=1)]
+    assert errors[0] is None and isinstance(errors[1], InputException)
+    assert sorted(os.listdir(tmp_path)) == ['a.json', 'a.p7s', 'b.json', 'b.p7s', 'cert.pem', 'key.pem',
+                                            'trusted.pem']
@@ -0,0 +1,98 @@
+import copy
+
+import pytest
+
+from muddy.exceptions import InputException
+from muddy.maker import make_mud
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+from muddy.store import AclStore
+
+ACLS = 'ietf-access-control-list:acls'
+
+
+def device_mud(i, target_url='cloud.example.com'):
+    return make_mud(mud_version=1, mud_url=f'https://lighting.example.com/lightbulb{i}', is_supported=True,
+                    last_update='2024-01-01T00:00:00', system_info=f'Lightbulb {i}',
+                    directions_initiated=[Direction.TO_DEVICE, Direction.FROM_DEVICE], ip_version=IPVersion.IPV4,
+                    target_url=target_url, protocol=Protocol.TCP, match_types=[MatchType.IS_CLOUD],
+                    local_ports=[80, 8883], remote_ports=[443])
+
+
+def test_equal_acls_are_stored_once():
+    store = AclStore()
+    muds = [device_mud(i) for i in range(3)]
+    for i, mud in enumerate(muds):
+        store.add(i, mud)
+    stats = store.stats()
+    # an ACL per direction for each device, with a random name prefix but the same content for every device
+    assert (stats.devices, stats.acls, stats.fragments) == (3, 6, 2)
+    assert stats.unique_aces <= stats.aces
+    names = [acl['name'] for acl in muds[0][ACLS]['acl']]
+    assert store.fragment(0, names[0]) is store.fragment(1, muds[1][ACLS]['acl'][0]['name'])
+    assert store.fragment(0, 'missing') is None
+    assert store.fragment(0, names[0]).refs == 3
+    assert store.acl(0, names[1]) == muds[0][ACLS]['acl'][1]
+
+
+def test_fragments_are_released_with_their_last_device():
+    store = AclStore()
+    muds = {'a': device_mud(0), 'b': device_mud(1), 'c': device_mud(2, target_url='other.example.com')}
+    for device, mud in muds.items():
+        store.add(device, mud)
+    assert store.stats().fragments == 4
+    store.remove('a')
+    assert store.stats()[:3] == (2, 4, 4)
+    store.remove('c')
+    assert store.stats()[:3] == (1, 2, 2)
+    # the remaining device is still rebuilt from the shared fragments
+    assert store.get('b') == muds['b']
+    store.remove('b')
+    store.remove('b')
+    assert store.stats() == (0, 0, 0, 0, 0)
+    assert 'b' not in store and len(store) == 0
+
+
+def test_replacing_a_device_keeps_the_fragments_it_shares():
+    store = AclStore()
+    mud = device_mud(0)
+    store.add('a', mud)
+    fragment = store.fragment('a', mud[ACLS]['acl'][0]['name'])
+    store.add('a', device_mud(1))
+    assert store.stats()[:3] == (1, 2, 2)
+    assert store.fragment('a', store.get('a')[ACLS]['acl'][0]['name']) is fragment
+    assert fragment.refs == 1
+
+
+@pytest.mark.parametrize('mud', [
+    device_mud(0),
+    # no ACLs container, an empty one, one without an ACL list, and one with other members
+    {'ietf-mud:mud': {'mud-version': 1, 'mud-url': 'https://lighting.example.com/lightbulb'}},
+    {'ietf-mud:mud': {'mud-version': 1}, ACLS: {}},
+    {'ietf-mud:mud': {'mud-version': 1}, ACLS: {'x-vendor:note': 'none yet'}},
+    {'ietf-mud:mud': {'mud-version': 1}, ACLS: {'acl': [], 'x-vendor:note': 'empty'}, 'x-vendor:extra': [1, 2]},
+    # an ACL without ACEs and a policy which isn't a plain list of names
+    {'ietf-mud:mud': {'mud-version': 1, 'from-device-policy': {'access-lists': {'access-list': [
+        {'name': 'a', 'x-vendor:weight': 1}]}}}, ACLS: {'acl': [{'name': 'a', 'type': 'ipv4-acl-type'}]}},
+])
+def test_get_returns_the_stored_document(mud):
+    store = AclStore()
+    expected = copy.deepcopy(mud)
+    store.add('device', mud)
+    assert store.get('device') == expected
+    # the ACLs were copied: changing the document given to add doesn't change the store
+    for acl in mud.get(ACLS, {}).get('acl', []):
+        acl['type'] = 'changed'
+    assert store.get('device') == expected
+
+
+@pytest.mark.parametrize('mud', [None, {}, {'ietf-mud:mud': {}, ACLS: []},
+                                 {'ietf-mud:mud': {}, ACLS: {'acl': [{'type': 'ipv4-acl-type'}]}}])
+def test_invalid_document(mud):
+    store = AclStore()
+    stored = device_mud(0)
+    store.add('device', stored)
+    with pytest.raises(InputException):
+        store.add('device', mud)
+    # a failed add leaves the store as it was
+    assert store.stats()[:3] == (1, 2, 2)
+    assert store.get('device') == stored
@@ -0,0 +1,57 @@
+import io
+import itertools
+import json
+
+import pytest
+
+from muddy.maker import make_acl_names, make_acls, make_mud, make_policy, make_support_info
+from muddy.models import Direction, IPVersion, MatchType, Protocol
+from muddy.stream import dump, dump_acls
+
+MUD_URL = 'https://lighting.example.com/lightbulb2000'
+LAST_UPDATE = '2024-01-01T00:00:00'
+# with and without an ietf-acldns name
+TARGETS = [(MatchType.IS_CLOUD, 'cloud.example.com'), (MatchType.IS_MFG, 'lighting.example.com')]
+
+
+def dumped(obj, function=dump):
+    fp = io.StringIO()
+    function(obj, fp)
+    return fp.getvalue().encode()
+
+
+@pytest.mark.parametrize('ip_version, target', list(itertools.product([IPVersion.IPV4, IPVersion.IPV6], TARGETS)))
+def test_keyword_signature_is_identical(ip_version, target):
+    match_type, target_url = target
+    mud = make_mud(mud_version=1, mud_url=MUD_URL, is_supported=True, last_update=LAST_UPDATE, cache_validity=48,
+                   system_info='Lightbulb', directions_initiated=[Direction.TO_DEVICE, Direction.FROM_DEVICE],
+                   ip_version=ip_version, target_url=target_url, protocol=Protocol.TCP, match_types=[match_type],
+                   local_ports=[80, 8883], remote_ports=[443], deterministic=True)
+    assert dumped(mud) == json.dumps(mud).encode()
+
+
+def make_lazy(ip_version, match_type, target_url, lazy):
+    support_info = make_support_info(1, MUD_URL, True, 48, last_update=LAST_UPDATE)
+    acls = []
+    policies = {}
+    for direction_initiated in [Direction.TO_DEVICE, Direction.FROM_DEVICE]:
+        acl_names = make_acl_names('mud-10000', ip_version, direction_initiated)
+        policies.update(make_policy(direction_initiated, acl_names))
+        acls.append(make_acls([ip_version], target_url, Protocol.UDP, [match_type, MatchType.IS_MYMFG],
+                              direction_initiated, list(range(100, 110)), [53, 123], acl_names, lazy=lazy))
+    return make_mud(support_info, policies, acls), acls
+
+
+@pytest.mark.parametrize('ip_version, target', list(itertools.product([IPVersion.IPV4, IPVersion.IPV6], TARGETS)))
+def test_acls_signature_streams_lazy_aces_identically(ip_version, target):
+    eager, eager_acls = make_lazy(ip_version, *target, lazy=False)
+    lazy, _ = make_lazy(ip_version, *target, lazy=True)
+    assert dumped(lazy) == json.dumps(eager).encode()
+    _, lazy_acls = make_lazy(ip_version, *target, lazy=True)
+    assert dumped(lazy_acls, dump_acls) == json.dumps({'acl': eager_acls}).encode()
+
+
+def test_non_string_keys_and_unicode():
+    obj = {1: 'é', 2.5: None, True: [iter([{'a': (1, 2)}])], None: iter([iter([1]), 'x'])}
+    expected = {1: 'é', 2.5: None, True: [[{'a': [1, 2]}]], None: [[1], 'x']}
+    assert dumped(obj) == json.dumps(expected).encode()